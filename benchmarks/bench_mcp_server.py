@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for the MCP stdio server.
+
+Starts ``src/main.py --mcp`` and drives it with a mix of ``call_tool`` and
+``list_tools`` requests, either pipelined (every request written before the
+responses are read, matched by id), in lockstep (one request at a time) or
+in lockstep batches (one JSON-RPC batch array at a time). It also compares
+the time and peak memory of writing multi-megabyte script responses with
+the JSON codecs.
+
+Run from the repository root:
+
+    python benchmarks/bench_mcp_server.py --requests 10000 --batch-size 50
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import timeit
+import tracemalloc
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+import json_codec
+from mcp_server import McpServer
+
+MAIN_SCRIPT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src", "main.py"))
+
+# A representative mix of requests, cycled through
+REQUEST_MIX = [
+    ("call_tool", {"name": "CreateSketch", "arguments": {"plane": "xy"}}),
+    ("call_tool", {"name": "DrawRectangle", "arguments": {"width": 10, "depth": 10}}),
+    ("call_tool", {"name": "DrawCircle", "arguments": {"radius": 2, "center_x": 5, "center_y": 5}}),
+    ("call_tool", {"name": "Extrude", "arguments": {"height": 5}}),
+    ("call_tool", {"name": "Fillet", "arguments": {"radius": 0.5, "edge_indices": [0, 1, 2, 3]}}),
+    ("call_tool", {"name": "DrawCircle", "arguments": {"radius": -1}}),
+    ("list_tools", {}),
+]
+
+def make_requests(count):
+    """Build the request lines, with distinct ids and parameters so the script cache does not hide generation."""
+    lines = []
+    for i in range(count):
+        method, params = REQUEST_MIX[i % len(REQUEST_MIX)]
+        if method == "call_tool" and "radius" in params["arguments"] and params["arguments"]["radius"] > 0:
+            params = dict(params, arguments=dict(params["arguments"], radius=1 + i))
+        lines.append(json.dumps({"jsonrpc": "2.0", "id": i, "method": method, "params": params}) + "\n")
+    return lines
+
+def start_server(env=None):
+    """Start the MCP server and wait until it answers."""
+    process = subprocess.Popen(
+        [sys.executable, MAIN_SCRIPT, "--mcp"],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+        bufsize=1,
+        env=env,
+    )
+    process.stdin.write(json.dumps({"jsonrpc": "2.0", "id": "ready", "method": "list_tools"}) + "\n")
+    process.stdin.flush()
+    process.stdout.readline()
+    return process
+
+def stop_server(process):
+    """
+    Close the server input and wait for it to exit.
+
+    Returns:
+        The peak resident set size of the server process, in MB.
+    """
+    process.stdin.close()
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+def bench_pipelined(lines):
+    """Write every request up front from one thread while reading the responses on another."""
+    process = start_server()
+
+    def write_requests():
+        for line in lines:
+            process.stdin.write(line)
+        process.stdin.flush()
+
+    start = time.perf_counter()
+    writer = threading.Thread(target=write_requests)
+    writer.start()
+    ids = {json.loads(process.stdout.readline())["id"] for _ in lines}
+    elapsed = time.perf_counter() - start
+    writer.join()
+    stop_server(process)
+    assert ids == set(range(len(lines)))
+    return elapsed
+
+def bench_lockstep(lines):
+    """Write one request and wait for its response before sending the next."""
+    process = start_server()
+    start = time.perf_counter()
+    for i, line in enumerate(lines):
+        process.stdin.write(line)
+        process.stdin.flush()
+        assert json.loads(process.stdout.readline())["id"] == i
+    elapsed = time.perf_counter() - start
+    stop_server(process)
+    return elapsed
+
+def bench_batched(lines, batch_size):
+    """Send the requests as batch arrays, waiting for each batch response before sending the next."""
+    batches = [
+        "[" + ",".join(line.rstrip("\n") for line in lines[i:i + batch_size]) + "]\n"
+        for i in range(0, len(lines), batch_size)
+    ]
+    process = start_server()
+    start = time.perf_counter()
+    answered = 0
+    for batch in batches:
+        process.stdin.write(batch)
+        process.stdin.flush()
+        answered += len(json.loads(process.stdout.readline()))
+    elapsed = time.perf_counter() - start
+    stop_server(process)
+    assert answered == len(lines)
+    return elapsed
+
+def make_large_request(indices, request_id=0):
+    """A Fillet call whose script lists the given number of scattered edge indices."""
+    edges = sorted(random.Random(request_id).sample(range(indices * 8), indices))
+    return {
+        "jsonrpc": "2.0",
+        "id": request_id,
+        "method": "call_tool",
+        "params": {"name": "Fillet", "arguments": {"radius": 0.5, "edge_indices": edges}},
+    }
+
+def bench_response_encoding(indices, number):
+    """Time writing one large response the previous way (text, json.dumps) and with each codec backend."""
+    response = McpServer().handle_request(make_large_request(indices))
+    size = len(response["result"]["content"][0]["text"])
+    print(f"Writing a call_tool response with a {size / 1e6:.1f} MB script:")
+
+    def write_text():
+        with open(os.devnull, "w") as stdout:
+            stdout.write(json.dumps(response) + "\n")
+            stdout.flush()
+
+    def write_bytes():
+        with open(os.devnull, "wb") as stdout:
+            stdout.write(json_codec.dumps(response))
+            stdout.write(b"\n")
+            stdout.flush()
+
+    backend = json_codec.JSON_BACKEND
+    runs = [("text, json.dumps", write_text, backend)]
+    runs += [(f"bytes, {name}", write_bytes, name) for name in ("json", "orjson") if name == "json" or json_codec.orjson]
+    for label, write, name in runs:
+        json_codec.JSON_BACKEND = name
+        best = min(timeit.repeat(write, number=1, repeat=number))
+        tracemalloc.start()
+        write()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"  {label:<32} {best * 1e3:10.1f} ms {peak / 1e6:10.1f} MB peak allocated")
+    json_codec.JSON_BACKEND = backend
+
+def bench_server_rss(indices, count):
+    """Compare the throughput and peak RSS of the server answering large requests with each backend."""
+    lines = [json.dumps(make_large_request(indices, i)) + "\n" for i in range(count)]
+    print(f"MCP stdio server, {count} call_tool requests with {indices} edge indices:")
+    for backend in ("json", "orjson"):
+        if backend == "orjson" and json_codec.orjson is None:
+            continue
+        process = start_server(dict(os.environ, FUSION360_MCP_JSON=backend))
+        start = time.perf_counter()
+        for line in lines:
+            process.stdin.write(line)
+            process.stdin.flush()
+            assert "result" in json.loads(process.stdout.readline())
+        elapsed = time.perf_counter() - start
+        rss = stop_server(process)
+        print(f"  {backend:<32} {elapsed * 1e3:10.1f} ms {rss:10.1f} MB peak RSS")
+
+def report(label, count, elapsed):
+    """Print the throughput of a run."""
+    print(f"  {label:<32} {elapsed * 1e3:10.1f} ms {count / elapsed:10.0f} requests/s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the MCP stdio server throughput.")
+    parser.add_argument("--requests", type=int, default=10000, help="Number of requests per run")
+    parser.add_argument("--batch-size", type=int, default=50, help="Requests per batch in the batched run")
+    parser.add_argument("--large-indices", type=int, default=300000, help="Edge indices in each large-script request")
+    parser.add_argument("--large-requests", type=int, default=10, help="Number of large-script requests")
+    args = parser.parse_args()
+
+    lines = make_requests(args.requests)
+    print(f"MCP stdio server, {args.requests} mixed requests:")
+    report("lockstep", args.requests, bench_lockstep(lines))
+    report("pipelined", args.requests, bench_pipelined(lines))
+    report(f"batches of {args.batch_size}", args.requests, bench_batched(lines, args.batch_size))
+    bench_response_encoding(args.large_indices, 5)
+    bench_server_rss(args.large_indices, args.large_requests)
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for the Fusion 360 script generator.
+
+Run from the repository root:
+
+    python benchmarks/bench_script_generator.py
+"""
+
+import argparse
+import os
+import sys
+import time
+import timeit
+import tracemalloc
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+import script_generator
+from script_generator import BASE_SCRIPT_TEMPLATE, SCRIPT_TEMPLATES, generate_multi_tool_script
+
+# A representative sketch/extrude/fillet step sequence
+STEP_PATTERN = [
+    {"tool_name": "CreateSketch", "parameters": {"plane": "xy"}},
+    {"tool_name": "DrawRectangle", "parameters": {"width": 10, "depth": 10}},
+    {"tool_name": "DrawCircle", "parameters": {"radius": 2, "center_x": 5, "center_y": 5}},
+    {"tool_name": "Extrude", "parameters": {"height": 5}},
+    {"tool_name": "Fillet", "parameters": {"radius": 0.5, "edge_indices": [0, 1, 2, 3]}},
+]
+
+def make_tool_calls(steps):
+    """Build a call_tools payload with the given number of steps."""
+    return [STEP_PATTERN[i % len(STEP_PATTERN)] for i in range(steps)]
+
+def reference_multi_tool_script(tool_calls):
+    """Generate a script the way the generator did before templates were compiled."""
+    tool_scripts = []
+    for call in tool_calls:
+        processed = script_generator._process_parameters(call["tool_name"], call["parameters"])
+        tool_scripts.append(SCRIPT_TEMPLATES[call["tool_name"]].format(**processed))
+    combined_tool_script = "\n".join(tool_scripts)
+    indented_tool_script = "\n".join(f"        {line}" for line in combined_tool_script.strip().split("\n"))
+    return BASE_SCRIPT_TEMPLATE.format(tool_scripts=indented_tool_script)
+
+def bench(label, func, number, repeat, unit="ms"):
+    """Time a callable and print the best per-call time, in ms or us."""
+    best = min(timeit.repeat(func, number=number, repeat=repeat)) / number
+    scale = 1e6 if unit == "us" else 1e3
+    print(f"  {label:<32} {best * scale:10.3f} {unit}/call")
+    return best
+
+def bench_compiled_templates(steps, number, repeat):
+    """Compare str.format rendering against compiled templates."""
+    tool_calls = make_tool_calls(steps)
+    # Render every step instead of serving repeated steps from the cache
+    script_generator.SCRIPT_CACHE.configure(maxsize=0)
+    assert generate_multi_tool_script(tool_calls) == reference_multi_tool_script(tool_calls)
+
+    print(f"call_tools payload with {steps} steps:")
+    before = bench("str.format + split/indent", lambda: reference_multi_tool_script(tool_calls), number, repeat)
+    after = bench("compiled templates", lambda: generate_multi_tool_script(tool_calls), number, repeat)
+    print(f"  speedup: {before / after:.2f}x")
+    script_generator.SCRIPT_CACHE.configure(maxsize=1024)
+
+    # Rendering alone, with parameter processing taken out of the loop
+    rendered = [
+        (call["tool_name"], script_generator._process_parameters(call["tool_name"], call["parameters"]))
+        for call in tool_calls
+    ]
+    indent = "        "
+    before = bench(
+        "render: str.format + indent",
+        lambda: [
+            "\n".join(indent + line for line in SCRIPT_TEMPLATES[name].format(**params).strip().split("\n"))
+            for name, params in rendered
+        ],
+        number, repeat,
+    )
+    after = bench(
+        "render: compiled templates",
+        lambda: [script_generator.COMPILED_TEMPLATES[name].render(params) for name, params in rendered],
+        number, repeat,
+    )
+    print(f"  speedup: {before / after:.2f}x")
+
+def make_registry(size):
+    """Build a synthetic registry of tools that all take an operation option."""
+    return [
+        {
+            "name": f"Tool{i}",
+            "description": f"Synthetic tool {i}.",
+            "parameters": {
+                "height": {"type": "number", "description": "Height."},
+                "operation": {
+                    "type": "string",
+                    "description": "Operation.",
+                    "enum": ["new", "join", "cut", "intersect"],
+                    "default": "new",
+                },
+            },
+            "docs": "",
+        }
+        for i in range(size)
+    ]
+
+def make_if_chain(size):
+    """Generate an if/elif processing chain like the one the processor registry replaced."""
+    lines = ["def process(tool_name, parameters):", "    processed = parameters.copy()"]
+    for i in range(size):
+        keyword = "if" if i == 0 else "elif"
+        lines.append(f"    {keyword} tool_name == 'Tool{i}':")
+        lines.append("        processed['operation_code'] = OPERATIONS[processed.get('operation', 'new').lower()]")
+    lines.append("    return processed")
+    namespace = {"OPERATIONS": script_generator.FEATURE_OPERATION_CODES}
+    exec("\n".join(lines), namespace)
+    return namespace["process"]
+
+def bench_processor_dispatch(sizes, number, repeat):
+    """Show that processor dispatch cost stays flat as the registry grows."""
+    print("Parameter processor dispatch for the last tool in the registry:")
+    parameters = {"height": 5, "operation": "cut"}
+    for size in sizes:
+        processors = {}
+        for tool in make_registry(size):
+            processors[tool["name"]] = script_generator.ToolProcessor(
+                tool,
+                script_generator._process_feature_operation,
+                {"operation": script_generator.FEATURE_OPERATION_CODES},
+            )
+        chain = make_if_chain(size)
+        name = f"Tool{size - 1}"
+        registry_time = min(timeit.repeat(lambda: processors[name].process(parameters), number=number, repeat=repeat))
+        chain_time = min(timeit.repeat(lambda: chain(name, parameters), number=number, repeat=repeat))
+        print(f"  {size:>5} tools: registry {registry_time / number * 1e6:8.3f} us/call, "
+              f"if/elif chain {chain_time / number * 1e6:8.3f} us/call")
+
+def bench_script_cache(number, repeat):
+    """Compare repeated single-tool calls with and without the script cache."""
+    payloads = {
+        "sketch/extrude/fillet steps": [(call["tool_name"], call["parameters"]) for call in STEP_PATTERN],
+        "fillet of 200 edges": [("Fillet", {"radius": 0.5, "edge_indices": list(range(0, 400, 2))})],
+        # ExportBody takes no list or object parameters, so it skips the cache
+        "export": [("ExportBody", {"filename": "part.stl"})],
+    }
+    generate = script_generator.generate_script
+    cache = script_generator.SCRIPT_CACHE
+
+    for label, calls in payloads.items():
+        print(f"Repeated generate_script calls ({label}):")
+        run = lambda: [generate(name, params) for name, params in calls]
+        # Alternate the two configurations, so that both see the same machine noise
+        best = {0: float("inf"), 1024: float("inf")}
+        for _ in range(repeat):
+            for maxsize in best:
+                cache.configure(maxsize=maxsize)
+                best[maxsize] = min(best[maxsize], timeit.timeit(run, number=number) / number)
+        print(f"  {'uncached':<32} {best[0] * 1e3:10.3f} ms/call")
+        print(f"  {'cached':<32} {best[1024] * 1e3:10.3f} ms/call")
+        print(f"  speedup: {best[0] / best[1024]:.2f}x")
+    print(f"  cache: {cache.stats()}")
+
+def bench_streaming(steps):
+    """Measure time-to-first-chunk and peak memory of streamed script generation."""
+    tool_calls = make_tool_calls(steps)
+    # Unique parameters per step, so rendering is not served from the cache
+    tool_calls = [
+        {"tool_name": call["tool_name"], "parameters": dict(call["parameters"], profile_index=i)}
+        if call["tool_name"] == "Extrude" else call
+        for i, call in enumerate(tool_calls)
+    ]
+
+    print(f"Streaming a call_tools payload with {steps} steps:")
+    for label, run in (
+        ("str.format + split/indent", lambda: [reference_multi_tool_script(tool_calls)]),
+        ("generate_multi_tool_script", lambda: [generate_multi_tool_script(tool_calls)]),
+        ("iter_multi_tool_script", lambda: script_generator.iter_multi_tool_script(tool_calls)),
+    ):
+        script_generator.SCRIPT_CACHE.clear()
+        tracemalloc.start()
+        start = time.perf_counter()
+        first = None
+        size = 0
+        for chunk in run():
+            if first is None:
+                first = time.perf_counter() - start
+            size += len(chunk)
+        total = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"  {label:<32} first chunk {first * 1e3:8.2f} ms, total {total * 1e3:8.2f} ms, "
+              f"peak {peak / 1e6:7.2f} MB for a {size / 1e6:.2f} MB script")
+
+def bench_loop_compression(steps, number, repeat):
+    """Compare script size and generation time of a pattern request with and without loops."""
+    # A circular hole pattern: one sketch, many circles, one cut per profile
+    tool_calls = [{"tool_name": "CreateSketch", "parameters": {"plane": "xy"}}]
+    tool_calls += [
+        {"tool_name": "DrawCircle", "parameters": {"radius": 0.5, "center_x": i % 100, "center_y": i // 100}}
+        for i in range(steps)
+    ]
+    tool_calls += [
+        {"tool_name": "Extrude", "parameters": {"height": 2, "operation": "cut", "profile_index": i}}
+        for i in range(steps)
+    ]
+
+    print(f"Pattern request with {len(tool_calls)} steps:")
+    script_generator.SCRIPT_CACHE.configure(maxsize=0)
+    before = bench("unrolled", lambda: generate_multi_tool_script(tool_calls), number, repeat)
+    after = bench(
+        "compress_loops",
+        lambda: generate_multi_tool_script(tool_calls, compress_loops=True),
+        number, repeat,
+    )
+    script_generator.SCRIPT_CACHE.configure(maxsize=1024)
+    stats = {}
+    generate_multi_tool_script(tool_calls, compress_loops=True, stats=stats)
+    print(f"  speedup: {before / after:.2f}x")
+    print(f"  script size: {stats['unrolled_size'] / 1e3:.1f} KB unrolled, "
+          f"{stats['script_size'] / 1e3:.1f} KB with {stats['loops']} loops "
+          f"({stats['unrolled_size'] / stats['script_size']:.1f}x smaller)")
+
+def reference_selection_code(indices, kind, collection):
+    """Generate selection code the way the generator did before it was compacted."""
+    lines = []
+    for idx in indices:
+        lines.append(f"{kind} = body.{kind}s.item({idx})")
+        lines.append(f"{collection}.add({kind})")
+    return "\n".join(lines)
+
+def bench_selection_code(sizes, number, repeat):
+    """Compare the per-index and compact selection code of Fillet calls."""
+    generate = script_generator.generate_script
+    script_generator.SCRIPT_CACHE.configure(maxsize=0)
+    for size in sizes:
+        selections = {
+            "contiguous": list(range(size)),
+            # Every third edge, with one in ten skipped
+            "scattered": [i for i in range(0, size * 3, 3) if i % 10],
+        }
+        for label, indices in selections.items():
+            parameters = {"radius": 0.5, "edge_indices": indices}
+            print(f"Fillet of {len(indices)} {label} edges:")
+            compact = generate("Fillet", parameters)
+            original = script_generator._selection_code
+            script_generator._selection_code = reference_selection_code
+            try:
+                per_index = generate("Fillet", parameters)
+                before = bench("per-index lines", lambda: generate("Fillet", parameters), number, repeat)
+            finally:
+                script_generator._selection_code = original
+            after = bench("compact list + loop", lambda: generate("Fillet", parameters), number, repeat)
+            print(f"  speedup: {before / after:.2f}x, script size {len(per_index) / 1e3:.1f} KB -> "
+                  f"{len(compact) / 1e3:.1f} KB, {per_index.count(chr(10))} -> {compact.count(chr(10))} lines")
+    script_generator.SCRIPT_CACHE.configure(maxsize=1024)
+
+def registry_json_schema(tool):
+    """Translate a registry entry into the equivalent JSON schema."""
+    return {
+        "type": "object",
+        "properties": {
+            name: {key: value for key, value in param.items() if key in ("type", "enum", "items", "default")}
+            for name, param in tool["parameters"].items()
+        },
+        "required": [name for name, param in tool["parameters"].items() if "default" not in param],
+    }
+
+def bench_validators(number, repeat):
+    """Compare the compiled parameter validators against jsonschema."""
+    try:
+        import jsonschema
+    except ImportError:
+        jsonschema = None
+
+    payloads = [
+        ("DrawRectangle", {"width": 10, "depth": 20, "origin_x": 1.5}),
+        ("Extrude", {"height": 5, "operation": "cut", "profile_index": 2}),
+        ("Fillet", {"radius": 0.5, "edge_indices": list(range(1000))}),
+    ]
+    for tool_name, parameters in payloads:
+        print(f"Validating {tool_name} parameters:")
+        validate = script_generator.TOOL_PROCESSORS[tool_name].validate
+        compiled = bench("compiled validator", lambda: validate(parameters), number, repeat, "us")
+        if jsonschema is None:
+            print("  jsonschema is not installed, skipping the comparison")
+            continue
+        schema = registry_json_schema(script_generator.TOOLS_BY_NAME[tool_name])
+        validator = jsonschema.Draft7Validator(schema)
+        prepared = bench("jsonschema (prepared validator)", lambda: validator.validate(parameters), number, repeat, "us")
+        generic = bench("jsonschema.validate", lambda: jsonschema.validate(parameters, schema), number, repeat, "us")
+        print(f"  speedup: {prepared / compiled:.1f}x over a prepared validator, "
+              f"{generic / compiled:.1f}x over jsonschema.validate")
+
+def count_component_lookups(script):
+    """Count the statements that look something up on the root component."""
+    return sum(
+        1 for line in script.splitlines()
+        if "component." in line and not line.lstrip().startswith("#")
+    )
+
+def bench_optimization_passes(steps, number, repeat):
+    """Compare generation time, script size and component lookups with and without the IR passes."""
+    tool_calls = make_tool_calls(steps)
+    print(f"Optimization passes on a call_tools payload with {steps} steps:")
+    before = bench("unoptimized", lambda: generate_multi_tool_script(tool_calls), number, repeat)
+    after = bench("optimize=True", lambda: generate_multi_tool_script(tool_calls, optimize=True), number, repeat)
+    print(f"  overhead: {after / before:.2f}x")
+
+    stats = {}
+    plain = generate_multi_tool_script(tool_calls)
+    optimized = generate_multi_tool_script(tool_calls, stats=stats, optimize=True)
+    print(f"  component lookups: {count_component_lookups(plain)} -> {count_component_lookups(optimized)}, "
+          f"script size {len(plain) / 1e3:.1f} KB -> {len(optimized) / 1e3:.1f} KB")
+    for name, counters in stats["passes"].items():
+        print(f"  {name}: {counters}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the Fusion 360 script generator.")
+    parser.add_argument("--steps", type=int, default=1000, help="Number of steps in the call_tools payload")
+    parser.add_argument("--number", type=int, default=20, help="Calls per timing run")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of timing runs")
+    args = parser.parse_args()
+
+    bench_compiled_templates(args.steps, args.number, args.repeat)
+    bench_processor_dispatch([10, 100, 500, 1000], args.number * 1000, args.repeat)
+    bench_script_cache(args.number * 50, args.repeat * 6)
+    bench_streaming(args.steps * 10)
+    bench_loop_compression(args.steps, args.number, args.repeat)
+    bench_selection_code([10, 1000, 100000], args.number, args.repeat)
+    bench_validators(args.number * 100, args.repeat)
+    bench_optimization_passes(args.steps, args.number, args.repeat)
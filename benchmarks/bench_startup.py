@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the MCP stdio server.
+
+Cline starts a new server process for each session, so the time from
+process start to the first ``list_tools`` response is paid every time.
+This benchmark starts ``src/main.py --mcp`` repeatedly, sends a
+``list_tools`` request and times the response. One extra run under
+``-X importtime`` lists the slowest imports and checks that the HTTP server
+dependencies are not loaded. Finally, a registry of ``--tools`` tools is
+generated in a temporary directory, and the cold start with it is timed with
+and without the compiled registry cache, and the first ``call_tool`` response
+is timed with the registry as a single file and as a sharded directory.
+
+Run from the repository root:
+
+    python benchmarks/bench_startup.py --budget-ms 300 --tools 500
+
+Exits with status 1 if the median time to the first response exceeds the
+budget, or if MCP mode imports FastAPI, uvicorn or pydantic.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+MAIN_SCRIPT = os.path.join(SRC_DIR, "main.py")
+sys.path.insert(0, SRC_DIR)
+
+from registry import read_index, shard_path, write_index, write_shard
+
+# Packages that only the HTTP server needs
+HTTP_PACKAGES = ("fastapi", "uvicorn", "pydantic", "starlette")
+
+LIST_TOOLS_REQUEST = json.dumps({"method": "list_tools"}) + "\n"
+CALL_TOOL_REQUEST = json.dumps({"method": "call_tool", "params": {"name": "DrawCircle", "arguments": {"radius": 2}}}) + "\n"
+
+def time_first_response(extra_args=(), env=None, request=LIST_TOOLS_REQUEST, key="tools"):
+    """
+    Start the MCP server, send a request and wait for the response.
+
+    Args:
+        extra_args: Extra arguments for the Python interpreter.
+        env: The environment of the server process.
+        request: The request line to send, list_tools by default.
+        key: A key the result of the response must have.
+
+    Returns:
+        The seconds from process start to the response, and the stderr output.
+    """
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, *extra_args, MAIN_SCRIPT, "--mcp"],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        env=env,
+    )
+    process.stdin.write(request)
+    process.stdin.flush()
+    response = process.stdout.readline()
+    elapsed = time.perf_counter() - start
+    process.stdin.close()
+    stderr = process.stderr.read()
+    process.wait()
+    if key not in json.loads(response).get("result", {}):
+        raise RuntimeError(f"Unexpected response: {response!r}")
+    return elapsed, stderr
+
+def parse_importtime(stderr):
+    """
+    Parse ``-X importtime`` output.
+
+    Returns:
+        A list of (cumulative microseconds, module name) for each import.
+    """
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        imports.append((int(cumulative_us), name.strip()))
+    return imports
+
+def bench_startup(runs, top):
+    """Time the first list_tools response and report the slowest imports."""
+    # Warm the file system cache and the bytecode cache first
+    time_first_response()
+    timings = sorted(time_first_response()[0] for _ in range(runs))
+
+    print(f"MCP stdio cold start, {runs} runs:")
+    print(f"  {'time to first list_tools':<32} {statistics.median(timings) * 1e3:10.1f} ms median")
+    print(f"  {'':<32} {timings[0] * 1e3:10.1f} ms best")
+
+    _, stderr = time_first_response(["-X", "importtime"])
+    imports = parse_importtime(stderr)
+    print("Slowest imports (cumulative):")
+    for cumulative_us, name in sorted(imports, reverse=True)[:top]:
+        print(f"  {name:<32} {cumulative_us / 1e3:10.1f} ms")
+
+    loaded = sorted({name.split(".")[0] for _, name in imports} & set(HTTP_PACKAGES))
+    return statistics.median(timings), loaded
+
+def make_registry(directory, count, sharded=False):
+    """Write a registry of the shipped tools followed by ``count`` copies of them under new names."""
+    shipped_dir = os.path.join(SRC_DIR, "tool_registry")
+    shipped = []
+    for entry in read_index(shipped_dir):
+        with open(shard_path(shipped_dir, entry["name"])) as f:
+            shipped.append(json.load(f))
+    tools = shipped + [dict(shipped[i % len(shipped)], name=f"{shipped[i % len(shipped)]['name']}{i}") for i in range(count)]
+    if sharded:
+        path = os.path.join(directory, "tool_registry")
+        write_index(path, [write_shard(path, tool) for tool in tools])
+        return path
+    path = os.path.join(directory, "tool_registry.json")
+    with open(path, "w") as f:
+        json.dump(tools, f, indent=2)
+    return path
+
+def bench_registry_cache(runs, count):
+    """Time the first list_tools response with a large registry, with and without the compiled cache."""
+    print(f"MCP stdio cold start with {count} tools, {runs} runs:")
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ, FUSION360_MCP_TOOL_REGISTRY=make_registry(directory, count))
+        medians = {}
+        for label, cache in (("without registry cache", "0"), ("with registry cache", os.path.join(directory, "tools.cache"))):
+            run_env = dict(env, FUSION360_MCP_REGISTRY_CACHE=cache)
+            # The first run writes the cache
+            time_first_response(env=run_env)
+            medians[label] = statistics.median(time_first_response(env=run_env)[0] for _ in range(runs))
+            print(f"  {label:<32} {medians[label] * 1e3:10.1f} ms median")
+    saved = medians["without registry cache"] - medians["with registry cache"]
+    print(f"  {'saved by the cache':<32} {saved * 1e3:10.1f} ms")
+
+def bench_sharded_registry(runs, count):
+    """Time the first call_tool response with a large registry, as a single file and as a sharded directory."""
+    print(f"First call_tool with {count} tools and no registry cache, {runs} runs:")
+    with tempfile.TemporaryDirectory() as directory:
+        for label, sharded in (("registry file", False), ("sharded registry", True)):
+            env = dict(
+                os.environ,
+                FUSION360_MCP_TOOL_REGISTRY=make_registry(directory, count, sharded),
+                FUSION360_MCP_REGISTRY_CACHE="0",
+            )
+            timings = [time_first_response(env=env, request=CALL_TOOL_REQUEST, key="content")[0] for _ in range(runs)]
+            print(f"  {label:<32} {statistics.median(timings) * 1e3:10.1f} ms median")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the cold start of the MCP stdio server.")
+    parser.add_argument("--runs", type=int, default=10, help="Number of timed server starts")
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest imports to list")
+    parser.add_argument("--budget-ms", type=float, default=None, help="Fail if the median time exceeds this budget")
+    parser.add_argument("--tools", type=int, default=500, help="Number of tools in the generated registry; 0 to skip")
+    args = parser.parse_args()
+
+    median, loaded = bench_startup(args.runs, args.top)
+    if args.tools:
+        bench_registry_cache(args.runs, args.tools)
+        bench_sharded_registry(args.runs, args.tools)
+    failed = False
+    if loaded:
+        print(f"MCP mode imported HTTP server packages: {', '.join(loaded)}")
+        failed = True
+    if args.budget_ms is not None and median * 1e3 > args.budget_ms:
+        print(f"Median time to first response {median * 1e3:.1f} ms exceeds the budget of {args.budget_ms:.1f} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the tool search index with a large synthetic registry.
+
+Generates ``--tools`` tools with names, descriptions and parameters drawn
+from a CAD vocabulary, then times building the inverted index, a search for
+a few typical queries, and a linear scan over the tools for comparison.
+
+Run from the repository root:
+
+    python benchmarks/bench_tool_search.py --tools 10000
+"""
+
+import argparse
+import os
+import random
+import sys
+import timeit
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from tool_search import ToolSearchIndex, tokenize
+
+VERBS = ["Create", "Draw", "Extrude", "Revolve", "Fillet", "Chamfer", "Shell", "Export", "Combine", "Loft",
+         "Sweep", "Mirror", "Pattern", "Offset", "Split", "Trim", "Project", "Measure", "Align", "Scale"]
+NOUNS = ["Sketch", "Circle", "Rectangle", "Polygon", "Spline", "Arc", "Body", "Face", "Edge", "Profile",
+         "Plane", "Axis", "Point", "Component", "Joint", "Hole", "Thread", "Slot", "Rib", "Web"]
+WORDS = ["radius", "height", "width", "depth", "angle", "distance", "count", "spacing", "thickness", "offset",
+         "direction", "operation", "taper", "center", "origin", "indices", "symmetric", "format", "units", "tolerance"]
+
+QUERIES = ["circle radius", "extrude profile height", "export stl", "fillet edges", "pattern count spacing"]
+
+def make_tools(count, seed=0):
+    """Generate ``count`` tools as (name, description, parameter names)."""
+    rng = random.Random(seed)
+    tools = []
+    for i in range(count):
+        verb, noun = rng.choice(VERBS), rng.choice(NOUNS)
+        parameters = rng.sample(WORDS, rng.randint(1, 6))
+        description = f"{verb}s a {noun.lower()} using its {' and '.join(rng.sample(WORDS, 3))}."
+        tools.append((f"{verb}{noun}{i}", description, parameters))
+    return tools
+
+def linear_search(tools, query, limit):
+    """Score every tool by the query terms found in its text, for comparison."""
+    terms = tokenize(query)
+    scored = []
+    for name, description, parameters in tools:
+        text = " ".join([name, description, *parameters]).lower()
+        score = sum(term in text for term in terms)
+        if score:
+            scored.append((score, name))
+    scored.sort(reverse=True)
+    return scored[:limit]
+
+def bench(label, func, number, repeat):
+    """Time a callable and print the best per-call time in microseconds."""
+    best = min(timeit.repeat(func, number=number, repeat=repeat)) / number
+    print(f"  {label:<32} {best * 1e6:12.1f} us/call")
+    return best
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the tool search index.")
+    parser.add_argument("--tools", type=int, default=10000, help="Number of synthetic tools")
+    parser.add_argument("--limit", type=int, default=10, help="Number of tools returned per search")
+    parser.add_argument("--number", type=int, default=200, help="Searches per timing run")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of timing runs")
+    args = parser.parse_args()
+
+    tools = make_tools(args.tools)
+    print(f"Registry of {args.tools} synthetic tools:")
+    index = bench("build the index", lambda: ToolSearchIndex(tools), 1, 3) and ToolSearchIndex(tools)
+    for query in QUERIES:
+        print(f"Query {query!r}: {[name for name, _ in index.search(query, 3)]}")
+        bench("inverted index", lambda: index.search(query, args.limit), args.number, args.repeat)
+        bench("linear scan", lambda: linear_search(tools, query, args.limit), max(1, args.number // 100), args.repeat)
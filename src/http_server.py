@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Fusion 360 MCP Server - HTTP mode
+
+This module implements a FastAPI server that exposes Fusion 360 tools as callable endpoints.
+"""
+
+import itertools
+import json
+from typing import Dict, Any, Iterator, List, Optional, Union
+
+import uvicorn
+from fastapi import FastAPI, Header, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field
+
+# Import script generator
+from registry import DEFAULT_POLL_INTERVAL, RegistrySnapshot
+from script_generator import (
+    generate_script,
+    iter_multi_tool_script,
+    REGISTRY,
+    SCRIPT_CACHE,
+)
+from tool_listing import (
+    DEFAULT_FIELDS,
+    FIELD_SETS,
+    Payload,
+    ToolSlices,
+    check_fields,
+    http_tool_list,
+    make_payload,
+    make_slices,
+    tool_page,
+)
+from tool_search import DEFAULT_LIMIT, search_tools
+
+# Size of the body chunks sent by streaming responses
+STREAM_CHUNK_SIZE = 64 * 1024
+
+def _encode_tool_list(snapshot: RegistrySnapshot, fields: str = DEFAULT_FIELDS) -> Payload:
+    """Encode the /tools response of a registry snapshot."""
+    return make_payload(http_tool_list(snapshot.tools, fields))
+
+def _tool_list(snapshot: RegistrySnapshot, fields: str) -> Payload:
+    """Get the encoded /tools response of a registry snapshot, kept in the compiled registry cache."""
+    if fields == DEFAULT_FIELDS:
+        return snapshot.derived("http_tool_list", _encode_tool_list, persistent=True)
+    return snapshot.derived(
+        f"http_tool_list:{fields}", lambda snapshot: _encode_tool_list(snapshot, fields), persistent=True
+    )
+
+def _tool_slices(snapshot: RegistrySnapshot, fields: str) -> ToolSlices:
+    """Get the /tools entries of a registry snapshot encoded one by one, to serve pages from."""
+    return snapshot.derived(
+        f"http_tool_slices:{fields}",
+        lambda snapshot: make_slices(http_tool_list(snapshot.tools, fields)["tools"]),
+        persistent=True,
+    )
+
+# Create FastAPI app
+app = FastAPI(
+    title="Fusion 360 MCP Server",
+    description="MCP server for Fusion 360 API integration",
+    version="0.1.0",
+)
+
+# Define request/response models
+class ToolParameter(BaseModel):
+    """Parameter for a tool call."""
+    
+    value: Any = Field(..., description="The parameter value")
+
+
+class ToolCallRequest(BaseModel):
+    """Request to call a single tool."""
+    
+    tool_name: str = Field(..., description="The name of the tool to call")
+    parameters: Dict[str, Any] = Field(
+        default_factory=dict, description="Parameters for the tool call"
+    )
+
+
+class MultiToolCallRequest(BaseModel):
+    """Request to call multiple tools in sequence."""
+    
+    tool_calls: List[ToolCallRequest] = Field(
+        ..., description="List of tool calls to execute in sequence"
+    )
+    compress_loops: bool = Field(
+        default=False,
+        description="Emit runs of the same tool that differ only in numbers as a single loop",
+    )
+    optimize: Union[bool, List[str]] = Field(
+        default=False,
+        description="Run the default optimization passes (true) or the named passes over the script",
+    )
+    defer_sketch_compute: bool = Field(
+        default=False,
+        description="Defer sketch computation while drawing, until the sketch profiles are used",
+    )
+    profile: bool = Field(
+        default=False,
+        description="Time each step and write a JSON timing report when the script ends",
+    )
+    profile_path: Optional[str] = Field(
+        default=None,
+        description="Where the script writes the timing report (defaults to the temporary directory)",
+    )
+
+
+class ScriptResponse(BaseModel):
+    """Response containing a generated script."""
+    
+    script: str = Field(..., description="The generated Fusion 360 Python script")
+    message: str = Field(default="Success", description="Status message")
+    stats: Optional[Dict[str, Any]] = Field(
+        default=None, description="Script statistics, for requests with generation options"
+    )
+
+
+class ToolInfo(BaseModel):
+    """Information about a tool; projections leave some fields out."""
+    
+    name: str = Field(..., description="The name of the tool")
+    description: Optional[str] = Field(default=None, description="Description of what the tool does")
+    parameters: Optional[Dict[str, Dict[str, Any]]] = Field(
+        default=None, description="Parameters accepted by the tool"
+    )
+    docs: Optional[str] = Field(default=None, description="Link to documentation for the tool")
+
+
+class ToolListResponse(BaseModel):
+    """Response containing a list of available tools."""
+    
+    tools: List[ToolInfo] = Field(..., description="List of available tools")
+    next_cursor: Optional[str] = Field(
+        default=None, description="The cursor of the next page, on every page but the last"
+    )
+
+
+# Define API routes
+@app.get("/")
+async def root():
+    """Root endpoint."""
+    return {"message": "Fusion 360 MCP Server is running"}
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Check an If-None-Match header against an ETag, using the weak comparison."""
+    return any(tag.strip() in ("*", etag, "W/" + etag) for tag in if_none_match.split(","))
+
+
+@app.get("/tools", response_model=ToolListResponse)
+async def list_tools(
+    fields: str = Query(DEFAULT_FIELDS, description=f"The fields listed: {', '.join(FIELD_SETS)}"),
+    cursor: Optional[str] = Query(None, description="The next_cursor of the previous page"),
+    limit: Optional[int] = Query(None, ge=1, description="The most tools on a page"),
+    if_none_match: Optional[str] = Header(default=None),
+):
+    """
+    List all available tools.
+    
+    The list is encoded once per registry snapshot and projection, and kept
+    in the compiled registry cache for the next server start. Requests with
+    a cursor or a limit get a page, joined from tools encoded one by one,
+    with a next_cursor unless it is the last page. Clients that send the
+    ETag of their copy in If-None-Match get a 304 without a body.
+    """
+    try:
+        check_fields(fields)
+        if cursor is None and limit is None:
+            tool_list = _tool_list(REGISTRY.snapshot, fields)
+        else:
+            tool_list = tool_page(_tool_slices(REGISTRY.snapshot, fields), cursor, limit, "next_cursor")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    headers = {"ETag": tool_list.etag}
+    if if_none_match is not None and _etag_matches(if_none_match, tool_list.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=tool_list.body, media_type="application/json", headers=headers)
+
+
+@app.get("/tools/search", response_model=ToolListResponse)
+async def search_tools_endpoint(
+    q: str = Query(..., description="Words describing the tool wanted"),
+    limit: int = Query(DEFAULT_LIMIT, ge=1, description="The most tools returned"),
+):
+    """
+    Find the tools whose names, descriptions or parameter names best match a query.
+    
+    The tools are listed best match first, in the /tools format, so that
+    clients of large registries need not fetch the full list.
+    """
+    return http_tool_list(search_tools(REGISTRY.snapshot, q, limit))
+
+
+@app.get("/cache")
+async def cache_stats():
+    """Report the script cache hit/miss/eviction counters."""
+    return SCRIPT_CACHE.stats()
+
+
+@app.post("/call_tool", response_model=ScriptResponse)
+async def call_tool(request: ToolCallRequest):
+    """Call a single tool and generate a Fusion 360 script."""
+    try:
+        script = generate_script(request.tool_name, request.parameters)
+        return {"script": script, "message": "Success"}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error generating script: {str(e)}")
+
+
+def _stream_script_response(chunks: Iterator[str], stats: Optional[Dict[str, Any]] = None) -> Iterator[bytes]:
+    """
+    Encode script chunks as a streamed ScriptResponse JSON body.
+    
+    Chunks are escaped one at a time and sent in blocks of about
+    STREAM_CHUNK_SIZE bytes. Errors raised before the first block is sent
+    propagate to the caller; later errors end the script early and are
+    reported in the message field.
+    
+    Args:
+        chunks: The chunks of the generated script.
+        stats: Statistics filled in by the script generator once the script
+            is complete, sent after the message if given.
+        
+    Yields:
+        The blocks of the JSON response body.
+    """
+    buffer = ['{"script": "']
+    size = 0
+    started = False
+    message = "Success"
+    try:
+        for chunk in chunks:
+            encoded = json.dumps(chunk)[1:-1]
+            buffer.append(encoded)
+            size += len(encoded)
+            if size >= STREAM_CHUNK_SIZE:
+                started = True
+                yield "".join(buffer).encode("utf-8")
+                buffer = []
+                size = 0
+    except Exception as e:
+        if not started:
+            raise
+        message = f"Error generating script: {str(e)}"
+    buffer.append(f'", "message": {json.dumps(message)}')
+    if stats is not None:
+        buffer.append(f', "stats": {json.dumps(stats)}')
+    buffer.append("}")
+    yield "".join(buffer).encode("utf-8")
+
+
+@app.post("/call_tools", response_model=ScriptResponse)
+async def call_tools(request: MultiToolCallRequest):
+    """
+    Call multiple tools in sequence and generate a Fusion 360 script.
+    
+    The script is streamed as it is generated, so large sequences are never
+    held in memory in full. Requests that fit in the first block of the
+    response are generated completely before anything is sent. Generation
+    runs in the thread pool, never on the event loop: the checks and the
+    first block here, and the remaining blocks as StreamingResponse reads
+    them.
+    """
+    try:
+        tool_calls = [
+            {"tool_name": call.tool_name, "parameters": call.parameters}
+            for call in request.tool_calls
+        ]
+        stats = (
+            {}
+            if request.compress_loops or request.optimize or request.defer_sketch_compute or request.profile
+            else None
+        )
+        chunks = await run_in_threadpool(
+            iter_multi_tool_script,
+            tool_calls,
+            request.compress_loops,
+            stats,
+            request.optimize,
+            request.defer_sketch_compute,
+            request.profile,
+            request.profile_path,
+        )
+        body = _stream_script_response(chunks, stats)
+        first_block = await run_in_threadpool(next, body)
+        return StreamingResponse(itertools.chain([first_block], body), media_type="application/json")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error generating script: {str(e)}")
+
+
+def run_http_server(poll_interval: float = DEFAULT_POLL_INTERVAL):
+    """
+    Run the HTTP server.
+    
+    Args:
+        poll_interval: Seconds between two checks of the tool registry file
+            for changes; 0 turns reloading off.
+    """
+    REGISTRY.watch(poll_interval)
+    uvicorn.run(app, host="127.0.0.1", port=8000)
+
+
+if __name__ == "__main__":
+    run_http_server()
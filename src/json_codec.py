@@ -0,0 +1,70 @@
+"""
+JSON Codec for Fusion 360 MCP Server
+
+This module encodes and decodes the JSON messages of the MCP stdio server.
+It uses orjson when it is installed, which encodes straight to UTF-8 bytes
+and is several times faster on large scripts, and the standard library
+``json`` module otherwise. Both produce compact JSON.
+
+Set ``FUSION360_MCP_JSON`` to ``json`` to use the standard library even when
+orjson is installed.
+
+Payloads that rarely change, such as the tool list, are encoded once and kept
+as a ``Fragment``, which ``encode_message`` splices into each response as is.
+"""
+
+import json
+import os
+from typing import Any, Callable, Dict, List, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# The JSON library in use: "orjson" or "json"
+JSON_BACKEND = "orjson" if orjson is not None and os.environ.get("FUSION360_MCP_JSON", "orjson") != "json" else "json"
+
+def dumps(obj: Any) -> bytes:
+    """
+    Encode a value as compact JSON.
+
+    Args:
+        obj: The value, made of JSON types.
+
+    Returns:
+        The UTF-8 encoded JSON.
+    """
+    if JSON_BACKEND == "orjson":
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            # orjson rejects integers wider than 64 bits and lone surrogates, which json escapes
+            pass
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+# Decode a JSON message given as UTF-8 bytes or a string; raises ValueError if it is invalid
+loads: Callable[[Union[bytes, str]], Any] = orjson.loads if JSON_BACKEND == "orjson" else json.loads
+
+class Fragment(bytes):
+    """Pre-encoded JSON, written as is when it is the ``result`` of a message."""
+
+def encode_message(message: Union[Dict[str, Any], List[Dict[str, Any]]]) -> bytes:
+    """
+    Encode a JSON-RPC message or batch, splicing in pre-encoded results.
+
+    Args:
+        message: The message, or the list of messages of a batch. A
+            ``result`` that is a Fragment is copied into the output without
+            being encoded again.
+
+    Returns:
+        The UTF-8 encoded JSON.
+    """
+    if isinstance(message, list):
+        return b"[" + b",".join(map(encode_message, message)) + b"]"
+    result = message.get("result")
+    if not isinstance(result, Fragment):
+        return dumps(message)
+    head = dumps({key: value for key, value in message.items() if key != "result"})
+    return head[:-1] + (b',"result":' if len(head) > 2 else b'"result":') + result + b"}"
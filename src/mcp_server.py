@@ -0,0 +1,823 @@
+#!/usr/bin/env python3
+"""
+Fusion 360 MCP Server - MCP stdio mode
+
+This module implements the Model Context Protocol (MCP) over stdin/stdout for
+integration with Cline. It only depends on the script generator and the tool
+registry, so that the process Cline starts for each session does not pay for
+importing the HTTP server (FastAPI, uvicorn, pydantic).
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, BinaryIO, Callable, Dict, Any, Iterable, List, Optional, Union
+
+import json_codec
+
+import script_generator
+from registry import DEFAULT_POLL_INTERVAL, RegistrySnapshot, ToolRegistry
+from script_generator import (
+    generate_script,
+    generate_multi_tool_script,
+    ParameterValidationError,
+)
+from tool_listing import (
+    DEFAULT_FIELDS,
+    Payload,
+    ToolSlices,
+    check_fields,
+    make_payload,
+    make_slices,
+    mcp_tool_list,
+    tool_page,
+)
+from tool_search import DEFAULT_LIMIT, search_tools
+from validators import compile_validator
+
+JSONRPC_VERSION = "2.0"
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+# The types a request id may have: a string, a number or null (not a boolean)
+REQUEST_ID_TYPES = (str, int, float, type(None))
+
+# Number of requests generated concurrently, overridable through the environment
+DEFAULT_WORKERS = int(os.environ.get("FUSION360_MCP_WORKERS", "4"))
+
+# Methods cheap enough to answer on the reading thread, ahead of generations in
+# flight; cancellations must not wait behind the generations they cancel
+INLINE_METHODS = frozenset({"list_tools", "notifications/cancelled"})
+
+# Minimum seconds between two progress notifications for the same request
+PROGRESS_INTERVAL = 0.1
+
+# A tool that combines an ordered list of tool calls into a single script,
+# like the HTTP /call_tools endpoint. It is described in the registry format,
+# so that it is listed and validated like the registry tools.
+CALL_TOOLS_TOOL = {
+    "name": "CallTools",
+    "description": "Runs an ordered list of tool calls and generates a single script for all of them",
+    "parameters": {
+        "tool_calls": {
+            "type": "array",
+            "description": "The tool calls to run in order, each an object with the tool name and its arguments",
+            "items": {"type": "object"},
+        },
+        "compress_loops": {
+            "type": "boolean",
+            "description": "Emit runs of the same tool that differ only in numbers as a single loop",
+            "default": False,
+        },
+        "optimize": {
+            "type": ["boolean", "array"],
+            "description": "Run the default optimization passes (true) or the named passes over the script",
+            "items": {"type": "string"},
+            "default": False,
+        },
+        "defer_sketch_compute": {
+            "type": "boolean",
+            "description": "Defer sketch computation while drawing, until the sketch profiles are used",
+            "default": False,
+        },
+        "profile": {
+            "type": "boolean",
+            "description": "Time each step and write a JSON timing report when the script ends",
+            "default": False,
+        },
+        "profile_path": {
+            "type": ["string", "null"],
+            "description": "Where the script writes the timing report (defaults to the temporary directory)",
+            "default": None,
+        },
+    },
+    "docs": "https://help.autodesk.com/view/fusion360/ENU/",
+}
+
+_validate_call_tools = compile_validator(CALL_TOOLS_TOOL)
+
+# The generation options call_tool takes in its ``options`` object, described
+# like the CallTools arguments they share, so that they are validated alike
+CALL_OPTIONS = {
+    "name": "options",
+    "parameters": {
+        name: CALL_TOOLS_TOOL["parameters"][name]
+        for name in ("optimize", "defer_sketch_compute", "profile", "profile_path")
+    },
+}
+
+_validate_call_options = compile_validator(CALL_OPTIONS)
+
+# A tool that finds the registry tools matching a query and returns their
+# schemas, so that agents need not read the full tool list of large registries
+SEARCH_TOOLS_TOOL = {
+    "name": "SearchTools",
+    "description": "Finds the tools whose names, descriptions or parameter names best match a query, and returns their schemas in the list_tools format",
+    "parameters": {
+        "query": {
+            "type": "string",
+            "description": "Words describing the tool wanted, e.g. 'circle radius' or 'export stl'",
+        },
+        "limit": {
+            "type": "integer",
+            "description": "The most tools returned, best match first",
+            "default": DEFAULT_LIMIT,
+        },
+    },
+    "docs": "https://help.autodesk.com/view/fusion360/ENU/",
+}
+
+_validate_search_tools = compile_validator(SEARCH_TOOLS_TOOL)
+
+# The tools the server provides itself, next to those of the registry
+SERVER_TOOLS = [CALL_TOOLS_TOOL, SEARCH_TOOLS_TOOL]
+SERVER_TOOL_NAMES = frozenset(tool["name"] for tool in SERVER_TOOLS)
+
+
+def _index_tools(snapshot: RegistrySnapshot) -> Dict[str, Dict[str, Any]]:
+    """Map the names of the tools served for a registry snapshot to their definitions."""
+    return {tool["name"]: tool for tool in snapshot.tools + SERVER_TOOLS}
+
+
+def _encode_tool_list(snapshot: RegistrySnapshot, fields: str = DEFAULT_FIELDS) -> Payload:
+    """Encode the list_tools result of a registry snapshot."""
+    return make_payload(mcp_tool_list(snapshot.derived("mcp_tools", _index_tools).values(), fields))
+
+
+def _tool_list(snapshot: RegistrySnapshot, fields: str = DEFAULT_FIELDS) -> Payload:
+    """Get the encoded list_tools result of a registry snapshot, kept in the compiled registry cache."""
+    if fields == DEFAULT_FIELDS:
+        return snapshot.derived("mcp_tool_list", _encode_tool_list, persistent=True)
+    return snapshot.derived(
+        f"mcp_tool_list:{fields}", lambda snapshot: _encode_tool_list(snapshot, fields), persistent=True
+    )
+
+
+def _tool_slices(snapshot: RegistrySnapshot, fields: str) -> ToolSlices:
+    """Get the list_tools entries of a registry snapshot encoded one by one, to serve pages from."""
+    return snapshot.derived(
+        f"mcp_tool_slices:{fields}",
+        lambda snapshot: make_slices(mcp_tool_list(snapshot.derived("mcp_tools", _index_tools).values(), fields)["tools"]),
+        persistent=True,
+    )
+
+
+def error_response(request_id: Any, code: int, message: str) -> Dict[str, Any]:
+    """
+    Build a JSON-RPC error response.
+    
+    Args:
+        request_id: The id of the request, or None if it could not be read.
+        code: The JSON-RPC error code.
+        message: The error message.
+        
+    Returns:
+        The JSON-RPC response.
+    """
+    return {"jsonrpc": JSONRPC_VERSION, "id": request_id, "error": {"code": code, "message": message}}
+
+
+def is_valid_request(request: Any) -> bool:
+    """Check whether a request is a JSON-RPC 2.0 request object with a method and a valid id, or a request without ``jsonrpc``."""
+    return (
+        isinstance(request, dict)
+        and isinstance(request.get("method"), str)
+        and request.get("jsonrpc", JSONRPC_VERSION) == JSONRPC_VERSION
+        and type(request.get("id")) in REQUEST_ID_TYPES
+    )
+
+
+def is_notification(request: Any) -> bool:
+    """Check whether a request is a JSON-RPC 2.0 notification, which gets no response."""
+    return isinstance(request, dict) and request.get("jsonrpc") == JSONRPC_VERSION and "id" not in request
+
+
+class RequestCancelled(Exception):
+    """Raised inside a generation once the client has cancelled its request."""
+
+
+class RequestContext:
+    """
+    The cancellation and progress state of a request in flight.
+    
+    Generations call ``report_progress`` as they go. It sends
+    ``notifications/progress`` if the client asked for them with a
+    ``progressToken`` in ``params._meta``, and raises RequestCancelled once
+    the client has sent ``notifications/cancelled`` for the request.
+    """
+    
+    def __init__(self, request_id: Any, progress_token: Any = None,
+                 notify: Optional[Callable[[Dict[str, Any]], None]] = None):
+        """
+        Initialize the context of a request.
+        
+        Args:
+            request_id: The id of the request.
+            progress_token: The token the client gave for progress notifications, if any.
+            notify: Sends a notification to the client.
+        """
+        self.request_id = request_id
+        self.progress_token = progress_token
+        self.notify = notify
+        self.cancelled = False
+        self._last_progress = 0.0
+    
+    def check_cancelled(self) -> None:
+        """
+        Stop the request if it was cancelled.
+        
+        Raises:
+            RequestCancelled: If the client cancelled the request.
+        """
+        if self.cancelled:
+            raise RequestCancelled(self.request_id)
+    
+    def report_progress(self, progress: int, total: int) -> None:
+        """
+        Report the progress of the request, at most every PROGRESS_INTERVAL seconds.
+        
+        Args:
+            progress: The number of steps done.
+            total: The total number of steps.
+            
+        Raises:
+            RequestCancelled: If the client cancelled the request.
+        """
+        self.check_cancelled()
+        if self.progress_token is None or self.notify is None:
+            return
+        now = time.monotonic()
+        if progress < total and now - self._last_progress < PROGRESS_INTERVAL:
+            return
+        self._last_progress = now
+        self.notify({
+            "jsonrpc": JSONRPC_VERSION,
+            "method": "notifications/progress",
+            "params": {"progressToken": self.progress_token, "progress": progress, "total": total},
+        })
+
+
+class McpServer:
+    """
+    Model Context Protocol (MCP) server implementation.
+    
+    This class implements the MCP protocol for integration with Cline.
+    It exposes the tools of the registry via the MCP protocol.
+    """
+    
+    def __init__(self, notify: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 registry: Optional[ToolRegistry] = None):
+        """
+        Initialize the MCP server.
+        
+        Args:
+            notify: Sends a notification to the client; progress is not
+                reported without it.
+            registry: The tool registry to serve; the script generator's if None.
+        """
+        self.registry = registry or script_generator.REGISTRY
+        self.notify = notify
+        self._in_flight: Dict[Any, RequestContext] = {}
+        self._lock = threading.Lock()
+    
+    @property
+    def tools(self) -> Dict[str, Dict[str, Any]]:
+        """The tools served, by name, from the current registry snapshot."""
+        return self.registry.snapshot.derived("mcp_tools", _index_tools)
+    
+    @property
+    def tool_list(self) -> Payload:
+        """The encoded list_tools result of the current registry snapshot."""
+        return _tool_list(self.registry.snapshot)
+    
+    def tools_changed(self, previous: RegistrySnapshot, snapshot: RegistrySnapshot) -> None:
+        """
+        Tell the client that the tool list changed, after a registry reload.
+        
+        The encoded tool lists of both snapshots are compared by hash, so
+        reloads that leave the tools as they were, such as a reformatted
+        registry file, send nothing. The previous list is only compared if
+        it was already built: building it now could read shards that have
+        changed since, so without it the notification is sent.
+        
+        Args:
+            previous: The snapshot served before the reload.
+            snapshot: The snapshot served from now on.
+        """
+        if self.notify is None:
+            return
+        served = previous.peek("mcp_tool_list")
+        if served is not None and served.etag == _tool_list(snapshot).etag:
+            return
+        self.notify({"jsonrpc": JSONRPC_VERSION, "method": "notifications/tools/list_changed"})
+    
+    def track(self, request: Any) -> Optional[RequestContext]:
+        """
+        Register a request as in flight, so that it can be cancelled even
+        before it starts.
+        
+        Args:
+            request: The decoded request.
+            
+        Returns:
+            The context of the request, or None if it has no usable ``id``
+            or is not a valid request, which is answered without being
+            tracked.
+        """
+        if not is_valid_request(request) or request.get("id") is None:
+            return None
+        request_id = request["id"]
+        if not isinstance(request_id, (str, int)):
+            return None
+        params = request.get("params")
+        meta = params.get("_meta") if isinstance(params, dict) else None
+        progress_token = meta.get("progressToken") if isinstance(meta, dict) else None
+        with self._lock:
+            context = self._in_flight.get(request_id)
+            if context is None:
+                context = self._in_flight[request_id] = RequestContext(request_id, progress_token, self.notify)
+        return context
+    
+    def handle_request(self, request: Any) -> Optional[Dict[str, Any]]:
+        """
+        Handle a JSON-RPC 2.0 request.
+        
+        The response echoes the ``id`` of the request. Notifications are
+        handled but get no response. Requests without a ``jsonrpc`` member
+        are answered as before, with a null ``id`` if they have none.
+        
+        Args:
+            request: The decoded request.
+            
+        Returns:
+            The JSON-RPC response, or None for a notification.
+        """
+        if not is_valid_request(request):
+            request_id = request.get("id") if isinstance(request, dict) else None
+            if type(request_id) not in REQUEST_ID_TYPES:
+                # An id that is not a valid one cannot be echoed
+                request_id = None
+            return error_response(request_id, INVALID_REQUEST, "Invalid Request")
+        
+        context = self.track(request)
+        try:
+            response = self._dispatch(request["method"], request.get("params", {}), context)
+        except RequestCancelled:
+            # Cancelled requests get no response
+            return None
+        except Exception as e:
+            response = {"error": {"code": INTERNAL_ERROR, "message": f"Internal error: {str(e)}"}}
+        finally:
+            if context is not None:
+                with self._lock:
+                    self._in_flight.pop(context.request_id, None)
+        
+        if is_notification(request):
+            return None
+        return {"jsonrpc": JSONRPC_VERSION, "id": request.get("id"), **response}
+    
+    def handle_batch(self, requests: List[Any]) -> Union[List[Dict[str, Any]], Dict[str, Any], None]:
+        """
+        Handle a JSON-RPC 2.0 batch, in order.
+        
+        Args:
+            requests: The decoded requests of the batch.
+            
+        Returns:
+            The responses, without those of notifications; None if the
+            batch only holds notifications. An empty batch is answered with
+            a single Invalid Request error, as JSON-RPC requires.
+        """
+        if not requests:
+            return error_response(None, INVALID_REQUEST, "Invalid Request: empty batch")
+        responses = [response for response in map(self.handle_request, requests) if response is not None]
+        return responses or None
+    
+    def _dispatch(self, method: str, params: Any, context: Optional[RequestContext] = None) -> Dict[str, Any]:
+        """
+        Call the handler of a method.
+        
+        Args:
+            method: The name of the method.
+            params: The parameters of the request.
+            context: The context of the request, if it has an id.
+            
+        Returns:
+            The ``result`` or ``error`` member of the response.
+        """
+        if method == "list_tools":
+            return self._handle_list_tools(params if isinstance(params, dict) else {})
+        elif method in ("call_tool", "notifications/cancelled") and not isinstance(params, dict):
+            return {
+                "error": {
+                    "code": INVALID_PARAMS,
+                    "message": "Invalid params: must be an object",
+                }
+            }
+        elif method == "call_tool":
+            return self._handle_call_tool(params, context)
+        elif method == "notifications/cancelled":
+            return self._handle_cancelled(params)
+        else:
+            return {
+                "error": {
+                    "code": METHOD_NOT_FOUND,
+                    "message": f"Method not found: {method}",
+                }
+            }
+    
+    def _handle_list_tools(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Handle a list_tools request.
+        
+        The tool list is encoded once per registry snapshot and projection,
+        and written into each response as is. A request with a ``cursor`` or
+        a ``limit`` gets a page of the list, joined from tools encoded one by
+        one, with a ``nextCursor`` unless it is the last page.
+        
+        Args:
+            params: The optional ``fields`` (a projection of FIELD_SETS),
+                ``cursor`` and ``limit`` of the request.
+            
+        Returns:
+            The MCP response, with the pre-encoded tool list or page as its result.
+        """
+        fields = params.get("fields", DEFAULT_FIELDS)
+        cursor = params.get("cursor")
+        limit = params.get("limit")
+        try:
+            if not isinstance(fields, str):
+                raise ValueError("fields must be a string")
+            check_fields(fields)
+            if cursor is not None and not isinstance(cursor, str):
+                raise ValueError("cursor must be a string")
+            if limit is not None and (not isinstance(limit, int) or isinstance(limit, bool)):
+                raise ValueError("limit must be an integer")
+            snapshot = self.registry.snapshot
+            if cursor is None and limit is None:
+                return {"result": _tool_list(snapshot, fields).body}
+            return {"result": tool_page(_tool_slices(snapshot, fields), cursor, limit).body}
+        except ValueError as e:
+            return {
+                "error": {
+                    "code": INVALID_PARAMS,
+                    "message": f"Invalid params: {e}",
+                }
+            }
+    
+    def _handle_cancelled(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Handle a notifications/cancelled notification.
+        
+        The request is stopped at its next progress check, or before it
+        starts if it is still queued, and gets no response.
+        
+        Args:
+            params: The notification parameters, with the ``requestId`` of
+                the request to cancel.
+            
+        Returns:
+            An empty result; unknown or finished requests are ignored.
+        """
+        request_id = params.get("requestId")
+        with self._lock:
+            context = self._in_flight.get(request_id) if isinstance(request_id, (str, int)) else None
+        if context is not None:
+            context.cancelled = True
+        return {"result": {}}
+    
+    def _handle_call_tool(self, params: Dict[str, Any], context: Optional[RequestContext] = None) -> Dict[str, Any]:
+        """
+        Handle a call_tool request.
+        
+        Args:
+            params: The parameters for the tool call. Generation options
+                (``optimize``, ``defer_sketch_compute``, ``profile``,
+                ``profile_path``) can be given in an
+                ``options`` object.
+            context: The context of the request, checked for cancellation
+                and told about the progress of CallTools generations.
+            
+        Returns:
+            The MCP response.
+        
+        Raises:
+            RequestCancelled: If the request was cancelled.
+        """
+        if context is not None:
+            context.check_cancelled()
+        
+        # The whole request is served from the snapshot current when it starts
+        snapshot = self.registry.snapshot
+        tool_name = params.get("name")
+        arguments = params.get("arguments", {})
+        options = params.get("options")
+        if options is None:
+            options = {}
+        
+        if not tool_name:
+            return {
+                "error": {
+                    "code": INVALID_PARAMS,
+                    "message": "Invalid params: missing tool name",
+                }
+            }
+        if not isinstance(options, dict):
+            return {
+                "error": {
+                    "code": INVALID_PARAMS,
+                    "message": "Invalid params: options must be an object",
+                }
+            }
+        unknown = [name for name in options if name not in CALL_OPTIONS["parameters"]]
+        if unknown:
+            return {
+                "error": {
+                    "code": INVALID_PARAMS,
+                    "message": f"Invalid params: unknown options: {', '.join(unknown)}",
+                }
+            }
+        
+        # Checked against the index, so a call only loads the shard of its own tool
+        if tool_name not in SERVER_TOOL_NAMES and tool_name not in snapshot.by_name:
+            return {
+                "error": {
+                    "code": INVALID_PARAMS,
+                    "message": f"Invalid params: unknown tool: {tool_name}",
+                }
+            }
+        
+        try:
+            if tool_name == CALL_TOOLS_TOOL["name"]:
+                return {"result": self._call_tools(arguments, snapshot, context)}
+            if tool_name == SEARCH_TOOLS_TOOL["name"]:
+                return {"result": self._search_tools(arguments, snapshot)}
+            
+            _validate_call_options(options)
+            script = generate_script(
+                tool_name,
+                arguments,
+                optimize=options.get("optimize", False),
+                defer_sketch_compute=options.get("defer_sketch_compute", False),
+                profile=options.get("profile", False),
+                profile_path=options.get("profile_path"),
+                snapshot=snapshot,
+            )
+            return {
+                "result": {
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": script,
+                        }
+                    ]
+                }
+            }
+        except ParameterValidationError as e:
+            return {
+                "error": {
+                    "code": INVALID_PARAMS,
+                    "message": f"Invalid params: {str(e)}",
+                    "data": {"errors": e.errors},
+                }
+            }
+        except ValueError as e:
+            return {
+                "error": {
+                    "code": INVALID_PARAMS,
+                    "message": f"Invalid params: {str(e)}",
+                }
+            }
+        except RequestCancelled:
+            # Cancelled requests get no response
+            raise
+        except Exception as e:
+            return {
+                "error": {
+                    "code": INTERNAL_ERROR,
+                    "message": f"Internal error: {str(e)}",
+                }
+            }
+
+
+    def _call_tools(self, arguments: Dict[str, Any], snapshot: RegistrySnapshot,
+                    context: Optional[RequestContext] = None) -> Dict[str, Any]:
+        """
+        Generate a single script for the tool calls of a CallTools call.
+        
+        Args:
+            arguments: The ``tool_calls``, each with a ``name`` and
+                ``arguments``, and the generation options of
+                CALL_TOOLS_TOOL.
+            snapshot: The registry snapshot to generate with.
+            context: The context of the request, if any.
+            
+        Returns:
+            The result, with the script and, if generation options were
+            given, the script statistics under ``stats``.
+            
+        Raises:
+            ParameterValidationError: If the arguments or the parameters of
+                any call are invalid.
+            ValueError: If a call names no tool or an unknown tool.
+            RequestCancelled: If the request is cancelled while generating.
+        """
+        _validate_call_tools(arguments)
+        tool_calls = []
+        for step, call in enumerate(arguments["tool_calls"], 1):
+            if not isinstance(call.get("name"), str):
+                raise ValueError(f"Step {step}: missing tool name")
+            tool_calls.append({"tool_name": call["name"], "parameters": call.get("arguments", {})})
+        
+        options = {
+            name: arguments.get(name, schema["default"])
+            for name, schema in CALL_TOOLS_TOOL["parameters"].items()
+            if name != "tool_calls"
+        }
+        stats = {} if any(options.values()) else None
+        script = generate_multi_tool_script(
+            tool_calls,
+            stats=stats,
+            progress=context.report_progress if context is not None else None,
+            snapshot=snapshot,
+            **options,
+        )
+        result = {"content": [{"type": "text", "text": script}]}
+        if stats is not None:
+            result["stats"] = stats
+        return result
+    
+    def _search_tools(self, arguments: Dict[str, Any], snapshot: RegistrySnapshot) -> Dict[str, Any]:
+        """
+        Find the registry tools matching the query of a SearchTools call.
+        
+        Args:
+            arguments: The ``query`` and ``limit`` of SEARCH_TOOLS_TOOL.
+            snapshot: The registry snapshot to search.
+            
+        Returns:
+            The result, with the matching tools in the list_tools format as
+            JSON text, and as is under ``tools``.
+            
+        Raises:
+            ParameterValidationError: If the arguments are invalid.
+        """
+        _validate_search_tools(arguments)
+        limit = arguments.get("limit", DEFAULT_LIMIT)
+        if limit < 1:
+            raise ParameterValidationError([f"Invalid limit: must be at least 1, got {limit}"], SEARCH_TOOLS_TOOL["name"])
+        tools = mcp_tool_list(search_tools(snapshot, arguments["query"], limit))
+        return {
+            "content": [{"type": "text", "text": json_codec.dumps(tools).decode("utf-8")}],
+            "tools": tools["tools"],
+        }
+
+
+def _runs_on_worker(request: Union[Dict[str, Any], List[Any]]) -> bool:
+    """Check whether a request or notification, or any member of a batch, is handled on a worker thread."""
+    if isinstance(request, list):
+        return any(map(_runs_on_worker, request))
+    return is_valid_request(request) and request["method"] not in INLINE_METHODS
+
+
+def run_mcp_server(stdin: Optional[Iterable[Union[bytes, str]]] = None,
+                   stdout: Optional[BinaryIO] = None,
+                   workers: int = DEFAULT_WORKERS,
+                   poll_interval: float = DEFAULT_POLL_INTERVAL):
+    """
+    Run the MCP server on stdio until stdin is closed.
+    
+    Args:
+        stdin: The lines to read requests from; the bytes of ``sys.stdin`` if None.
+        stdout: The binary stream to write responses to; the bytes of
+            ``sys.stdout`` if None.
+        workers: The number of requests generated concurrently.
+        poll_interval: Seconds between two checks of the tool registry file
+            for changes; 0 turns reloading off.
+    """
+    server = McpServer()
+    server.registry.watch(poll_interval)
+    asyncio.run(serve_stdio(
+        server,
+        sys.stdin.buffer if stdin is None else stdin,
+        sys.stdout.buffer if stdout is None else stdout,
+        workers,
+    ))
+
+
+def _start_line_reader(stdin: Iterable[Union[bytes, str]]) -> Callable[[], Awaitable[Union[bytes, str]]]:
+    """
+    Read lines from stdin without blocking the event loop.
+    
+    The lines are read on a separate thread, which hands them over to the
+    event loop. This works the same for pipes, consoles and files on every
+    platform, where reading stdin from the event loop itself does not.
+    
+    Args:
+        stdin: The lines to read.
+        
+    Returns:
+        A coroutine function returning the next line, or an empty string at
+        the end of the input.
+    """
+    loop = asyncio.get_running_loop()
+    lines: "asyncio.Queue[Union[bytes, str]]" = asyncio.Queue()
+    
+    def read_lines() -> None:
+        for line in stdin:
+            loop.call_soon_threadsafe(lines.put_nowait, line)
+        loop.call_soon_threadsafe(lines.put_nowait, "")
+    
+    threading.Thread(target=read_lines, name="mcp-stdin", daemon=True).start()
+    return lines.get
+
+
+async def serve_stdio(server: McpServer, stdin: Iterable[Union[bytes, str]], stdout: BinaryIO,
+                      workers: int = DEFAULT_WORKERS):
+    """
+    Serve MCP requests, one JSON-RPC message per line, until the input ends.
+    
+    The event loop reads and dispatches the requests. Requests and
+    notifications are generated in a pool of worker threads, so many can be
+    in flight at once and a slow one never holds up reading; each worker
+    writes its response, and any progress notifications, as soon as they
+    are ready, and clients match them by ``id``. ``list_tools``,
+    ``notifications/cancelled`` and invalid requests are answered on the
+    event loop as soon as they are read, so they never wait behind a slow
+    generation.
+    
+    A batch (a JSON array of requests) is handled in one pass, by a single
+    worker, and answered with a single array written at once.
+    
+    Messages are encoded by ``json_codec`` straight to bytes and written to
+    the binary stream, with a single flush per response or batch.
+    
+    When the tool registry is reloaded with a different tool list, a
+    ``notifications/tools/list_changed`` notification is sent, so the client
+    knows to call ``list_tools`` again.
+    
+    Args:
+        server: The server handling the requests.
+        stdin: The lines to read requests from. They are read on a separate
+            thread, since reading stdin blocks.
+        stdout: The binary stream to write responses and notifications to.
+        workers: The number of requests generated concurrently.
+    """
+    read_line = _start_line_reader(stdin)
+    write_lock = threading.Lock()
+    
+    def write(message: Any) -> None:
+        data = json_codec.encode_message(message)
+        with write_lock:
+            stdout.write(data)
+            stdout.write(b"\n")
+            stdout.flush()
+    
+    def handle(request: Any) -> Any:
+        if isinstance(request, list):
+            return server.handle_batch(request)
+        return server.handle_request(request)
+    
+    def respond(request: Any) -> None:
+        response = handle(request)
+        if response is not None:
+            write(response)
+    
+    # Workers write their responses and notifications as soon as they are ready
+    server.notify = write
+    server.registry.add_listener(server.tools_changed)
+    
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        try:
+            while True:
+                line = await read_line()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    request = json_codec.loads(line)
+                except ValueError as e:
+                    write(error_response(None, PARSE_ERROR, f"Parse error: {str(e)}"))
+                    continue
+                
+                if _runs_on_worker(request):
+                    for member in request if isinstance(request, list) else [request]:
+                        server.track(member)
+                    executor.submit(respond, request)
+                else:
+                    respond(request)
+        finally:
+            server.registry.remove_listener(server.tools_changed)
+
+
+if __name__ == "__main__":
+    run_mcp_server()
@@ -0,0 +1,1004 @@
+"""
+Tool Registry for Fusion 360 MCP Server
+
+This module loads the tool registry into immutable snapshots and reloads it
+while the servers run, so tools added with ``tools/add_tool.py`` are picked
+up without a restart.
+
+A registry is either a single JSON file holding the list of tool
+definitions, or a sharded directory::
+
+    tool_registry/
+        index.json              [{"name", "description", "parameters", "hash"}, ...]
+        tools/<name>.json       the definition of each tool
+        templates/<name>.template
+                                its script template, if it is not
+                                registered in code
+        versions/<name>.<hash>.json, versions/<name>.<hash>.template
+                                a copy of each shard as indexed, by hash
+
+The index is all that is read when a sharded registry loads. The definition
+of a tool, its template and its processor are loaded on first use, and the
+``hash`` in the index (see ``tool_version``) tells which of them are still
+current after a reload. Adding a tool only writes its shard and the index.
+
+Since shards are read on first use, a snapshot may read a shard long after
+it was loaded, when a writer may already have replaced it. Snapshots
+therefore read the copy of the shard in ``versions`` that has the hash
+their index lists, which writers never change; the shards themselves are
+the files edited by hand, only read when there is no such copy. Writing the
+index removes the copies it no longer lists once they have been superseded
+for ``VERSION_RETENTION`` seconds, which leaves the snapshots of running
+servers ample time to finish the requests that use them.
+
+Writers such as ``tools/add_tool.py`` replace files with ``atomic_write``, so
+a reloading server never reads a partial file, and hold ``registry_lock`` so
+that concurrent writers do not lose each other's changes.
+
+Tools provided by tool packs (see ``tool_packs``) are added after the
+registry's own tools, which take precedence. Their processors are always
+bound on first use, since binding them imports the pack's code.
+
+A reload builds a complete new ``RegistrySnapshot`` and swaps it in with a
+single assignment. Requests capture the current snapshot once when they
+start, so a request in flight keeps using the snapshot it started with while
+new requests see the new one. Data derived from the registry, such as the
+encoded tool lists, is memoized on the snapshot it was derived from and so
+is never served stale.
+
+The standard library has no portable file watcher, so ``ToolRegistry.watch``
+polls the modification time, size and inode of the file, or of the index,
+instead. Polling a stat is cheap, and the file is only read and hashed when
+one of them changes.
+
+Parsing the registry and compiling a validator for every tool is repeated by
+every server process. The registry can therefore keep a compiled cache next
+to the JSON file, like the ``.pyc`` files of Python modules: the parsed
+tools, the compiled validators (as marshalled code) and the derived values
+marked as persistent, such as the pre-encoded tool lists. The cache is used
+when the file's modification time, size and inode match those it was saved
+with, or failing that when the SHA-256 of the file contents matches.
+
+The cache is rewritten whenever the registry, the set of compiled tools or a
+persistent derived value changes, but not by the request that changed it:
+the change only marks the cache out of date, and a background timer writes
+it ``CACHE_SAVE_DELAY`` seconds later, saving every change made meanwhile in
+one write. Caches still out of date are written when the process exits.
+"""
+
+import atexit
+import contextlib
+import hashlib
+import json
+import marshal
+import os
+import pickle
+import re
+import sys
+import threading
+import time
+import weakref
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Reload polling interval in seconds, overridable through the environment; 0 turns polling off
+DEFAULT_POLL_INTERVAL = float(os.environ.get("FUSION360_MCP_REGISTRY_POLL_INTERVAL", "1.0"))
+
+# Builds the processors of a tool list, reusing those of the previous snapshot and
+# the compiled tools where possible, and adding the tools it compiles to the latter
+ProcessorBuilder = Callable[[List[Dict[str, Any]], Optional[Dict[str, Any]], Dict[str, Tuple]], Dict[str, Any]]
+
+# Bumped when the layout of the compiled registry cache changes
+CACHE_FORMAT = 2
+
+# Seconds between a change to the compiled registry cache and its write, so
+# that the tools compiled and the values derived meanwhile are written at once
+CACHE_SAVE_DELAY = 1.0
+
+# The layout of a sharded registry directory
+INDEX_FILE = "index.json"
+TOOLS_DIR = "tools"
+TEMPLATES_DIR = "templates"
+VERSIONS_DIR = "versions"
+TEMPLATE_SUFFIX = ".template"
+
+# Seconds the copies of superseded shards are kept, for snapshots still in use
+VERSION_RETENTION = 3600.0
+
+# Tool names are identifiers, since they also name the shard files of a tool
+_TOOL_NAME = re.compile(r"[A-Za-z_][A-Za-z0-9_]*\Z")
+
+_MISSING = object()
+
+# The stat key of a registry file that cannot be found
+_NO_FILE = (-1, -1, -1)
+
+def tool_version(tool: Dict[str, Any]) -> str:
+    """
+    Hash a tool definition, to tell apart the versions of a tool across reloads.
+
+    Args:
+        tool: The tool definition from the registry.
+
+    Returns:
+        A short hex digest of the definition.
+    """
+    return hashlib.sha1(json.dumps(tool, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+def check_tool_name(name: Any) -> None:
+    """
+    Check that a tool name is an identifier, so that it can name files.
+
+    Args:
+        name: The tool name.
+
+    Raises:
+        ValueError: If the name is not made of ASCII letters, digits and
+            underscores, starting with a letter or underscore; such a name
+            could hold path separators or ``..``.
+    """
+    if not isinstance(name, str) or not _TOOL_NAME.match(name):
+        raise ValueError(
+            f"Invalid tool name {name!r}: must be letters, digits and underscores, not starting with a digit"
+        )
+
+def template_version(source: str) -> str:
+    """
+    Hash the source of a script template kept in a registry shard.
+
+    Args:
+        source: The template source.
+
+    Returns:
+        A short hex digest of the source.
+    """
+    return hashlib.sha1(source.encode("utf-8")).hexdigest()[:12]
+
+def index_entry(tool: Dict[str, Any], template: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Describe a tool in the index of a sharded registry.
+
+    Args:
+        tool: The tool definition.
+        template: The source of its script template, if it has a shard.
+
+    Returns:
+        The index entry: the name, the description, the parameter names and
+        the hash of the definition, and the hash of the template if any.
+    """
+    entry = {
+        "name": tool["name"],
+        "description": tool.get("description", ""),
+        "parameters": list(tool["parameters"]),
+        "hash": tool_version(tool),
+    }
+    if template is not None:
+        entry["template"] = template_version(template)
+    return entry
+
+def shard_path(directory: str, name: str, template: bool = False, version: Optional[str] = None) -> str:
+    """
+    Locate the definition or template shard of a tool in a sharded registry.
+
+    Args:
+        directory: The registry directory.
+        name: The name of the tool.
+        template: Locate the template shard instead of the definition.
+        version: Locate the copy of the shard with this hash instead (see
+            ``tool_version`` and ``template_version``).
+
+    Returns:
+        The path of the shard.
+
+    Raises:
+        ValueError: If the name is not a valid tool name (see check_tool_name).
+    """
+    check_tool_name(name)
+    suffix = TEMPLATE_SUFFIX if template else ".json"
+    if version is not None:
+        return os.path.join(directory, VERSIONS_DIR, f"{name}.{version}{suffix}")
+    return os.path.join(directory, TEMPLATES_DIR if template else TOOLS_DIR, name + suffix)
+
+def atomic_write(path: str, data: bytes) -> None:
+    """
+    Replace a file with new contents at once.
+
+    The data is written to a temporary file next to it, flushed to disk and
+    renamed over the file, so that readers see the old or the new contents,
+    never a partial write, even if the writer crashes.
+
+    Args:
+        path: The file to replace.
+        data: Its new contents.
+    """
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(temp_path)
+        raise
+
+@contextlib.contextmanager
+def registry_lock(path: str) -> Iterator[None]:
+    """
+    Hold the write lock of a registry file or directory.
+
+    The lock is an advisory lock on ``<path>.lock``, taken by every writer;
+    the servers only read the registry and never take it.
+
+    Args:
+        path: The registry file or directory.
+
+    Yields:
+        Once the lock is held.
+    """
+    with open(path.rstrip("/\\") + ".lock", "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            # Retried for 10 seconds before raising OSError
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+def read_index(directory: str) -> List[Dict[str, Any]]:
+    """
+    Read the index of a sharded registry.
+
+    Args:
+        directory: The registry directory.
+
+    Returns:
+        The index entries.
+    """
+    with open(os.path.join(directory, INDEX_FILE), "rb") as f:
+        return json.loads(f.read())
+
+def _version_files(index: List[Dict[str, Any]]) -> List[str]:
+    """List the file names of the shard copies an index refers to."""
+    names = []
+    for entry in index:
+        names.append(f"{entry['name']}.{entry['hash']}.json")
+        if "template" in entry:
+            names.append(f"{entry['name']}.{entry['template']}{TEMPLATE_SUFFIX}")
+    return names
+
+def write_index(directory: str, index: List[Dict[str, Any]]) -> None:
+    """
+    Write the index of a sharded registry, which makes its changes visible to the servers.
+
+    The copies of the shards the previous index listed and this one does not
+    are marked superseded, and those superseded more than VERSION_RETENTION
+    seconds ago are removed.
+
+    Args:
+        directory: The registry directory.
+        index: The index entries.
+    """
+    try:
+        previous = read_index(directory)
+    except (OSError, ValueError):
+        previous = []
+    atomic_write(os.path.join(directory, INDEX_FILE), json.dumps(index, indent=2).encode("utf-8"))
+
+    versions = os.path.join(directory, VERSIONS_DIR)
+    current = set(_version_files(index))
+    with contextlib.suppress(OSError):
+        # Modification time: the time a copy was superseded
+        for name in set(_version_files(previous)) - current:
+            with contextlib.suppress(OSError):
+                os.utime(os.path.join(versions, name))
+        expired = time.time() - VERSION_RETENTION
+        for entry in os.scandir(versions):
+            if entry.name not in current and entry.stat().st_mtime < expired:
+                with contextlib.suppress(OSError):
+                    os.remove(entry.path)
+
+def _write_version(directory: str, name: str, data: bytes, version: str, template: bool = False) -> None:
+    """Write the copy of a shard with a given hash, unless it already exists."""
+    path = shard_path(directory, name, template, version)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        atomic_write(path, data)
+
+def write_shard(directory: str, tool: Dict[str, Any], template: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Write the definition of a tool, and its template if given, to their
+    shards and to the copies of the shards for their hash.
+
+    Args:
+        directory: The registry directory.
+        tool: The tool definition.
+        template: The source of its script template.
+
+    Returns:
+        The index entry of the tool (see ``index_entry``).
+    """
+    entry = index_entry(tool, template)
+    data = json.dumps(tool, indent=2).encode("utf-8")
+    path = shard_path(directory, tool["name"])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    atomic_write(path, data)
+    _write_version(directory, tool["name"], data, entry["hash"])
+    if template is not None:
+        data = template.encode("utf-8")
+        path = shard_path(directory, tool["name"], template=True)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        atomic_write(path, data)
+        _write_version(directory, tool["name"], data, entry["template"], template=True)
+    return entry
+
+class LazyTools(Mapping[str, Dict[str, Any]]):
+    """
+    The tool definitions of a sharded registry by name, read on first access.
+
+    Membership, iteration (in index order) and length only use the index.
+    Definitions and templates are read from the copies of their shards with
+    the hash in the index, so a snapshot reads them as they were when it
+    loaded; from the shards themselves if there is no copy. Either is checked
+    against the hash, so a shard edited without updating the index is an
+    error rather than a stale cache entry.
+    """
+
+    def __init__(self, directory: str, index: List[Dict[str, Any]],
+                 loaded: Optional[Dict[str, Dict[str, Any]]] = None,
+                 extra: Optional[Dict[str, Dict[str, Any]]] = None):
+        """
+        Wrap the index of a sharded registry.
+
+        Args:
+            directory: The registry directory.
+            index: The index entries.
+            loaded: Definitions already read, by name, such as the unchanged
+                tools of the previous snapshot.
+            extra: Definitions to list after those of the index, such as
+                the tools of tool packs; the index takes precedence.
+        """
+        self.directory = directory
+        self.index = index
+        self._entries = {entry["name"]: entry for entry in index}
+        extra = {name: tool for name, tool in (extra or {}).items() if name not in self._entries}
+        self._entries.update((name, index_entry(tool)) for name, tool in extra.items())
+        self.loaded: Dict[str, Dict[str, Any]] = {
+            name: tool for name, tool in (loaded or {}).items() if name in self._entries
+        }
+        self.loaded.update(extra)
+
+    def __getitem__(self, name: str) -> Dict[str, Any]:
+        tool = self.loaded.get(name)
+        if tool is None:
+            entry = self._entries[name]
+            tool = json.loads(self._read_shard(name, entry["hash"]))
+            if not isinstance(tool, dict) or tool.get("name") != name or tool_version(tool) != entry["hash"]:
+                raise ValueError(f"The definition of {name} does not match the registry index; run tools/add_tool.py reindex")
+            tool = self.loaded.setdefault(name, tool)
+        return tool
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._entries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def entry(self, name: str) -> Dict[str, Any]:
+        """
+        Get the index entry of a tool, without reading its shard.
+
+        Args:
+            name: The name of the tool.
+
+        Returns:
+            The index entry (see ``index_entry``).
+        """
+        return self._entries[name]
+
+    def template(self, name: str) -> Optional[str]:
+        """
+        Read the template shard of a tool.
+
+        Args:
+            name: The name of the tool.
+
+        Returns:
+            The template source, or None if the tool has no template shard.
+
+        Raises:
+            ValueError: If the shard does not match the hash in the index.
+        """
+        expected = self._entries[name].get("template")
+        if expected is None:
+            return None
+        source = self._read_shard(name, expected, template=True)
+        if template_version(source) != expected:
+            raise ValueError(f"The template of {name} does not match the registry index; run tools/add_tool.py reindex")
+        return source
+
+    def _read_shard(self, name: str, version: str, template: bool = False) -> Union[bytes, str]:
+        """
+        Read the copy of a shard with the given hash, or the shard itself if
+        there is none; as text for a template, as bytes for a definition.
+        """
+        mode, encoding = ("r", "utf-8") if template else ("rb", None)
+        try:
+            with open(shard_path(self.directory, name, template, version), mode, encoding=encoding) as f:
+                return f.read()
+        except FileNotFoundError:
+            with open(shard_path(self.directory, name, template), mode, encoding=encoding) as f:
+                return f.read()
+
+    def unchanged(self, index: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Select the definitions already read that a new index still lists as is.
+
+        Args:
+            index: The new index entries.
+
+        Returns:
+            The definitions by name.
+        """
+        hashes = {entry["name"]: entry["hash"] for entry in index}
+        return {
+            name: tool
+            for name, tool in self.loaded.copy().items()
+            if hashes.get(name) == self._entries[name]["hash"]
+        }
+
+class LazyProcessors(Mapping[str, Any]):
+    """The parameter processors of a snapshot by tool name, bound on first access."""
+
+    def __init__(self, by_name: Mapping[str, Dict[str, Any]], build_processors: "ProcessorBuilder",
+                 previous: Optional[Dict[str, Any]], compiled: Dict[str, Tuple]):
+        """
+        Prepare to bind the processors of the tools of an index.
+
+        Args:
+            by_name: The tool definitions.
+            build_processors: The processor builder (see ``ToolRegistry``).
+            previous: The processors bound by the previous snapshot.
+            compiled: The compiled tools by name, completed as tools are compiled.
+        """
+        self.built: Dict[str, Any] = {}
+        self.on_compile: Optional[Callable[[], None]] = None
+        self._by_name = by_name
+        self._build_processors = build_processors
+        self._previous = previous or {}
+        self._compiled = compiled
+
+    def __getitem__(self, name: str) -> Any:
+        processor = self.built.get(name)
+        if processor is None:
+            tool = self._by_name[name]
+            before = self._compiled.get(name)
+            previous = {name: self._previous[name]} if name in self._previous else None
+            processor = self.built.setdefault(name, self._build_processors([tool], previous, self._compiled)[name])
+            if self._compiled.get(name) is not before and self.on_compile is not None:
+                self.on_compile()
+        return processor
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._by_name
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._by_name)
+
+    def __len__(self) -> int:
+        return len(self._by_name)
+
+class RegistrySnapshot:
+    """
+    One immutable version of the tool registry.
+
+    Attributes:
+        version: Increases by one with every snapshot swapped in.
+        by_name: The tool definitions by tool name, in registry order.
+        processors: The parameter processors by tool name.
+        digest: The SHA-256 hex digest of the registry file, or index, contents.
+        compiled: The compiled form of each tool by name, as produced by the
+            processor builder; saved in the compiled registry cache.
+    """
+
+    __slots__ = ("version", "by_name", "processors", "digest", "compiled", "_tools", "_derived", "_persistent", "_save")
+
+    def __init__(self, version: int, by_name: Mapping[str, Dict[str, Any]], processors: LazyProcessors,
+                 digest: str, compiled: Optional[Dict[str, Tuple]] = None):
+        """
+        Create a snapshot.
+
+        Args:
+            version: The snapshot version.
+            by_name: The tool definitions by name.
+            processors: The parameter processors by tool name.
+            digest: The digest of the registry file contents.
+            compiled: The compiled tools by name.
+        """
+        self.version = version
+        self.by_name = by_name
+        self.processors = processors
+        self.digest = digest
+        self.compiled = compiled if compiled is not None else {}
+        self._tools: Optional[List[Dict[str, Any]]] = None
+        self._derived: Dict[str, Any] = {}
+        self._persistent: Dict[str, Any] = {}
+        self._save: Optional[Callable[["RegistrySnapshot"], None]] = None
+
+    @property
+    def tools(self) -> List[Dict[str, Any]]:
+        """The tool definitions, in registry order; this reads every shard of a sharded registry."""
+        if self._tools is None:
+            self._tools = list(self.by_name.values())
+        return self._tools
+
+    def template(self, name: str) -> Optional[str]:
+        """
+        Get the script template shipped with a tool in a sharded registry.
+
+        Args:
+            name: The name of the tool.
+
+        Returns:
+            The template source, or None if the registry has none for the tool.
+        """
+        if isinstance(self.by_name, LazyTools) and name in self.by_name:
+            return self.by_name.template(name)
+        return None
+
+    def derived(self, key: str, build: Callable[["RegistrySnapshot"], Any], persistent: bool = False) -> Any:
+        """
+        Get a value derived from this snapshot, building it on first use.
+
+        Args:
+            key: The name of the derived value.
+            build: Builds the value from the snapshot. It may run more than
+                once if threads race, but only one result is kept.
+            persistent: Save the value in the compiled registry cache, so
+                later processes load it instead of building it. It must be
+                picklable, and depend only on the registry and the code of
+                the server.
+
+        Returns:
+            The derived value.
+        """
+        value = self._derived.get(key, _MISSING)
+        if value is _MISSING:
+            value = self._persistent.get(key, _MISSING) if persistent else _MISSING
+            if value is _MISSING:
+                value = build(self)
+                if persistent:
+                    self._persistent.setdefault(key, value)
+                    if self._save is not None:
+                        self._save(self)
+            value = self._derived.setdefault(key, value)
+        return value
+
+    def peek(self, key: str) -> Any:
+        """
+        Get a value derived from this snapshot if it was already built, or
+        loaded from the compiled registry cache, without building it.
+
+        Args:
+            key: The name of the derived value.
+
+        Returns:
+            The derived value, or None if there is none yet.
+        """
+        value = self._derived.get(key, _MISSING)
+        if value is _MISSING:
+            value = self._persistent.get(key)
+        return value
+
+class ToolRegistry:
+    """
+    The tool registry file and its current snapshot.
+
+    Reading ``snapshot`` never blocks; reloads are serialized among
+    themselves and swap the new snapshot in with a single assignment.
+    """
+
+    def __init__(self, path: str, build_processors: ProcessorBuilder,
+                 cache_path: Optional[str] = None, cache_tag: str = "",
+                 pack_tools: Iterable[Dict[str, Any]] = ()):
+        """
+        Load the registry, or its compiled cache if it is up to date.
+
+        Args:
+            path: The path of the registry JSON file, or of a sharded
+                registry directory.
+            build_processors: Called as ``build_processors(tools, previous,
+                compiled)`` to bind the parameter processors of a tool list,
+                where ``previous`` holds the processors of the current
+                snapshot and ``compiled`` the compiled tools by name, which
+                it uses where they are current and completes.
+            cache_path: Where to keep the compiled registry cache; no cache
+                is kept if None. A cache that cannot be read or written is
+                ignored.
+            cache_tag: Identifies the code that produced the cached values;
+                a cache saved with another tag is not used.
+            pack_tools: The tool definitions of tool packs, listed after the
+                registry's own tools; their processors are bound on first use.
+
+        Raises:
+            OSError: If the file cannot be read.
+            ValueError: If the file is not a valid tool registry.
+        """
+        self.path = path
+        self.sharded = os.path.isdir(path)
+        self._source = os.path.join(path, INDEX_FILE) if self.sharded else path
+        self.cache_path = cache_path
+        self.pack_tools = {tool["name"]: tool for tool in pack_tools}
+        self._cache_key = (CACHE_FORMAT, sys.implementation.cache_tag, cache_tag)
+        self._build_processors = build_processors
+        self._reload_lock = threading.Lock()
+        self._cache_lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._pending_save: Optional[RegistrySnapshot] = None
+        self._save_timer: Optional[threading.Timer] = None
+        self._listeners: List[Callable[[RegistrySnapshot, RegistrySnapshot], None]] = []
+        self._stat_key = self._stat()
+        self._failed_key: Optional[Tuple[int, int, int]] = None
+        self._snapshot, saved = self._open()
+        if not saved:
+            self._schedule_save(self._snapshot)
+        self._watcher: Optional[threading.Thread] = None
+
+    @property
+    def snapshot(self) -> RegistrySnapshot:
+        """The current snapshot."""
+        return self._snapshot
+
+    def add_listener(self, listener: Callable[[RegistrySnapshot, RegistrySnapshot], None]) -> None:
+        """
+        Call a function with the old and the new snapshot after each swap.
+
+        Args:
+            listener: The function; it runs on the reloading thread. Its
+                errors are reported on stderr, and do not stop the reload
+                or the other listeners.
+        """
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[RegistrySnapshot, RegistrySnapshot], None]) -> None:
+        """
+        Stop calling a function added with ``add_listener``.
+
+        Args:
+            listener: The function.
+        """
+        self._listeners.remove(listener)
+
+    def reload(self) -> bool:
+        """
+        Reload the registry file if it changed.
+
+        An invalid file is reported on stderr, once per change, and the
+        current snapshot is kept.
+
+        Returns:
+            True if a new snapshot was swapped in.
+        """
+        with self._reload_lock:
+            try:
+                stat_key = self._stat()
+            except OSError as e:
+                return self._reject(_NO_FILE, e)
+            if stat_key in (self._stat_key, self._failed_key):
+                return False
+
+            try:
+                data = self._read()
+            except OSError as e:
+                return self._reject(stat_key, e)
+            current = self._snapshot
+            if _digest(data) == current.digest:
+                self._stat_key = stat_key
+                return False
+
+            try:
+                snapshot = self._load(data, current)
+            except (ValueError, KeyError, TypeError) as e:
+                return self._reject(stat_key, e)
+
+            self._stat_key = stat_key
+            self._failed_key = None
+            self._swap(current, snapshot)
+            self._schedule_save(snapshot)
+            return True
+
+    def rebind(self) -> None:
+        """Swap in a snapshot of the same tools with their processors bound again."""
+        with self._reload_lock:
+            current = self._snapshot
+            self._swap(current, self._snapshot_of(
+                current.version + 1, current.by_name, current.processors, current.compiled.copy(), current.digest
+            ))
+
+    def watch(self, interval: float = DEFAULT_POLL_INTERVAL) -> Optional[threading.Thread]:
+        """
+        Reload the registry in the background whenever the file changes.
+
+        Args:
+            interval: Seconds between two checks of the file; 0 or less
+                does not start the watcher.
+
+        Returns:
+            The daemon thread polling the file, or None if not started.
+        """
+        if interval <= 0:
+            return None
+        if self._watcher is None:
+            def poll() -> None:
+                while True:
+                    time.sleep(interval)
+                    try:
+                        self.reload()
+                    except Exception as e:
+                        # Keep watching: the next change may well load
+                        print(f"Tool registry reload failed: {e!r}", file=sys.stderr)
+
+            self._watcher = threading.Thread(target=poll, name="registry-watcher", daemon=True)
+            self._watcher.start()
+        return self._watcher
+
+    def _swap(self, current: RegistrySnapshot, snapshot: RegistrySnapshot) -> None:
+        """Make a snapshot current and tell the listeners, reporting their errors."""
+        self._snapshot = snapshot
+        for listener in list(self._listeners):
+            try:
+                listener(current, snapshot)
+            except Exception as e:
+                print(f"Tool registry listener {getattr(listener, '__qualname__', listener)} failed: {e!r}",
+                      file=sys.stderr)
+
+    def _stat(self) -> Tuple[int, int, int]:
+        """Key the current version of the registry file, or index, by modification time, size and inode."""
+        stat = os.stat(self._source)
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _read(self) -> bytes:
+        """Read the registry file, or index."""
+        with open(self._source, "rb") as f:
+            return f.read()
+
+    def _load(self, data: bytes, current: Optional[RegistrySnapshot],
+              compiled: Optional[Dict[str, Tuple]] = None) -> RegistrySnapshot:
+        """
+        Parse the registry file, or index, contents into a snapshot.
+
+        Args:
+            data: The contents of the registry file, or index.
+            current: The current snapshot, if any.
+            compiled: Compiled tools to reuse when there is no current
+                snapshot, such as those of an outdated cache.
+
+        Returns:
+            The new snapshot, one version after the current one.
+
+        Raises:
+            ValueError: If the contents are not a valid tool registry.
+            KeyError, TypeError: If a tool definition is malformed.
+        """
+        entries = json.loads(data)
+        by_name: Mapping[str, Dict[str, Any]]
+        if self.sharded:
+            if not isinstance(entries, list) or not all(
+                isinstance(entry, dict) and isinstance(entry.get("name"), str) and isinstance(entry.get("hash"), str)
+                for entry in entries
+            ):
+                raise ValueError("The registry index must be a list of tools, each with a name and hash")
+            for entry in entries:
+                check_tool_name(entry["name"])
+            previous = current.by_name if current is not None else None
+            by_name = LazyTools(
+                self.path, entries, previous.unchanged(entries) if isinstance(previous, LazyTools) else None, self.pack_tools
+            )
+        else:
+            if not isinstance(entries, list) or not all(
+                isinstance(tool, dict) and isinstance(tool.get("name"), str) and isinstance(tool.get("parameters"), dict)
+                for tool in entries
+            ):
+                raise ValueError("The registry must be a list of tools, each with a name and parameters")
+            for tool in entries:
+                check_tool_name(tool["name"])
+            by_name = self._with_pack_tools({tool["name"]: tool for tool in entries})
+
+        if current is None:
+            return self._snapshot_of(1, by_name, None, compiled or {}, _digest(data))
+        return self._snapshot_of(current.version + 1, by_name, current.processors, current.compiled, _digest(data))
+
+    def _snapshot_of(self, version: int, by_name: Mapping[str, Dict[str, Any]],
+                     processors: Optional[LazyProcessors], compiled: Dict[str, Tuple],
+                     digest: str) -> RegistrySnapshot:
+        """
+        Bind the processors of a set of tools into a snapshot.
+
+        The processors of the tools of a file registry are bound at once, so
+        that an invalid tool definition fails the load; those of a sharded
+        registry, and of tool packs, are bound on first use.
+
+        Args:
+            version: The snapshot version.
+            by_name: The tool definitions by name.
+            processors: Processors to reuse where they are current, if any.
+            compiled: Compiled tools to reuse where they are current.
+            digest: The digest of the registry file, or index, contents.
+
+        Returns:
+            The snapshot.
+        """
+        compiled = {name: entry for name, entry in compiled.items() if name in by_name}
+        lazy = LazyProcessors(by_name, self._build_processors, processors.built if processors else None, compiled)
+        if not isinstance(by_name, LazyTools):
+            for name, tool in by_name.items():
+                # Pack tools are checked when their manifest is read; registry tools shadowing them are not
+                if tool != self.pack_tools.get(name):
+                    lazy[name]  # Bound now to validate the definition
+        snapshot = RegistrySnapshot(version, by_name, lazy, digest, compiled)
+        snapshot._save = self._schedule_save
+        lazy.on_compile = lambda: self._schedule_save(snapshot)
+        return snapshot
+
+    def _with_pack_tools(self, by_name: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Add the tools of tool packs after those of a file registry, which take precedence."""
+        for name, tool in self.pack_tools.items():
+            by_name.setdefault(name, tool)
+        return by_name
+
+    def _open(self) -> Tuple[RegistrySnapshot, bool]:
+        """
+        Load the first snapshot, from the compiled cache if it is up to date.
+
+        Returns:
+            The snapshot, and whether the cache already holds it as is.
+
+        Raises:
+            OSError: If the registry file, or index, cannot be read.
+            ValueError: If the registry file, or index, is not valid.
+        """
+        cache = self._load_cache()
+        if cache is not None and cache["stat"] == self._stat_key:
+            return self._restore(cache), True
+
+        data = self._read()
+        if cache is not None and cache["digest"] == _digest(data):
+            return self._restore(cache), False
+        # The tools that did not change need not be compiled again
+        return self._load(data, None, _unmarshal_compiled(cache) if cache is not None else None), False
+
+    def _restore(self, cache: Dict[str, Any]) -> RegistrySnapshot:
+        """Make the first snapshot from a compiled registry cache."""
+        by_name: Mapping[str, Dict[str, Any]] = {tool["name"]: tool for tool in cache["tools"]}
+        if self.sharded:
+            by_name = LazyTools(self.path, cache["index"], by_name, self.pack_tools)
+        else:
+            by_name = self._with_pack_tools(by_name)
+        snapshot = self._snapshot_of(1, by_name, None, _unmarshal_compiled(cache), cache["digest"])
+        snapshot._persistent.update(cache["derived"])
+        return snapshot
+
+    def _load_cache(self) -> Optional[Dict[str, Any]]:
+        """Read the compiled registry cache, if there is one saved by the same code."""
+        if self.cache_path is None:
+            return None
+        try:
+            with open(self.cache_path, "rb") as f:
+                cache = pickle.load(f)
+        except Exception:
+            # A missing, truncated or incompatible cache is simply rebuilt
+            return None
+        if not isinstance(cache, dict) or cache.get("key") != self._cache_key:
+            return None
+        if (cache["index"] is not None) != self.sharded:
+            return None
+        return cache
+
+    def flush_cache(self) -> None:
+        """Write the compiled registry cache now if it is out of date, rather than when its timer fires."""
+        with self._pending_lock:
+            snapshot, self._pending_save = self._pending_save, None
+            timer, self._save_timer = self._save_timer, None
+            _PENDING_SAVES.discard(self)
+        if timer is not None:
+            timer.cancel()
+        if snapshot is not None:
+            self._save_cache(snapshot)
+
+    def _schedule_save(self, snapshot: RegistrySnapshot) -> None:
+        """
+        Mark the compiled registry cache out of date with a snapshot.
+
+        The first change starts a timer that writes the cache after
+        CACHE_SAVE_DELAY seconds, on its own thread; changes made meanwhile
+        are saved by the same write.
+        """
+        if self.cache_path is None:
+            return
+        with self._pending_lock:
+            self._pending_save = snapshot
+            if self._save_timer is None:
+                self._save_timer = threading.Timer(CACHE_SAVE_DELAY, self.flush_cache)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+                _PENDING_SAVES.add(self)
+
+    def _save_cache(self, snapshot: RegistrySnapshot) -> None:
+        """
+        Save a snapshot in the compiled registry cache, if it is current.
+
+        The cache is written to a temporary file that replaces the previous
+        cache at once, so concurrent processes never read a partial cache.
+        """
+        if self.cache_path is None or snapshot is not self._snapshot:
+            return
+        # Copied first, since other threads may be adding lazily loaded tools
+        by_name = snapshot.by_name
+        tools = by_name.loaded.copy() if isinstance(by_name, LazyTools) else by_name
+        cache = {
+            "key": self._cache_key,
+            "stat": self._stat_key,
+            "digest": snapshot.digest,
+            "index": by_name.index if isinstance(by_name, LazyTools) else None,
+            "tools": list(tools.values()),
+            "compiled": {
+                name: (version, marshal.dumps(code), constants)
+                for name, (version, code, constants) in snapshot.compiled.copy().items()
+            },
+            "derived": snapshot._persistent.copy(),
+        }
+        temp_path = f"{self.cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with self._cache_lock:
+            try:
+                with open(temp_path, "wb") as f:
+                    pickle.dump(cache, f, pickle.HIGHEST_PROTOCOL)
+                os.replace(temp_path, self.cache_path)
+            except (OSError, pickle.PicklingError, TypeError, AttributeError):
+                # The cache only saves time; a read-only directory is not an error
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+
+    def _reject(self, stat_key: Tuple[int, int, int], error: Exception) -> bool:
+        """Report a registry file that cannot be loaded, once per change of the file."""
+        if stat_key != self._failed_key:
+            print(f"Keeping tool registry version {self._snapshot.version}: {error}", file=sys.stderr)
+        self._failed_key = stat_key
+        return False
+
+# The registries whose compiled cache is waiting for its timer, written at exit
+_PENDING_SAVES: "weakref.WeakSet[ToolRegistry]" = weakref.WeakSet()
+
+@atexit.register
+def _flush_pending_saves() -> None:
+    """Write the compiled caches still out of date when the process exits."""
+    for registry in list(_PENDING_SAVES):
+        registry.flush_cache()
+
+def _unmarshal_compiled(cache: Dict[str, Any]) -> Dict[str, Tuple]:
+    """Load the compiled tools of a compiled registry cache."""
+    return {
+        name: (version, marshal.loads(code), constants)
+        for name, (version, code, constants) in cache["compiled"].items()
+    }
+
+def _digest(data: bytes) -> str:
+    """Hash the contents of a registry file."""
+    return hashlib.sha256(data).hexdigest()
@@ -0,0 +1,195 @@
+"""
+Script Cache for Fusion 360 MCP Server
+
+This module implements the bounded LRU cache used to memoize rendered tool
+scripts, keyed on a canonical, hashable form of the tool call.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+# Default cache configuration, overridable through the environment
+DEFAULT_CACHE_SIZE = int(os.environ.get("FUSION360_MCP_SCRIPT_CACHE_SIZE", "1024"))
+DEFAULT_CACHE_TTL = float(os.environ.get("FUSION360_MCP_SCRIPT_CACHE_TTL", "0")) or None
+
+_SCALAR_TYPES = (str, int, bool, type(None))
+
+def canonicalize(value: Any) -> Hashable:
+    """
+    Convert a JSON-like value into a canonical, hashable form.
+
+    Values are tagged with their type, so that ``1``, ``1.0`` and ``True``
+    (which render differently) never share a key, and dictionaries are
+    sorted by key so that parameter order does not matter.
+
+    Args:
+        value: The value to convert.
+
+    Returns:
+        A hashable representation of the value.
+
+    Raises:
+        TypeError: If the value is not made of JSON-like types.
+    """
+    value_type = type(value)
+    if value_type in _SCALAR_TYPES:
+        return (value_type, value)
+    if value_type is float:
+        # repr keeps -0.0 and 0.0 apart
+        return (float, repr(value) if not value else value)
+    if value_type is dict:
+        return (dict, canonicalize_params(value))
+    if value_type is list or value_type is tuple:
+        item_types = set(map(type, value))
+        if len(item_types) == 1:
+            # Fast path for the homogeneous index lists used by selections
+            item_type = item_types.pop()
+            if item_type in _SCALAR_TYPES:
+                return (list, item_type, tuple(value))
+        return (list, tuple([canonicalize(item) for item in value]))
+    raise TypeError(f"Cannot canonicalize value of type {value_type.__name__}")
+
+def canonicalize_params(params: Dict[str, Any]) -> Hashable:
+    """
+    Convert a parameter dictionary into a canonical, hashable form.
+
+    This is ``canonicalize`` specialized for the flat dictionaries of scalars
+    that make up most tool calls.
+
+    Args:
+        params: The parameters to convert.
+
+    Returns:
+        A hashable representation of the parameters.
+
+    Raises:
+        TypeError: If a value is not made of JSON-like types.
+    """
+    items = []
+    for key in sorted(params):
+        value = params[key]
+        value_type = type(value)
+        if value_type is float:
+            if not value:
+                value = repr(value)
+        elif value_type not in _SCALAR_TYPES:
+            value = canonicalize(value)
+        items.append((key, value_type, value))
+    return tuple(items)
+
+class ScriptCache:
+    """
+    A thread-safe LRU cache with an optional time-to-live.
+
+    Counts hits, misses, evictions (entries dropped to make room) and
+    expirations (entries dropped because they outlived the TTL).
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_CACHE_SIZE, ttl: Optional[float] = DEFAULT_CACHE_TTL):
+        """
+        Initialize the cache.
+
+        Args:
+            maxsize: The maximum number of entries; 0 disables caching.
+            ttl: The time-to-live of an entry in seconds, or None for no expiry.
+        """
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def configure(self, maxsize: Optional[int] = None, ttl: Optional[float] = None) -> None:
+        """
+        Change the cache size or TTL, evicting entries if the cache shrinks.
+
+        Args:
+            maxsize: The new maximum number of entries, if given.
+            ttl: The new time-to-live in seconds, if given; 0 disables expiry.
+        """
+        with self._lock:
+            if maxsize is not None:
+                self.maxsize = maxsize
+                self._evict()
+            if ttl is not None:
+                self.ttl = ttl or None
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Look up a cached value, marking it as recently used.
+
+        Args:
+            key: The cache key.
+
+        Returns:
+            The cached value, or None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires = entry
+            if expires is not None and expires <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        Store a value, evicting the least recently used entries if needed.
+
+        Args:
+            key: The cache key.
+            value: The value to cache.
+        """
+        if self.maxsize <= 0:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until the cache fits its size."""
+        while len(self._entries) > max(self.maxsize, 0):
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove every entry and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report the cache configuration and counters.
+
+        Returns:
+            A dictionary of cache statistics.
+        """
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
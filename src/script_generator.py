@@ -4,19 +4,47 @@ Script Generator for Fusion 360 MCP Server
 This module generates Fusion 360 Python scripts based on tool parameters.
 """
 
-import json
 import os
-from typing import Dict, Any, List, Optional, Union
+from types import CodeType
+from typing import Callable, Dict, Any, Iterator, List, Optional, Sequence, Tuple, Union
 
-# Load tool registry
+import script_ir
+from script_cache import ScriptCache, canonicalize_params
+from registry import RegistrySnapshot, ToolRegistry, tool_version
+from script_ir import ScriptIR, ToolStep
+from tool_packs import ToolPack, discover_packs, pack_stamp, packs_by_tool
+from template_compiler import (
+    INDENT,
+    NEWLINE_INDENT,
+    CompiledTemplate,
+    compile_base_template,
+    compile_template,
+)
+from validators import ParameterValidationError, compile_validator_code, load_validator
+
+# The tool registry, a sharded directory or a single JSON file, overridable
+# through the environment; it is loaded once the processing functions below
+# are registered
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-TOOL_REGISTRY_PATH = os.path.join(SCRIPT_DIR, "tool_registry.json")
+TOOL_REGISTRY_PATH = os.environ.get("FUSION360_MCP_TOOL_REGISTRY") or os.path.join(SCRIPT_DIR, "tool_registry")
+
+# The compiled registry cache, kept next to the registry file unless set
+# through the environment; "0" turns it off
+REGISTRY_CACHE_PATH: Optional[str] = os.environ.get("FUSION360_MCP_REGISTRY_CACHE", os.path.splitext(TOOL_REGISTRY_PATH)[0] + ".cache")
+if REGISTRY_CACHE_PATH in ("", "0"):
+    REGISTRY_CACHE_PATH = None
+
+# The directories searched for tool packs, separated by os.pathsep; the
+# packs shipped in tools/packs by default
+TOOL_PACKS_PATH = os.environ.get("FUSION360_MCP_TOOL_PACKS") or os.path.normpath(
+    os.path.join(SCRIPT_DIR, os.pardir, "tools", "packs")
+)
 
-with open(TOOL_REGISTRY_PATH, "r") as f:
-    TOOL_REGISTRY = json.load(f)
+# The loaded registry, set at the end of the processor registrations
+REGISTRY: Optional[ToolRegistry] = None
 
-# Create a lookup dictionary for tools
-TOOLS_BY_NAME = {tool["name"]: tool for tool in TOOL_REGISTRY}
+# The tool pack of each pack tool by tool name, discovered with the registry
+PACKS: Dict[str, ToolPack] = {}
 
 # Script templates for each tool
 SCRIPT_TEMPLATES = {
@@ -133,39 +161,433 @@ def run(context):
             ui.messageBox('Failed:\\n{{}}'.format(traceback.format_exc()))
 """
 
-def generate_script(tool_name: str, parameters: Dict[str, Any]) -> str:
+# Base script template for profiled scripts, which time each step with a
+# _StepTimer created by the first line of the tool scripts
+PROFILED_BASE_SCRIPT_TEMPLATE = """import adsk.core, adsk.fusion, traceback
+import json, os, tempfile, time
+
+class _StepTimer:
+    \"\"\"Times the steps of the script and writes them to a JSON timing report.\"\"\"
+    
+    def __init__(self, path=None):
+        self.path = path or os.path.join(tempfile.gettempdir(), 'fusion360_mcp_timing.json')
+        self.started = time.time()
+        self.start_time = time.perf_counter()
+        self.steps = []
+        self.current = None
+    
+    def start(self, index, tool, calls=1):
+        self.current = (index, tool, calls, time.perf_counter())
+    
+    def stop(self, error=None):
+        if self.current is None:
+            return
+        index, tool, calls, start = self.current
+        self.current = None
+        step = {{'step': index, 'tool': tool, 'calls': calls, 'duration': time.perf_counter() - start, 'success': error is None}}
+        if error is not None:
+            step['error'] = error
+        self.steps.append(step)
+    
+    def write(self, success):
+        report = {{
+            'started': self.started,
+            'duration': time.perf_counter() - self.start_time,
+            'success': success,
+            'steps': self.steps,
+        }}
+        with open(self.path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+def run(context):
+    ui = None
+    timer = None
+    success = False
+    try:
+        app = adsk.core.Application.get()
+        ui = app.userInterface
+        design = app.activeProduct
+        
+        # Get the active component in the design
+        component = design.rootComponent
+        
+{tool_scripts}
+        
+        success = True
+        ui.messageBox('Operation completed successfully')
+    except:
+        if timer:
+            timer.stop(traceback.format_exc().strip().splitlines()[-1])
+        if ui:
+            ui.messageBox('Failed:\\n{{}}'.format(traceback.format_exc()))
+    finally:
+        if timer:
+            timer.write(success)
+"""
+
+# Templates compiled once at import; rendering is a single join
+COMPILED_TEMPLATES = {name: compile_template(template) for name, template in SCRIPT_TEMPLATES.items()}
+SCRIPT_HEAD, SCRIPT_TAIL = compile_base_template(BASE_SCRIPT_TEMPLATE)
+PROFILED_SCRIPT_HEAD, PROFILED_SCRIPT_TAIL = compile_base_template(PROFILED_BASE_SCRIPT_TEMPLATE)
+
+def _get_template(tool_name: str, snapshot: RegistrySnapshot) -> CompiledTemplate:
+    """
+    Look up the compiled script template for a tool.
+    
+    Templates registered in code come first, then those of tool packs, which
+    are loaded on first use; otherwise the template shard of a sharded
+    registry is read and compiled once per snapshot.
+    
+    Args:
+        tool_name: The name of the tool.
+        snapshot: The registry snapshot the tool must be in.
+        
+    Returns:
+        The compiled template for the tool.
+    """
+    if tool_name not in snapshot.by_name:
+        raise ValueError(f"Unknown tool: {tool_name}")
+    
+    template = COMPILED_TEMPLATES.get(tool_name)
+    if template is None and tool_name in PACKS:
+        pack = _pack_of(snapshot.by_name[tool_name])
+        if pack is not None:
+            template = _load_pack(pack, tool_name)
+    if template is None:
+        template = snapshot.derived("template:" + tool_name, lambda snapshot: _compile_shard_template(snapshot, tool_name))
+    if not template:
+        raise ValueError(f"No script template available for tool: {tool_name}")
+    
+    return template
+
+def _pack_of(tool: Dict[str, Any]) -> Optional[ToolPack]:
+    """
+    Find the tool pack a tool definition comes from.
+    
+    A registry tool named like a pack tool shadows it, and its pack is then
+    not imported for it.
+    
+    Args:
+        tool: The tool definition served.
+        
+    Returns:
+        The pack whose manifest holds the definition, or None.
+    """
+    pack = PACKS.get(tool["name"])
+    if pack is None or tool not in pack.tools:
+        return None
+    return pack
+
+def _load_pack(pack: ToolPack, tool_name: str) -> Optional[CompiledTemplate]:
+    """
+    Import a tool pack, and register the template file it ships for a tool if any.
+    
+    Args:
+        pack: The pack providing the tool.
+        tool_name: The name of the pack tool.
+        
+    Returns:
+        The compiled template for the tool, if the pack provides one.
+    """
+    pack.load()
+    if tool_name not in COMPILED_TEMPLATES:
+        source = pack.template(tool_name)
+        if source is not None:
+            register_template(tool_name, source)
+    return COMPILED_TEMPLATES.get(tool_name)
+
+def _compile_shard_template(snapshot: RegistrySnapshot, tool_name: str) -> Optional[CompiledTemplate]:
+    """Compile the template shard of a tool, if the registry has one."""
+    source = snapshot.template(tool_name)
+    return compile_template(source) if source is not None else None
+
+def generate_script(tool_name: str, parameters: Dict[str, Any],
+                    optimize: Union[bool, Sequence[str]] = False,
+                    defer_sketch_compute: bool = False,
+                    profile: bool = False,
+                    profile_path: Optional[str] = None,
+                    snapshot: Optional[RegistrySnapshot] = None) -> str:
     """
     Generate a Fusion 360 Python script for the specified tool and parameters.
     
     Args:
         tool_name: The name of the tool to generate a script for.
         parameters: A dictionary of parameter values for the tool.
+        optimize: Run the default or the named optimization passes over the script.
+        defer_sketch_compute: Defer sketch computation while drawing (see
+            iter_multi_tool_script).
+        profile: Time the step and write a JSON timing report when the script ends.
+        profile_path: Where the script writes the timing report.
+        snapshot: The registry snapshot to generate with; the current one if None.
         
     Returns:
         A string containing the generated Python script.
+        
+    Raises:
+        ParameterValidationError: If the parameters do not match the tool's registry schema.
     """
-    if tool_name not in TOOLS_BY_NAME:
-        raise ValueError(f"Unknown tool: {tool_name}")
+    if optimize or defer_sketch_compute or profile:
+        return generate_multi_tool_script(
+            [{"tool_name": tool_name, "parameters": parameters}],
+            optimize=optimize,
+            defer_sketch_compute=defer_sketch_compute,
+            profile=profile,
+            profile_path=profile_path,
+            snapshot=snapshot,
+        )
     
-    tool = TOOLS_BY_NAME[tool_name]
-    template = SCRIPT_TEMPLATES.get(tool_name)
+    snapshot = snapshot or REGISTRY.snapshot
+    template = _get_template(tool_name, snapshot)
+    processor = snapshot.processors[tool_name]
+    processor.validate(parameters)
     
-    if not template:
-        raise ValueError(f"No script template available for tool: {tool_name}")
+    # Render the pre-indented tool script into the base template
+    return SCRIPT_HEAD + INDENT + _render_tool_script(processor, parameters, template) + SCRIPT_TAIL
+
+# Fusion API names for the options accepted by the tools
+SKETCH_PLANE_CODES = {
+    "xy": ("xyPlane = component.xYConstructionPlane", "xyPlane"),
+    "yz": ("yzPlane = component.yZConstructionPlane", "yzPlane"),
+    "xz": ("xzPlane = component.xZConstructionPlane", "xzPlane"),
+}
+
+FEATURE_OPERATION_CODES = {
+    "new": "NewBody",
+    "join": "JoinFeature",
+    "cut": "CutFeature",
+    "intersect": "IntersectFeature",
+}
+
+EXPORT_OPTIONS_CODES = {
+    "stl": "options = exportMgr.createSTLExportOptions(body)",
+    "obj": "options = exportMgr.createOBJExportOptions(body)",
+    "step": "options = exportMgr.createSTEPExportOptions()",
+    "iges": "options = exportMgr.createIGESExportOptions()",
+    "sat": "options = exportMgr.createSATExportOptions()",
+}
+
+def _takes_containers(tool: Dict[str, Any]) -> bool:
+    """Whether a tool declares a parameter that may be a list or an object, or one of any type."""
+    for info in tool["parameters"].values():
+        declared = info.get("type")
+        if declared is None:
+            return True
+        type_names = [declared] if isinstance(declared, str) else declared
+        if "array" in type_names or "object" in type_names:
+            return True
+    return False
+
+class ToolProcessor:
+    """
+    Parameter processing for a single tool, bound to its registry entry.
+    
+    The defaults, option lookup tables and parameter validator are built
+    once from the registry entry, so processing a call is a dictionary merge
+    plus the tool's own processing function.
+    """
+    
+    __slots__ = ("tool_name", "version", "defaults", "choices", "func", "validate", "cacheable")
+    
+    def __init__(self, tool: Dict[str, Any], func: Optional[Callable] = None,
+                 choices: Optional[Dict[str, Dict[str, Any]]] = None,
+                 compiled: Optional["CompiledTool"] = None):
+        """
+        Bind a processing function to a tool definition.
+        
+        Args:
+            tool: The tool definition from the registry.
+            func: The processing function, called as ``func(processor, processed)``.
+            choices: Maps parameter names to their option -> code tables. When the
+                registry declares an ``enum`` for the parameter, the table is
+                restricted to those options, in that order.
+            compiled: The output of ``compile_tool`` for the tool, if it was
+                already compiled.
+        """
+        version, code, constants = compiled or compile_tool(tool)
+        self.tool_name = tool["name"]
+        self.version = version
+        self.defaults = {
+            name: info["default"]
+            for name, info in tool["parameters"].items()
+            if "default" in info
+        }
+        self.choices = {
+            param: _choice_table(tool, param, codes)
+            for param, codes in (choices or {}).items()
+        }
+        self.func = func
+        self.validate = load_validator(code, constants)
+        # Only calls whose processing grows with their parameters, such as the
+        # index lists expanded into selection code, are worth caching
+        self.cacheable = _takes_containers(tool)
+    
+    def choose(self, processed: Dict[str, Any], param: str) -> Any:
+        """
+        Look up the code for the option selected by a parameter.
+        
+        Args:
+            processed: The parameters being processed.
+            param: The name of the parameter selecting the option. When it is
+                missing, the first option of its table is used.
+            
+        Returns:
+            The code for the selected option.
+        """
+        table = self.choices[param]
+        value = processed.get(param)
+        value = next(iter(table)) if value is None else value.lower()
+        try:
+            return table[value]
+        except KeyError:
+            raise ValueError(f"Invalid {param}: {value}. Must be one of: {', '.join(table)}") from None
+    
+    def apply_defaults(self, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Fill in default values for missing parameters.
+        
+        Args:
+            parameters: The raw parameters provided for the tool.
+            
+        Returns:
+            A new dictionary of parameters with the defaults applied.
+        """
+        return {**self.defaults, **parameters}
+    
+    def process(self, parameters: Dict[str, Any], defaults_applied: bool = False) -> Dict[str, Any]:
+        """
+        Apply defaults and tool-specific processing to call parameters.
+        
+        Args:
+            parameters: The raw parameters provided for the tool.
+            defaults_applied: Whether ``parameters`` is already a fresh dictionary
+                returned by ``apply_defaults``, which is then processed in place.
+            
+        Returns:
+            A dictionary of processed parameters ready for script generation.
+        """
+        processed = parameters if defaults_applied else self.apply_defaults(parameters)
+        if self.func is not None:
+            self.func(self, processed)
+        return processed
+
+# A tool version with the code and constants of its validator, as cached by the registry
+CompiledTool = Tuple[str, CodeType, Dict[str, Any]]
+
+def compile_tool(tool: Dict[str, Any]) -> CompiledTool:
+    """
+    Compile the parts of a processor that depend only on the tool definition.
     
-    # Process parameters based on tool type
-    processed_params = _process_parameters(tool_name, parameters)
+    Args:
+        tool: The tool definition from the registry.
+        
+    Returns:
+        The tool version and its compiled validator (see
+        ``validators.compile_validator_code``).
+    """
+    return (tool_version(tool),) + compile_validator_code(tool)
+
+def _choice_table(tool: Dict[str, Any], param: str, codes: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build the option lookup table for a parameter from the registry entry.
     
-    # Format the tool script with the processed parameters
-    tool_script = template.format(**processed_params)
+    Args:
+        tool: The tool definition from the registry.
+        param: The name of the parameter.
+        codes: The code for every option the processor knows about.
+        
+    Returns:
+        A dictionary mapping the options accepted by the tool to their code.
+    """
+    options = tool["parameters"].get(param, {}).get("enum")
+    if options is None:
+        return dict(codes)
     
-    # Indent the tool script for inclusion in the base template
-    indented_tool_script = "\n".join(f"        {line}" for line in tool_script.strip().split("\n"))
+    unknown = [option for option in options if option not in codes]
+    if unknown:
+        raise ValueError(f"No code for {tool['name']} {param} option(s): {', '.join(unknown)}")
     
-    # Generate the full script
-    full_script = BASE_SCRIPT_TEMPLATE.format(tool_scripts=indented_tool_script)
+    return {option: codes[option] for option in options}
+
+# Processing functions and option codes for each tool, by tool name
+_PROCESSOR_SPECS: Dict[str, Tuple[Callable, Dict[str, Dict[str, Any]]]] = {}
+
+def register_processor(tool_name: str, **choices: Dict[str, Any]) -> Callable:
+    """
+    Register the parameter processing function for a tool.
+    
+    The decorated function is called as ``func(processor, processed)`` and
+    adds the derived template parameters to ``processed`` in place. Keyword
+    arguments map parameter names to option -> code tables, available to the
+    function through ``processor.choose``.
     
-    return full_script
+    Args:
+        tool_name: The name of the tool.
+        **choices: Option -> code tables for the tool's option parameters.
+        
+    Returns:
+        A decorator registering the function.
+    """
+    def decorator(func: Callable) -> Callable:
+        _PROCESSOR_SPECS[tool_name] = (func, choices)
+        # Processors not bound yet pick the function up when they are
+        if REGISTRY is not None and tool_name in REGISTRY.snapshot.processors.built:
+            REGISTRY.rebind()
+        return func
+    
+    return decorator
+
+def build_processors(tools: List[Dict[str, Any]],
+                     previous: Optional[Dict[str, ToolProcessor]] = None,
+                     compiled: Optional[Dict[str, CompiledTool]] = None) -> Dict[str, ToolProcessor]:
+    """
+    Bind the registered processing functions to a list of tool definitions.
+    
+    The tool pack of a pack tool without a processing function is imported
+    first, since importing it registers the function; registry tools that
+    shadow a pack tool never import its pack.
+    
+    Args:
+        tools: The tool definitions.
+        previous: The processors of a previous registry snapshot. Those whose
+            tool definition and processing function are unchanged are reused.
+        compiled: The ``compile_tool`` output by tool name, such as the
+            registry cache holds. Entries for the current version of a tool
+            are used instead of compiling it, and the tools compiled are
+            added.
+        
+    Returns:
+        A dictionary mapping tool names to their processors.
+    """
+    processors = {}
+    for tool in tools:
+        name = tool["name"]
+        if name in PACKS and name not in _PROCESSOR_SPECS:
+            pack = _pack_of(tool)
+            if pack is not None:
+                _load_pack(pack, name)
+        func, choices = _PROCESSOR_SPECS.get(name, (None, None))
+        version = tool_version(tool)
+        processor = (previous or {}).get(name)
+        if processor is None or processor.func is not func or processor.version != version:
+            entry = (compiled or {}).get(name)
+            if entry is None or entry[0] != version:
+                entry = compile_tool(tool)
+                if compiled is not None:
+                    compiled[name] = entry
+            processor = ToolProcessor(tool, func, choices, entry)
+        processors[name] = processor
+    return processors
+
+def register_template(tool_name: str, template: str) -> None:
+    """
+    Register the script template for a tool.
+    
+    Args:
+        tool_name: The name of the tool.
+        template: The script template, in ``str.format`` syntax.
+    """
+    COMPILED_TEMPLATES[tool_name] = compile_template(template)
+    SCRIPT_TEMPLATES[tool_name] = template
 
 def _process_parameters(tool_name: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -177,154 +599,494 @@ def _process_parameters(tool_name: str, parameters: Dict[str, Any]) -> Dict[str,
         
     Returns:
         A dictionary of processed parameters ready for script generation.
+        
+    Raises:
+        ParameterValidationError: If the parameters do not match the tool's registry schema.
     """
-    processed = parameters.copy()
-    
-    # Apply default values for missing parameters
-    tool = TOOLS_BY_NAME[tool_name]
-    for param_name, param_info in tool["parameters"].items():
-        if param_name not in processed and "default" in param_info:
-            processed[param_name] = param_info["default"]
-    
-    # Tool-specific parameter processing
-    if tool_name == "CreateSketch":
-        plane = processed.get("plane", "xy").lower()
-        if plane == "xy":
-            processed["plane_code"] = "xyPlane = component.xYConstructionPlane"
-            processed["plane_var"] = "xyPlane"
-        elif plane == "yz":
-            processed["plane_code"] = "yzPlane = component.yZConstructionPlane"
-            processed["plane_var"] = "yzPlane"
-        elif plane == "xz":
-            processed["plane_code"] = "xzPlane = component.xZConstructionPlane"
-            processed["plane_var"] = "xzPlane"
-        else:
-            raise ValueError(f"Invalid plane: {plane}. Must be one of: xy, yz, xz")
-    
-    elif tool_name == "Extrude":
-        operation = processed.get("operation", "new").lower()
-        if operation == "new":
-            processed["operation_code"] = "NewBody"
-        elif operation == "join":
-            processed["operation_code"] = "JoinFeature"
-        elif operation == "cut":
-            processed["operation_code"] = "CutFeature"
-        elif operation == "intersect":
-            processed["operation_code"] = "IntersectFeature"
-        else:
-            raise ValueError(f"Invalid operation: {operation}. Must be one of: new, join, cut, intersect")
-    
-    elif tool_name == "Revolve":
-        operation = processed.get("operation", "new").lower()
-        if operation == "new":
-            processed["operation_code"] = "NewBody"
-        elif operation == "join":
-            processed["operation_code"] = "JoinFeature"
-        elif operation == "cut":
-            processed["operation_code"] = "CutFeature"
-        elif operation == "intersect":
-            processed["operation_code"] = "IntersectFeature"
-        else:
-            raise ValueError(f"Invalid operation: {operation}. Must be one of: new, join, cut, intersect")
-    
-    elif tool_name == "Fillet":
-        edge_indices = processed.get("edge_indices", [])
-        if edge_indices:
-            edge_code_lines = []
-            for idx in edge_indices:
-                edge_code_lines.append(f"edge = body.edges.item({idx})")
-                edge_code_lines.append("edgeCollection.add(edge)")
-            processed["edge_collection_code"] = "\n".join(edge_code_lines)
-        else:
-            processed["edge_collection_code"] = "for edge in body.edges:\n    edgeCollection.add(edge)"
-    
-    elif tool_name == "Chamfer":
-        edge_indices = processed.get("edge_indices", [])
-        if edge_indices:
-            edge_code_lines = []
-            for idx in edge_indices:
-                edge_code_lines.append(f"edge = body.edges.item({idx})")
-                edge_code_lines.append("edgeCollection.add(edge)")
-            processed["edge_collection_code"] = "\n".join(edge_code_lines)
-        else:
-            processed["edge_collection_code"] = "for edge in body.edges:\n    edgeCollection.add(edge)"
-    
-    elif tool_name == "Shell":
-        face_indices = processed.get("face_indices", [])
-        if face_indices:
-            face_code_lines = []
-            for idx in face_indices:
-                face_code_lines.append(f"face = body.faces.item({idx})")
-                face_code_lines.append("faceCollection.add(face)")
-            processed["face_collection_code"] = "\n".join(face_code_lines)
-        else:
-            processed["face_collection_code"] = "# No faces selected for removal"
-    
-    elif tool_name == "Combine":
-        operation = processed.get("operation", "join").lower()
-        if operation == "join":
-            processed["operation_code"] = "JoinFeature"
-        elif operation == "cut":
-            processed["operation_code"] = "CutFeature"
-        elif operation == "intersect":
-            processed["operation_code"] = "IntersectFeature"
-        else:
-            raise ValueError(f"Invalid operation: {operation}. Must be one of: join, cut, intersect")
-    
-    elif tool_name == "ExportBody":
-        format = processed.get("format", "stl").lower()
-        if format == "stl":
-            processed["export_options_code"] = "options = exportMgr.createSTLExportOptions(body)"
-        elif format == "obj":
-            processed["export_options_code"] = "options = exportMgr.createOBJExportOptions(body)"
-        elif format == "step":
-            processed["export_options_code"] = "options = exportMgr.createSTEPExportOptions()"
-        elif format == "iges":
-            processed["export_options_code"] = "options = exportMgr.createIGESExportOptions()"
-        elif format == "sat":
-            processed["export_options_code"] = "options = exportMgr.createSATExportOptions()"
-        else:
-            raise ValueError(f"Invalid format: {format}. Must be one of: stl, obj, step, iges, sat")
+    processor = REGISTRY.snapshot.processors[tool_name]
+    processor.validate(parameters)
+    return processor.process(parameters)
+
+# Minimum number of evenly spaced indices emitted as a range
+RANGE_MIN_RUN = 4
+
+def _index_list_code(indices: List[Any]) -> str:
+    """
+    Generate a compact list expression for a list of indices.
+    
+    Runs of at least RANGE_MIN_RUN evenly spaced integers are encoded as
+    ``range`` objects, so contiguous selections take constant space.
+    
+    Args:
+        indices: The indices.
         
-        # Set directory to the user's desktop by default
-        processed["directory"] = os.path.expanduser("~/Desktop")
+    Returns:
+        An expression iterating over the indices in order.
+    """
+    items = []
+    i = 0
+    count = len(indices)
+    while i < count:
+        start = indices[i]
+        end = i + 1
+        if type(start) is int and end < count and type(indices[end]) is int and indices[end] != start:
+            step = indices[end] - start
+            while end < count and type(indices[end]) is int and indices[end] - indices[end - 1] == step:
+                end += 1
+            if end - i >= RANGE_MIN_RUN:
+                stop = indices[end - 1] + step
+                items.append(f"range({start}, {stop})" if step == 1 else f"range({start}, {stop}, {step})")
+                i = end
+                continue
+        items.append(f"{start}")
+        i += 1
     
-    return processed
+    if len(items) == 1 and items[0].startswith("range("):
+        return items[0]
+    return "[" + ", ".join(f"*{item}" if item.startswith("range(") else item for item in items) + "]"
 
-def generate_multi_tool_script(tool_calls: List[Dict[str, Any]]) -> str:
+def _selection_code(indices: List[Any], kind: str, collection: str) -> str:
     """
-    Generate a Fusion 360 Python script for multiple tool calls.
+    Generate the code adding the selected edges or faces of ``body`` to a collection.
+    
+    The indices are emitted as a single list expression and a loop, rather
+    than as lines per index.
+    
+    Args:
+        indices: The indices of the selected edges or faces.
+        kind: The selected entity, either ``edge`` or ``face``.
+        collection: The name of the collection variable.
+        
+    Returns:
+        The selection code.
+    """
+    return (
+        f"for {kind}Index in {_index_list_code(indices)}:\n"
+        f"    {collection}.add(body.{kind}s.item({kind}Index))"
+    )
+
+@register_processor("CreateSketch", plane=SKETCH_PLANE_CODES)
+def _process_create_sketch(processor: ToolProcessor, processed: Dict[str, Any]) -> None:
+    processed["plane_code"], processed["plane_var"] = processor.choose(processed, "plane")
+
+@register_processor("Extrude", operation=FEATURE_OPERATION_CODES)
+@register_processor("Revolve", operation=FEATURE_OPERATION_CODES)
+@register_processor("Combine", operation=FEATURE_OPERATION_CODES)
+def _process_feature_operation(processor: ToolProcessor, processed: Dict[str, Any]) -> None:
+    processed["operation_code"] = processor.choose(processed, "operation")
+
+@register_processor("Fillet")
+@register_processor("Chamfer")
+def _process_edge_selection(processor: ToolProcessor, processed: Dict[str, Any]) -> None:
+    edge_indices = processed.get("edge_indices", [])
+    if edge_indices:
+        processed["edge_collection_code"] = _selection_code(edge_indices, "edge", "edgeCollection")
+    else:
+        processed["edge_collection_code"] = "for edge in body.edges:\n    edgeCollection.add(edge)"
+
+@register_processor("Shell")
+def _process_face_selection(processor: ToolProcessor, processed: Dict[str, Any]) -> None:
+    face_indices = processed.get("face_indices", [])
+    if face_indices:
+        processed["face_collection_code"] = _selection_code(face_indices, "face", "faceCollection")
+    else:
+        processed["face_collection_code"] = "# No faces selected for removal"
+
+@register_processor("ExportBody", format=EXPORT_OPTIONS_CODES)
+def _process_export_body(processor: ToolProcessor, processed: Dict[str, Any]) -> None:
+    processed["export_options_code"] = processor.choose(processed, "format")
+    
+    # Set directory to the user's desktop by default
+    processed["directory"] = os.path.expanduser("~/Desktop")
+
+def _source_stamp() -> str:
+    """Identify the server's modules by size and modification time, to tag the registry cache."""
+    stamps = sorted(
+        (entry.name, entry.stat().st_size, entry.stat().st_mtime_ns)
+        for entry in os.scandir(SCRIPT_DIR)
+        if entry.name.endswith(".py")
+    )
+    return repr(stamps)
+
+# Discover the tool packs from their manifests, then load the registry with
+# their tools; the packs' code is imported when their tools are first used
+_packs = discover_packs(TOOL_PACKS_PATH.split(os.pathsep))
+PACKS = packs_by_tool(_packs)
+REGISTRY = ToolRegistry(
+    TOOL_REGISTRY_PATH,
+    build_processors,
+    REGISTRY_CACHE_PATH,
+    _source_stamp() + pack_stamp(_packs),
+    [tool for pack in _packs for tool in pack.tools],
+)
+
+# The module-level views of the current snapshot, for code that does not need
+# a consistent view; resolved on access, so that importing this module does
+# not read every shard of a sharded registry
+_SNAPSHOT_VIEWS = {
+    "TOOL_REGISTRY": lambda snapshot: snapshot.tools,
+    "TOOLS_BY_NAME": lambda snapshot: snapshot.by_name,
+    "TOOL_PROCESSORS": lambda snapshot: snapshot.processors,
+}
+
+def __getattr__(name: str) -> Any:
+    """Resolve TOOL_REGISTRY, TOOLS_BY_NAME and TOOL_PROCESSORS against the current snapshot."""
+    view = _SNAPSHOT_VIEWS.get(name)
+    if view is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return view(REGISTRY.snapshot)
+
+# Rendered tool scripts, shared by every caller of the generator
+SCRIPT_CACHE = ScriptCache()
+
+def _render_tool_script(processor: ToolProcessor, parameters: Dict[str, Any], template: CompiledTemplate) -> str:
+    """
+    Render the indented script of a single tool call, using the script cache.
+    
+    Only tools that take list or object parameters go through the cache
+    (see ``ToolProcessor.cacheable``); the others render in less time than
+    building a key and looking it up takes.
+    
+    The cache key is the tool name, the versions of the tool definition and
+    of the template, and the parameters after defaults are applied, so
+    tool-specific processing and rendering are skipped for repeated calls,
+    and a tool whose definition changes on a registry reload is rendered anew.
+    
+    Args:
+        processor: The processor of the tool.
+        parameters: The raw parameters provided for the tool.
+        template: The compiled template for the tool.
+        
+    Returns:
+        The rendered tool script (first line unindented).
+    """
+    params = processor.apply_defaults(parameters)
+    if SCRIPT_CACHE.maxsize <= 0 or not processor.cacheable:
+        return template.render(processor.process(params, defaults_applied=True))
+    
+    try:
+        key = (processor.tool_name, processor.version, template.version, canonicalize_params(params))
+    except TypeError:
+        # Parameters that are not plain JSON values are never cached
+        return template.render(processor.process(params, defaults_applied=True))
+    
+    tool_script = SCRIPT_CACHE.get(key)
+    if tool_script is None:
+        tool_script = template.render(processor.process(params, defaults_applied=True))
+        SCRIPT_CACHE.put(key, tool_script)
+    
+    return tool_script
+
+# Minimum number of consecutive calls of a tool emitted as a loop
+LOOP_MIN_RUN = 3
+
+# Called with the number of tool calls rendered so far and the total
+ProgressCallback = Callable[[int, int], None]
+
+def iter_multi_tool_script(tool_calls: List[Dict[str, Any]], compress_loops: bool = False,
+                           stats: Optional[Dict[str, Any]] = None,
+                           optimize: Union[bool, Sequence[str]] = False,
+                           defer_sketch_compute: bool = False,
+                           profile: bool = False,
+                           profile_path: Optional[str] = None,
+                           progress: Optional[ProgressCallback] = None,
+                           snapshot: Optional[RegistrySnapshot] = None) -> Iterator[str]:
+    """
+    Generate a Fusion 360 Python script for multiple tool calls, chunk by chunk.
+    
+    Tool names and parameters are checked up front, so unknown tools and
+    invalid parameters raise before anything is yielded. The script is then
+    produced lazily: the header, each indented tool script and the footer are
+    yielded as separate chunks, so the full script never has to be held in
+    memory. Optimized scripts are the exception: the steps are rendered into
+    a ScriptIR and rewritten by the optimization passes before the first
+    chunk is yielded.
     
     Args:
         tool_calls: A list of dictionaries, each containing 'tool_name' and 'parameters' keys.
+        compress_loops: Emit runs of at least LOOP_MIN_RUN calls of the same tool
+            that differ only in numeric values as a data table and a single loop.
+            Other runs are emitted unrolled.
+        stats: If given, filled in once the script is complete with the number
+            of steps, loops and looped steps, the script size and the size the
+            script would have had without loops or optimization. Optimized
+            scripts also report the counters of each pass under ``passes``.
+        optimize: Run the default optimization passes (True) or the named
+            passes (a list of names) over the script; see ``script_ir``.
+        defer_sketch_compute: Turn off sketch computation around consecutive
+            drawing steps, and back on before the sketch profiles are used.
+        profile: Time each emitted step (a loop counts as one step) and write
+            a JSON timing report when the script ends; see ``timing_report``.
+        profile_path: Where the script writes the timing report; a file in
+            the temporary directory of the machine running Fusion 360 if None.
+        progress: Called with the number of tool calls rendered so far and
+            the total, after each call or loop is rendered. It may raise to
+            abandon the generation.
+        snapshot: The registry snapshot to generate with; the current one if
+            None. The script is generated entirely from this snapshot, even
+            if the registry is reloaded in the meantime.
         
     Returns:
-        A string containing the generated Python script.
+        An iterator over the chunks of the generated Python script.
+        
+    Raises:
+        ParameterValidationError: If the parameters of any call do not match
+            its tool's registry schema, listing the errors of every call.
+        ValueError: If an unknown optimization pass is requested.
     """
-    tool_scripts = []
+    snapshot = snapshot or REGISTRY.snapshot
+    templates = [_get_template(call["tool_name"], snapshot) for call in tool_calls]
+    processors = [snapshot.processors[call["tool_name"]] for call in tool_calls]
+    
+    errors = []
+    for step, (call, processor) in enumerate(zip(tool_calls, processors), 1):
+        try:
+            processor.validate(call["parameters"])
+        except ParameterValidationError as e:
+            errors.extend(f"Step {step} ({call['tool_name']}): {error}" for error in e.errors)
+    if errors:
+        raise ParameterValidationError(errors)
+    
+    passes = _select_passes(optimize, defer_sketch_compute)
+    if passes or profile:
+        ir, unrolled_size = build_script_ir(tool_calls, templates, processors, compress_loops, progress)
+        report = script_ir.optimize(ir, passes)
+        if profile:
+            report["profile"] = script_ir.add_step_timers(ir, profile_path)
+            head, tail = PROFILED_SCRIPT_HEAD, PROFILED_SCRIPT_TAIL
+        else:
+            head, tail = SCRIPT_HEAD, SCRIPT_TAIL
+        return _iter_ir_chunks(ir, head, tail, len(tool_calls), unrolled_size, report, stats)
     
-    for call in tool_calls:
-        tool_name = call["tool_name"]
-        parameters = call["parameters"]
+    return _iter_script_chunks(tool_calls, templates, processors, compress_loops, stats, progress)
+
+def _select_passes(optimize: Union[bool, Sequence[str]], defer_sketch_compute: bool) -> List[str]:
+    """
+    Resolve the generation options into the optimization passes to run.
+    
+    Args:
+        optimize: True for the default passes, or the names of the passes.
+        defer_sketch_compute: Whether to add the defer_sketch_compute pass.
         
-        if tool_name not in TOOLS_BY_NAME:
-            raise ValueError(f"Unknown tool: {tool_name}")
+    Returns:
+        The names of the passes; empty if the script needs no IR.
         
-        template = SCRIPT_TEMPLATES.get(tool_name)
-        if not template:
-            raise ValueError(f"No script template available for tool: {tool_name}")
+    Raises:
+        ValueError: If ``optimize`` is neither a boolean nor a list of
+            pass names, or names an unknown pass.
+    """
+    if optimize is True:
+        passes = list(script_ir.DEFAULT_PASSES)
+    elif optimize is False or optimize is None:
+        passes = []
+    elif isinstance(optimize, (list, tuple)) and all(isinstance(name, str) for name in optimize):
+        passes = list(optimize)
+        script_ir.check_passes(passes)
+    else:
+        raise ValueError(f"Invalid optimize: must be true, false or a list of pass names, got {optimize!r}")
+    if defer_sketch_compute and "defer_sketch_compute" not in passes:
+        passes.append("defer_sketch_compute")
+    return passes
+
+def _iter_tool_runs(tool_calls: List[Dict[str, Any]], compress_loops: bool) -> Iterator[Tuple[int, int]]:
+    """
+    Split tool calls into the runs that may be emitted as a loop.
+    
+    Args:
+        tool_calls: The tool calls.
+        compress_loops: Whether consecutive calls of the same tool form a run;
+            otherwise every call is a run of its own.
         
-        processed_params = _process_parameters(tool_name, parameters)
-        tool_script = template.format(**processed_params)
-        tool_scripts.append(tool_script)
+    Yields:
+        The ``(start, end)`` index range of each run.
+    """
+    start = 0
+    for end in range(1, len(tool_calls) + 1):
+        if (not compress_loops or end == len(tool_calls)
+                or tool_calls[end]["tool_name"] != tool_calls[start]["tool_name"]):
+            yield start, end
+            start = end
+
+def _iter_tool_scripts(tool_calls: List[Dict[str, Any]], templates: List[CompiledTemplate],
+                       processors: List[ToolProcessor], compress_loops: bool,
+                       progress: Optional[ProgressCallback] = None) -> Iterator[Tuple[int, int, str, int]]:
+    """
+    Render the tool calls, as loops where possible.
     
-    # Combine all tool scripts
-    combined_tool_script = "\n".join(tool_scripts)
+    Args:
+        tool_calls: The tool calls to render.
+        templates: The compiled template of each tool call.
+        processors: The processor of each tool call.
+        compress_loops: Whether to emit homogeneous runs of calls as loops.
+        progress: Called with the number of calls rendered so far and the
+            total, after each call or loop.
+        
+    Yields:
+        A ``(start, end, tool_script, unrolled_size)`` tuple for each call or
+        loop, where ``start:end`` is the range of calls it covers and
+        ``unrolled_size`` the size of those calls rendered one by one.
+    """
+    for start, end in _iter_tool_runs(tool_calls, compress_loops):
+        loop = None
+        if end - start >= LOOP_MIN_RUN:
+            loop = templates[start].render_loop(
+                [processors[start].process(call["parameters"]) for call in tool_calls[start:end]]
+            )
+        
+        if loop is not None:
+            yield (start, end) + loop
+            if progress is not None:
+                progress(end, len(tool_calls))
+        else:
+            for i in range(start, end):
+                tool_script = _render_tool_script(processors[i], tool_calls[i]["parameters"], templates[i])
+                yield i, i + 1, tool_script, len(tool_script)
+                if progress is not None:
+                    progress(i + 1, len(tool_calls))
+
+def _iter_script_chunks(tool_calls: List[Dict[str, Any]], templates: List[CompiledTemplate],
+                        processors: List[ToolProcessor], compress_loops: bool = False, stats: Optional[Dict[str, Any]] = None,
+                        progress: Optional[ProgressCallback] = None) -> Iterator[str]:
+    """
+    Yield the header, the tool scripts and the footer of a multi-tool script.
     
-    # Indent the combined tool script for inclusion in the base template
-    indented_tool_script = "\n".join(f"        {line}" for line in combined_tool_script.strip().split("\n"))
+    Args:
+        tool_calls: The tool calls to render.
+        templates: The compiled template of each tool call.
+        processors: The processor of each tool call.
+        compress_loops: Whether to emit homogeneous runs of calls as loops.
+        stats: The statistics to fill in, if any.
+        progress: The progress callback, if any.
+        
+    Yields:
+        The chunks of the generated Python script.
+    """
+    header = SCRIPT_HEAD + INDENT
+    yield header
+    
+    script_size = unrolled_size = len(header) + len(SCRIPT_TAIL)
+    loops = looped_steps = 0
+    previous = None
+    for start, end, tool_script, size in _iter_tool_scripts(tool_calls, templates, processors, compress_loops, progress):
+        template = templates[start]
+        unrolled_size += size - len(tool_script)
+        if end - start > 1:
+            loops += 1
+            looped_steps += end - start
+        
+        # Keep the blank lines that separate consecutive tool scripts
+        if previous is not None:
+            tool_script = previous.trail + NEWLINE_INDENT + template.lead + tool_script
+        script_size += len(tool_script)
+        unrolled_size += len(tool_script)
+        yield tool_script
+        previous = template
+    
+    yield SCRIPT_TAIL
+    
+    if stats is not None:
+        stats.update(
+            steps=len(tool_calls),
+            loops=loops,
+            looped_steps=looped_steps,
+            script_size=script_size,
+            unrolled_size=unrolled_size,
+        )
+
+def build_script_ir(tool_calls: List[Dict[str, Any]], templates: List[CompiledTemplate],
+                    processors: List[ToolProcessor], compress_loops: bool = False,
+                    progress: Optional[ProgressCallback] = None) -> Tuple[ScriptIR, int]:
+    """
+    Render tool calls into the IR consumed by the optimization passes.
+    
+    Args:
+        tool_calls: The tool calls to render, already validated.
+        templates: The compiled template of each tool call.
+        processors: The processor of each tool call.
+        compress_loops: Whether to emit homogeneous runs of calls as loops.
+        progress: The progress callback, if any.
+        
+    Returns:
+        The IR, and the size of the script it would produce without loops.
+    """
+    steps = []
+    unrolled_size = len(SCRIPT_HEAD) + len(INDENT) + len(SCRIPT_TAIL)
+    for start, end, tool_script, size in _iter_tool_scripts(tool_calls, templates, processors, compress_loops, progress):
+        template = templates[start]
+        if steps:
+            unrolled_size += len(steps[-1].trail) + len(NEWLINE_INDENT) + len(template.lead)
+        unrolled_size += size
+        steps.append(ToolStep(
+            tool_name=tool_calls[start]["tool_name"],
+            index=start,
+            calls=tool_calls[start:end],
+            lines=tool_script.split(NEWLINE_INDENT),
+            lead=template.lead,
+            trail=template.trail,
+        ))
+    return ScriptIR(steps), unrolled_size
+
+def _iter_ir_chunks(ir: ScriptIR, head: str, tail: str, step_count: int, unrolled_size: int,
+                    report: Dict[str, Dict[str, int]], stats: Optional[Dict[str, Any]]) -> Iterator[str]:
+    """
+    Yield the header, the optimized steps and the footer of a multi-tool script.
     
-    # Generate the full script
-    full_script = BASE_SCRIPT_TEMPLATE.format(tool_scripts=indented_tool_script)
+    Args:
+        ir: The optimized IR.
+        head: The text of the base script before the tool scripts.
+        tail: The text of the base script after the tool scripts.
+        step_count: The number of tool calls in the request.
+        unrolled_size: The size of the script without loops or optimization.
+        report: The counters reported by each optimization pass.
+        stats: The statistics to fill in, if any.
+        
+    Yields:
+        The chunks of the generated Python script.
+    """
+    header = head + INDENT
+    yield header
+    script_size = len(header) + len(tail)
+    for chunk in ir.iter_chunks():
+        script_size += len(chunk)
+        yield chunk
+    yield tail
+    
+    if stats is not None:
+        loops = [step for step in ir.steps if step.is_loop]
+        stats.update(
+            steps=step_count,
+            loops=len(loops),
+            looped_steps=sum(len(step.calls) for step in loops),
+            script_size=script_size,
+            unrolled_size=unrolled_size,
+            passes=report,
+        )
+
+def generate_multi_tool_script(tool_calls: List[Dict[str, Any]], compress_loops: bool = False,
+                               stats: Optional[Dict[str, Any]] = None,
+                               optimize: Union[bool, Sequence[str]] = False,
+                               defer_sketch_compute: bool = False,
+                               profile: bool = False,
+                               profile_path: Optional[str] = None,
+                               progress: Optional[ProgressCallback] = None,
+                               snapshot: Optional[RegistrySnapshot] = None) -> str:
+    """
+    Generate a Fusion 360 Python script for multiple tool calls.
     
-    return full_script
+    Args:
+        tool_calls: A list of dictionaries, each containing 'tool_name' and 'parameters' keys.
+        compress_loops: Emit homogeneous runs of calls of the same tool as loops.
+        stats: If given, filled in with the script statistics (see iter_multi_tool_script).
+        optimize: Run the default or the named optimization passes over the script.
+        defer_sketch_compute: Defer sketch computation while drawing.
+        profile: Time each step and write a JSON timing report when the script ends.
+        profile_path: Where the script writes the timing report.
+        progress: Called with the number of tool calls rendered so far and the total.
+        snapshot: The registry snapshot to generate with; the current one if None.
+        
+    Returns:
+        A string containing the generated Python script.
+    """
+    return "".join(iter_multi_tool_script(
+        tool_calls, compress_loops, stats, optimize, defer_sketch_compute, profile, profile_path, progress, snapshot
+    ))
@@ -0,0 +1,409 @@
+"""
+Script IR for Fusion 360 MCP Server
+
+This module holds the intermediate representation of a multi-tool script:
+the rendered code of each tool call (or loop of tool calls), as lines that
+optimization passes can inspect and rewrite before the script is emitted.
+Passes are registered by name and run in registration order.
+
+The steps keep the tool name and raw parameters of their calls, but their
+code is the rendered template text, not a typed tree: templates splice in
+code produced by the processors (plane lookups, selection loops, export
+options), so their structure is only known once rendered, and parsing every
+rendered step would cost more than the passes save. The passes therefore
+recognize the few line shapes they rewrite (``name = <lookup>`` lines at the
+top level of a step) with patterns, and fail safe on anything else: a name
+used other than to access its attributes (``name.attr``) counts as possibly
+reassigned, and ``sketch`` used other than as ``sketch.attr`` as a use of
+the sketch. A template change they do not recognize thus costs an
+optimization, never correctness, with one exception: which tools leave the
+bodies unchanged is declared in ``BODY_PRESERVING_TOOLS``, and must be kept
+up to date with the templates.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from template_compiler import NEWLINE_INDENT
+
+@dataclass
+class ToolStep:
+    """
+    The code emitted for one tool call, or for a loop over several calls.
+
+    Attributes:
+        tool_name: The name of the tool.
+        index: The index of the (first) call in the request.
+        calls: The tool calls covered by the step, with their raw parameters.
+        lines: The lines of code, relative to the indentation of the script body.
+        lead: The whitespace emitted before the step when it follows another step.
+        trail: The whitespace emitted after the step when another step follows.
+    """
+
+    tool_name: str
+    index: int
+    calls: List[Dict[str, Any]]
+    lines: List[str]
+    lead: str = ""
+    trail: str = ""
+
+    @property
+    def is_loop(self) -> bool:
+        """Whether the step runs several calls in a loop."""
+        return len(self.calls) > 1
+
+    def parameter(self, name: str, default: Any = None) -> Any:
+        """Look up a raw parameter of the first call covered by the step."""
+        return self.calls[0]["parameters"].get(name, default)
+
+    def code(self) -> Iterator[str]:
+        """Iterate over the lines of the step that are not comments."""
+        for line in self.lines:
+            stripped = line.lstrip()
+            if stripped and not stripped.startswith("#"):
+                yield line
+
+@dataclass
+class ScriptIR:
+    """
+    A multi-tool script as a list of steps.
+
+    Attributes:
+        steps: The steps, in execution order.
+        prelude: Lines run once before the first step, such as hoisted lookups.
+    """
+
+    steps: List[ToolStep]
+    prelude: List[str] = field(default_factory=list)
+
+    def iter_chunks(self) -> Iterator[str]:
+        """
+        Emit the script body, one chunk per step.
+
+        Yields:
+            The chunks of the script body (first line unindented), with the
+            blank lines that separate consecutive steps.
+        """
+        previous: Optional[ToolStep] = None
+        if self.prelude:
+            yield NEWLINE_INDENT.join(self.prelude)
+        for step in self.steps:
+            code = NEWLINE_INDENT.join(step.lines)
+            if previous is not None:
+                code = previous.trail + NEWLINE_INDENT + step.lead + code
+            elif self.prelude:
+                code = NEWLINE_INDENT + NEWLINE_INDENT + step.lead + code
+            yield code
+            previous = step
+
+# An optimization pass rewrites the IR in place and returns its counters
+OptimizationPass = Callable[[ScriptIR], Dict[str, int]]
+
+# Optimization passes by name, in the order they run
+OPTIMIZATION_PASSES: Dict[str, OptimizationPass] = {}
+
+# Names of the passes run when optimization is requested without a list
+DEFAULT_PASSES: List[str] = []
+
+def register_pass(name: str, default: bool = True) -> Callable[[OptimizationPass], OptimizationPass]:
+    """
+    Register an optimization pass.
+
+    Args:
+        name: The name of the pass, used to request it.
+        default: Whether the pass runs when optimization is requested
+            without naming the passes.
+
+    Returns:
+        A decorator registering the function.
+    """
+    def decorator(func: OptimizationPass) -> OptimizationPass:
+        OPTIMIZATION_PASSES[name] = func
+        if default and name not in DEFAULT_PASSES:
+            DEFAULT_PASSES.append(name)
+        return func
+
+    return decorator
+
+def check_passes(passes: Sequence[str]) -> None:
+    """
+    Check that optimization passes exist.
+
+    Args:
+        passes: The names of the passes.
+
+    Raises:
+        ValueError: If a pass is unknown.
+    """
+    unknown = [name for name in passes if name not in OPTIMIZATION_PASSES]
+    if unknown:
+        raise ValueError(
+            f"Unknown optimization pass: {', '.join(unknown)}. "
+            f"Must be one of: {', '.join(OPTIMIZATION_PASSES)}"
+        )
+
+def optimize(ir: ScriptIR, passes: Optional[Sequence[str]] = None) -> Dict[str, Dict[str, int]]:
+    """
+    Run optimization passes over the IR, in registration order.
+
+    Args:
+        ir: The IR, rewritten in place.
+        passes: The names of the passes to run; the default passes if None.
+
+    Returns:
+        The counters reported by each pass, by pass name.
+    """
+    selected = DEFAULT_PASSES if passes is None else passes
+    check_passes(selected)
+    return {name: func(ir) for name, func in OPTIMIZATION_PASSES.items() if name in selected}
+
+# Values that are the same object from anywhere in the script
+HOISTABLE_LOOKUP = re.compile(
+    r"component\.sketches|component\.features\.\w+"
+    r"|adsk\.fusion\.ExportManager\.cast\(design\.exportManager\)"
+)
+
+# A hoistable lookup at the top level of a step: the assigned name and the value
+_LOOKUP_LINE = re.compile(r"^(\w+) = (.*)$")
+_BODY_LOOKUP = re.compile(r"^(\w+) = (component\.bRepBodies\.item\(\d+\))$")
+# A name used other than to access one of its attributes
+_NAME_NOT_READ = re.compile(r"(?<![.\w])([A-Za-z_]\w*)\b(?!\s*\.)")
+# Statements that may bind names anywhere on their line
+_BINDING_STATEMENT = re.compile(r":=|\b(?:for|as|del|import|global|nonlocal|def|class|lambda)\b")
+# The first "=" that is not part of a comparison
+_ASSIGN = re.compile(r"(?<![=!<>])=(?!=)")
+# Uses of the active sketch: the attribute used, or None for any other use
+_SKETCH_USE = re.compile(r"(?<![.\w])sketch\b(?:\s*\.\s*(\w+))?")
+
+# Tools whose steps add, remove or modify no bodies
+BODY_PRESERVING_TOOLS = {"CreateSketch", "DrawRectangle", "DrawCircle", "ExportBody"}
+
+# Tools that only add curves to the active sketch
+SKETCH_DRAWING_TOOLS = {"DrawRectangle", "DrawCircle"}
+
+def _is_sketch_creation(step: ToolStep) -> bool:
+    return step.tool_name == "CreateSketch" and not step.is_loop
+
+def _rebound_names(line: str) -> List[str]:
+    """
+    Return the names a line of code may rebind, erring on the side of too
+    many: the names not only used to access their attributes, left of an
+    assignment or anywhere on a line with another binding statement.
+    """
+    if line.lstrip().startswith("#"):
+        return []
+    if _BINDING_STATEMENT.search(line):
+        return _NAME_NOT_READ.findall(line)
+    assign = _ASSIGN.search(line)
+    if assign is None:
+        return []
+    return _NAME_NOT_READ.findall(line, 0, assign.start())
+
+def _uses_sketch(step: ToolStep) -> bool:
+    return any(_SKETCH_USE.search(line) for line in step.code())
+
+@register_pass("remove_empty_sketches")
+def remove_empty_sketches(ir: ScriptIR) -> Dict[str, int]:
+    """
+    Remove sketches that are replaced by another sketch before anything is
+    drawn in them. A sketch created by the last step is kept.
+    """
+    pending: Optional[ToolStep] = None
+    removed = set()
+    for step in ir.steps:
+        if _is_sketch_creation(step):
+            if pending is not None:
+                removed.add(id(pending))
+            pending = step
+        elif step.tool_name == "CreateSketch" or _uses_sketch(step):
+            pending = None
+    ir.steps = [step for step in ir.steps if id(step) not in removed]
+    return {"steps_removed": len(removed)}
+
+@register_pass("merge_sketches", default=False)
+def merge_sketches(ir: ScriptIR) -> Dict[str, int]:
+    """
+    Draw into the previous sketch instead of creating a new sketch on the
+    same plane, when only drawing steps separate the two.
+
+    Not run by default: the curves of both sketches then form the profiles
+    of a single sketch, which changes the profile indices seen by later
+    Extrude or Revolve steps.
+    """
+    current: Optional[ToolStep] = None
+    removed = set()
+    for step in ir.steps:
+        if _is_sketch_creation(step):
+            plane = str(step.parameter("plane", "")).lower()
+            if current is not None and str(current.parameter("plane", "")).lower() == plane:
+                removed.add(id(step))
+            else:
+                current = step
+        elif step.tool_name not in SKETCH_DRAWING_TOOLS:
+            current = None
+    ir.steps = [step for step in ir.steps if id(step) not in removed]
+    return {"sketches_merged": len(removed)}
+
+# Lines wrapped around the drawing steps of a sketch by defer_sketch_compute
+DEFER_COMPUTE_LINES = ["# Defer sketch computation until the drawing steps are done", "sketch.isComputeDeferred = True", ""]
+RESTORE_COMPUTE_LINES = ["", "# Compute the sketch before its profiles are used", "sketch.isComputeDeferred = False"]
+
+@register_pass("defer_sketch_compute", default=False)
+def defer_sketch_compute(ir: ScriptIR) -> Dict[str, int]:
+    """
+    Turn off sketch computation from the first to the last of consecutive
+    drawing steps in a sketch, so that Fusion 360 computes the sketch once
+    instead of after every curve. The block ends before any step that uses
+    the sketch profiles or creates another sketch.
+
+    Not run by default; requested with the ``defer_sketch_compute`` option.
+    Blocks covering a single curve are not emitted.
+    """
+    blocks = deferred = 0
+    first: Optional[ToolStep] = None
+    last: Optional[ToolStep] = None
+    calls = 0
+
+    def close() -> None:
+        nonlocal blocks, deferred
+        if first is not None and calls > 1:
+            first.lines = DEFER_COMPUTE_LINES + first.lines
+            last.lines = last.lines + RESTORE_COMPUTE_LINES
+            blocks += 1
+            deferred += calls
+
+    for step in ir.steps:
+        uses = {match.group(1) for line in step.code() for match in _SKETCH_USE.finditer(line)}
+        # Anything but drawing curves, including uses the pattern cannot tell, ends the block
+        if step.tool_name == "CreateSketch" or uses - {"sketchCurves"}:
+            close()
+            first = last = None
+            calls = 0
+        elif uses:
+            if first is None:
+                first = step
+            last = step
+            calls += len(step.calls)
+    close()
+    return {"blocks": blocks, "deferred_steps": deferred}
+
+@register_pass("drop_redundant_body_lookups")
+def drop_redundant_body_lookups(ir: ScriptIR) -> Dict[str, int]:
+    """
+    Drop ``component.bRepBodies.item(n)`` lookups that assign a variable the
+    body it already holds, as long as no step in between changed the bodies.
+    Only lookups at the top level of a step are considered, so lookups that
+    run again on every iteration of a loop are kept.
+    """
+    known: Dict[str, str] = {}
+    dropped = 0
+    for step in ir.steps:
+        preserving = step.tool_name in BODY_PRESERVING_TOOLS
+        code = "\n".join(step.lines)
+        if "bRepBodies.item(" not in code:
+            if known:
+                for line in step.lines:
+                    for name in _rebound_names(line):
+                        known.pop(name, None)
+            if not preserving:
+                known.clear()
+            continue
+        
+        lines = []
+        for line in step.lines:
+            match = _BODY_LOOKUP.match(line)
+            if match is not None:
+                name, lookup = match.groups()
+                if known.get(name) == lookup:
+                    dropped += 1
+                    continue
+                known[name] = lookup
+            elif known:
+                for name in _rebound_names(line):
+                    known.pop(name, None)
+            lines.append(line)
+        step.lines = lines
+        if not preserving:
+            known.clear()
+    return {"lookups_dropped": dropped}
+
+@register_pass("hoist_lookups")
+def hoist_lookups(ir: ScriptIR) -> Dict[str, int]:
+    """
+    Move lookups of feature collections and other objects that never change
+    into the prelude, when they run more than once.
+    """
+    runs: Dict[str, int] = {}
+    lookups: Dict[str, str] = {}
+    conflicting = set()
+    candidates = []
+    # Steps rendered from the same call share their code, so analyze it once
+    analyzed: Dict[str, Tuple[List[Tuple[str, str]], List[str]]] = {}
+    for step in ir.steps:
+        code = "\n".join(step.lines)
+        analysis = analyzed.get(code)
+        if analysis is None:
+            # The hoistable lookups of the step, and the names it may rebind
+            assignments = []
+            others = []
+            for line in step.lines:
+                match = _LOOKUP_LINE.match(line)
+                if match is not None and HOISTABLE_LOOKUP.fullmatch(match.group(2)):
+                    assignments.append(match.groups())
+                else:
+                    others.extend(_rebound_names(line))
+            analysis = analyzed[code] = (assignments, others)
+        assignments, others = analysis
+        conflicting.update(others)
+        for name, value in assignments:
+            if lookups.setdefault(name, value) != value:
+                conflicting.add(name)
+            runs[name] = runs.get(name, 0) + len(step.calls)
+        if assignments:
+            candidates.append(step)
+
+    hoisted = {name for name, count in runs.items() if count > 1 and name not in conflicting}
+    if not hoisted:
+        return {"lookups_hoisted": 0, "lookups_removed": 0}
+
+    hoisted_lines = {f"{name} = {lookups[name]}" for name in hoisted}
+    for step in candidates:
+        step.lines = [line for line in step.lines if line.strip() not in hoisted_lines]
+
+    ir.prelude = ir.prelude + ["# Look up the collections used by several steps once"] + [
+        f"{name} = {lookups[name]}" for name in sorted(hoisted)
+    ]
+    return {
+        "lookups_hoisted": len(hoisted),
+        "lookups_removed": sum(runs[name] for name in hoisted) - len(hoisted),
+    }
+
+def add_step_timers(ir: ScriptIR, report_path: Optional[str] = None) -> Dict[str, int]:
+    """
+    Time every step with the ``_StepTimer`` defined by the profiled base
+    script, which writes the timings to a JSON report when the script ends.
+
+    Runs after the optimization passes, so that the timings match the steps
+    that are actually emitted; a loop is timed as a single step.
+
+    Args:
+        ir: The IR, rewritten in place.
+        report_path: Where the script writes the report; a file in the
+            temporary directory of the machine running Fusion 360 if None.
+
+    Returns:
+        The number of timed steps.
+    """
+    for step in ir.steps:
+        step.lines = (
+            [f"timer.start({step.index}, {step.tool_name!r}, {len(step.calls)})"]
+            + step.lines
+            + ["timer.stop()"]
+        )
+    timer_lines = [
+        "# Time each step and write the timing report when the script ends",
+        f"timer = _StepTimer({report_path!r})",
+    ]
+    ir.prelude = timer_lines + ([""] + ir.prelude if ir.prelude else [])
+    return {"timed_steps": len(ir.steps)}
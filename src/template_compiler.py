@@ -0,0 +1,360 @@
+"""
+Template Compiler for Fusion 360 MCP Server
+
+This module compiles the ``str.format`` style script templates into
+pre-parsed, pre-indented segment lists once at import time, so rendering a
+tool script is a single join instead of a reparse, split and re-indent.
+"""
+
+import hashlib
+import math
+import re
+import string
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+# Indentation of tool scripts inside the body of ``run(context)``
+INDENT = "        "
+NEWLINE_INDENT = "\n" + INDENT
+
+# Extra indentation of a loop body
+LOOP_INDENT = "    "
+
+# Names defined by the base script, which loop variables must not shadow
+SCRIPT_NAMES = frozenset({"adsk", "traceback", "context", "ui", "app", "design", "component", "sketch"})
+
+_FORMATTER = string.Formatter()
+_IDENTIFIER_CHARS = frozenset(string.ascii_letters + string.digits + "_")
+
+def indent(text: str, newline_indent: str = NEWLINE_INDENT) -> str:
+    """
+    Indent every line after the first one of a text fragment.
+
+    Args:
+        text: The text to indent.
+        newline_indent: A newline followed by the indentation to apply.
+
+    Returns:
+        The text with every newline followed by the indentation.
+    """
+    return text.replace("\n", newline_indent)
+
+class CompiledTemplate:
+    """
+    A script template parsed into literal segments and fields.
+
+    Rendering the template produces the same text as formatting the source
+    template, stripping it and indenting each line by ``INDENT``, except that
+    the first line is left unindented so fragments can be joined cheaply.
+    The whitespace stripped from either end of the template is kept, already
+    indented, in ``lead`` and ``trail`` for joining several fragments.
+    """
+
+    __slots__ = (
+        "source", "version", "indentation", "lead", "trail", "literals", "fields",
+        "field_names", "loop_fields", "render", "_loop_bodies",
+    )
+
+    def __init__(self, source: str, indentation: str, lead: str, trail: str,
+                 literals: Tuple[str, ...], fields: Tuple[Tuple[str, Optional[str], str], ...],
+                 loop_fields: FrozenSet[str]):
+        self.source = source
+        self.version = hashlib.sha1(source.encode("utf-8")).hexdigest()[:12]
+        self.indentation = indentation
+        self.lead = lead
+        self.trail = trail
+        self.literals = literals
+        self.fields = fields
+        self.field_names = frozenset(name for name, _, _ in fields)
+        self.loop_fields = loop_fields
+        self.render = _specialize(self)
+        self._loop_bodies: Dict[FrozenSet[str], "CompiledTemplate"] = {}
+
+    def render_segments(self, params: Dict[str, Any]) -> str:
+        """
+        Render the template with the given parameters, segment by segment.
+
+        ``render`` is a function specialized for this template at compile
+        time; it falls back to this method when a value spans several lines.
+
+        Args:
+            params: The processed parameters to substitute into the template.
+
+        Returns:
+            The stripped, indented tool script (first line unindented).
+
+        Raises:
+            KeyError: If a parameter used by the template is missing.
+        """
+        literals = self.literals
+        newline_indent = "\n" + self.indentation
+        parts = [literals[0]]
+        for i, (name, conversion, spec) in enumerate(self.fields, 1):
+            text = _field_text(params[name], conversion, spec)
+            if "\n" in text:
+                text = indent(text, newline_indent)
+            parts.append(text)
+            parts.append(literals[i])
+        return "".join(parts)
+
+    def render_loop(self, params_list: Sequence[Dict[str, Any]]) -> Optional[Tuple[str, int]]:
+        """
+        Render several calls of the template as a data table and a single loop.
+
+        The fields whose values differ between calls become loop variables,
+        which is only possible for numeric values of fields that appear as
+        standalone expressions in the template; every other field must have
+        the same value in all calls.
+
+        Args:
+            params_list: The processed parameters of each call.
+
+        Returns:
+            A ``(loop_script, unrolled_size)`` pair, where ``unrolled_size`` is
+            the length the calls would take when rendered one after the other,
+            or None if the calls cannot share a loop.
+        """
+        texts = {}
+        varying = []
+        for name, conversion, spec in self.fields:
+            if name in texts:
+                continue
+            values = [_field_text(params[name], conversion, spec) for params in params_list]
+            texts[name] = values
+            first = values[0]
+            if any(value != first for value in values):
+                if name not in self.loop_fields:
+                    return None
+                for params in params_list:
+                    value = params[name]
+                    if type(value) not in (int, float) or not math.isfinite(value):
+                        return None
+                varying.append(name)
+
+        body = self._loop_body(frozenset(varying))
+        newline_indent = "\n" + self.indentation
+        if not varying:
+            header = f"for _ in range({len(params_list)}):"
+        else:
+            rows = zip(*(texts[name] for name in varying))
+            if len(varying) == 1:
+                table = "".join(f"{newline_indent}{LOOP_INDENT}{row[0]}," for row in rows)
+            else:
+                table = "".join(f"{newline_indent}{LOOP_INDENT}({', '.join(row)})," for row in rows)
+            header = f"for {', '.join(varying)} in [{table}{newline_indent}]:"
+
+        script = header + newline_indent + LOOP_INDENT + body.render(params_list[0])
+
+        # Every call rendered on its own, and the separators between them
+        separator = len(self.trail) + len(newline_indent) + len(self.lead)
+        literal_size = sum(len(literal) for literal in self.literals)
+        unrolled_size = (len(params_list) - 1) * separator + len(params_list) * literal_size
+        for name, _, _ in self.fields:
+            for text in texts[name]:
+                unrolled_size += len(text) + text.count("\n") * len(self.indentation)
+
+        return script, unrolled_size
+
+    def _loop_body(self, loop_variables: FrozenSet[str]) -> "CompiledTemplate":
+        """
+        Compile the template as a loop body, with the given fields replaced by
+        loop variables of the same name.
+
+        Args:
+            loop_variables: The names of the fields that become loop variables.
+
+        Returns:
+            The compiled loop body.
+        """
+        body = self._loop_bodies.get(loop_variables)
+        if body is None:
+            parts = []
+            for literal, name, spec, conversion in _FORMATTER.parse(self.source):
+                parts.append(literal.replace("{", "{{").replace("}", "}}"))
+                if name is None:
+                    continue
+                if name in loop_variables:
+                    parts.append(name)
+                else:
+                    parts.append("{" + name + (f"!{conversion}" if conversion else "") + (f":{spec}" if spec else "") + "}")
+            body = compile_template("".join(parts), self.indentation + LOOP_INDENT)
+            self._loop_bodies[loop_variables] = body
+        return body
+
+def _field_text(value: Any, conversion: Optional[str], spec: str) -> str:
+    """Format a field value as ``str.format`` does."""
+    if conversion is None:
+        return value if spec == "" and type(value) is str else format(value, spec)
+    return format(_convert(value, conversion), spec)
+
+def _specialize(template: CompiledTemplate) -> Callable[[Dict[str, Any]], str]:
+    """
+    Generate a render function specialized for a compiled template.
+
+    The function renders the whole template with a single f-string. Values
+    that contain newlines need indenting, which shows up as extra newlines in
+    the result; those renders are redone segment by segment.
+
+    Args:
+        template: The compiled template.
+
+    Returns:
+        A function taking the template parameters and returning the rendered text.
+    """
+    pieces = []
+    for i, literal in enumerate(template.literals):
+        if literal:
+            pieces.append("f" + repr(literal).replace("{", "{{").replace("}", "}}"))
+        if i < len(template.fields):
+            name, conversion, spec = template.fields[i]
+            field = f"params[{name!r}]"
+            if conversion:
+                field += f"!{conversion}"
+            if spec:
+                field += f":{spec}"
+            pieces.append('f"{' + field + '}"')
+    newlines = sum(literal.count("\n") for literal in template.literals)
+    source = (
+        "def render(params):\n"
+        f"    text = {' '.join(pieces) or repr('')}\n"
+        f"    if text.count('\\n') == {newlines}:\n"
+        "        return text\n"
+        "    return render_segments(params)\n"
+    )
+    namespace = {"render_segments": template.render_segments}
+    exec(compile(source, f"<template {template.version}>", "exec"), namespace)
+    return namespace["render"]
+
+def _convert(value: Any, conversion: str) -> Any:
+    """Apply a ``!r``, ``!s`` or ``!a`` conversion as ``str.format`` does."""
+    if conversion == "r":
+        return repr(value)
+    if conversion == "s":
+        return str(value)
+    if conversion == "a":
+        return ascii(value)
+    raise ValueError(f"Unknown conversion specifier: {conversion}")
+
+def _parse(template: str) -> Tuple[List[str], List[Tuple[str, Optional[str], str]]]:
+    """
+    Split a template into literal text and replacement fields.
+
+    Args:
+        template: The template source.
+
+    Returns:
+        A list of literals (one more than the number of fields) and a list of
+        ``(name, conversion, format_spec)`` tuples.
+    """
+    literals = [""]
+    fields = []
+    for literal, name, spec, conversion in _FORMATTER.parse(template):
+        literals[-1] += literal
+        if name is None:
+            continue
+        if not name.isidentifier():
+            raise ValueError(f"Unsupported template field: {{{name}}}")
+        if "{" in spec:
+            raise ValueError(f"Nested format specs are not supported: {{{name}:{spec}}}")
+        fields.append((name, conversion, spec))
+        literals.append("")
+    return literals, fields
+
+def _find_loop_fields(literals: List[str], fields: List[Tuple[str, Optional[str], str]]) -> FrozenSet[str]:
+    """
+    Find the fields that can be replaced by a variable of the same name.
+
+    A field qualifies when every occurrence is a standalone expression: not
+    inside a string literal or comment, not glued to an identifier, and
+    without a conversion or format spec. Its name must also not clash with
+    a name used by the template or the base script.
+
+    Args:
+        literals: The literal text around the fields.
+        fields: The ``(name, conversion, format_spec)`` tuples.
+
+    Returns:
+        The names of the qualifying fields.
+    """
+    code = "".join(literals)
+    candidates = {name for name, _, _ in fields} - SCRIPT_NAMES
+    quote = None
+    comment = False
+    for i, literal in enumerate(literals):
+        for char in literal:
+            if char == "\n":
+                quote = None
+                comment = False
+            elif comment:
+                continue
+            elif quote is not None:
+                if char == quote:
+                    quote = None
+            elif char in "'\"":
+                quote = char
+            elif char == "#":
+                comment = True
+        if i == len(fields):
+            break
+
+        name, conversion, spec = fields[i]
+        before = literal[-1:]
+        after = literals[i + 1][:1]
+        if (quote is not None or comment or conversion or spec
+                or before in _IDENTIFIER_CHARS or before in ".'\""
+                or after in _IDENTIFIER_CHARS or after in "'\""
+                or re.search(rf"\b{name}\b", code)):
+            candidates.discard(name)
+
+    return frozenset(candidates)
+
+def compile_template(template: str, indentation: str = INDENT) -> CompiledTemplate:
+    """
+    Compile a tool script template.
+
+    Surrounding whitespace is stripped from the literal text at compile
+    time, so whitespace at the edges of a field value that opens or closes
+    the template is kept as is.
+
+    Args:
+        template: The template source, in ``str.format`` syntax.
+        indentation: The indentation of every line after the first one.
+
+    Returns:
+        The compiled template.
+    """
+    literals, fields = _parse(template)
+    loop_fields = _find_loop_fields(literals, fields)
+
+    first = literals[0]
+    literals[0] = first.lstrip()
+    lead = first[:len(first) - len(literals[0])]
+    last = literals[-1]
+    literals[-1] = last.rstrip()
+    trail = last[len(literals[-1]):]
+
+    newline_indent = "\n" + indentation
+    return CompiledTemplate(
+        template,
+        indentation,
+        indent(lead, newline_indent),
+        indent(trail, newline_indent),
+        tuple(indent(literal, newline_indent) for literal in literals),
+        tuple(fields),
+        loop_fields,
+    )
+
+def compile_base_template(template: str, field: str = "tool_scripts") -> Tuple[str, str]:
+    """
+    Compile the base script template into the text around its tool scripts.
+
+    Args:
+        template: The base script template, with a single ``{tool_scripts}`` field.
+        field: The name of the field that receives the tool scripts.
+
+    Returns:
+        A ``(head, tail)`` pair; the full script is ``head + tool_scripts + tail``.
+    """
+    literals, fields = _parse(template)
+    if [name for name, _, _ in fields] != [field] or fields[0][1:] != (None, ""):
+        raise ValueError(f"Base template must contain exactly one {{{field}}} field")
+    return literals[0], literals[1]
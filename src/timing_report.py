@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Timing Reports for Fusion 360 MCP Server
+
+Scripts generated with ``profile=True`` write a JSON timing report when they
+finish in Fusion 360. This module loads those reports and summarizes where
+the time went, per tool and per step.
+
+Usage:
+    python timing_report.py REPORT [REPORT ...] [--top N] [--json]
+"""
+
+import argparse
+import json
+import sys
+from typing import Any, Dict, List, Optional, Sequence
+
+def load_timing_report(path: str) -> Dict[str, Any]:
+    """
+    Load a timing report written by a profiled script.
+
+    Args:
+        path: The path of the report.
+
+    Returns:
+        The report, with ``started``, ``duration``, ``success`` and ``steps``.
+
+    Raises:
+        ValueError: If the file is not a timing report.
+    """
+    with open(path, "r") as f:
+        try:
+            report = json.load(f)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid timing report {path}: {str(e)}") from None
+
+    if not isinstance(report, dict) or not isinstance(report.get("steps"), list):
+        raise ValueError(f"Invalid timing report {path}: missing steps")
+    for step in report["steps"]:
+        if not isinstance(step, dict) or not {"step", "tool", "duration", "success"} <= step.keys():
+            raise ValueError(f"Invalid timing report {path}: malformed step {step!r}")
+    report.setdefault("path", path)
+    return report
+
+def summarize_timing_reports(reports: Sequence[Dict[str, Any]], top: int = 10) -> Dict[str, Any]:
+    """
+    Summarize one or more timing reports.
+
+    Args:
+        reports: The loaded reports.
+        top: The number of slowest steps to list.
+
+    Returns:
+        A dictionary with the number of reports and failed runs, the total
+        script and step durations, per-tool totals (steps, calls, total,
+        mean and max duration, failures) sorted by total time, the slowest
+        steps and the failed steps.
+    """
+    tools: Dict[str, Dict[str, Any]] = {}
+    steps: List[Dict[str, Any]] = []
+    for index, report in enumerate(reports):
+        for step in report["steps"]:
+            steps.append(dict(step, report=report.get("path", index)))
+            totals = tools.setdefault(step["tool"], {
+                "steps": 0, "calls": 0, "total": 0.0, "max": 0.0, "failures": 0,
+            })
+            totals["steps"] += 1
+            totals["calls"] += step.get("calls", 1)
+            totals["total"] += step["duration"]
+            totals["max"] = max(totals["max"], step["duration"])
+            totals["failures"] += not step["success"]
+
+    for totals in tools.values():
+        totals["mean"] = totals["total"] / totals["calls"]
+
+    return {
+        "reports": len(reports),
+        "failed_reports": sum(1 for report in reports if not report.get("success", True)),
+        "duration": sum(report.get("duration", 0.0) for report in reports),
+        "step_duration": sum(step["duration"] for step in steps),
+        "tools": dict(sorted(tools.items(), key=lambda item: item[1]["total"], reverse=True)),
+        "slowest": sorted(steps, key=lambda step: step["duration"], reverse=True)[:top],
+        "failures": [step for step in steps if not step["success"]],
+    }
+
+def format_summary(summary: Dict[str, Any]) -> str:
+    """
+    Format a summary as a plain-text table.
+
+    Args:
+        summary: The summary returned by ``summarize_timing_reports``.
+
+    Returns:
+        The formatted summary.
+    """
+    lines = [
+        f"{summary['reports']} report(s), {summary['failed_reports']} failed, "
+        f"{summary['duration']:.3f} s total, {summary['step_duration']:.3f} s in steps",
+        "",
+        f"{'Tool':<20} {'Steps':>6} {'Calls':>6} {'Total (s)':>10} {'Mean (ms)':>10} {'Max (ms)':>10} {'Failed':>6}",
+    ]
+    for tool, totals in summary["tools"].items():
+        lines.append(
+            f"{tool:<20} {totals['steps']:>6} {totals['calls']:>6} {totals['total']:>10.3f} "
+            f"{totals['mean'] * 1e3:>10.2f} {totals['max'] * 1e3:>10.2f} {totals['failures']:>6}"
+        )
+
+    if summary["slowest"]:
+        lines += ["", "Slowest steps:"]
+        for step in summary["slowest"]:
+            lines.append(f"  step {step['step']:>5} {step['tool']:<20} {step['duration'] * 1e3:10.2f} ms")
+
+    if summary["failures"]:
+        lines += ["", "Failed steps:"]
+        for step in summary["failures"]:
+            lines.append(f"  step {step['step']:>5} {step['tool']:<20} {step.get('error', '')}")
+
+    return "\n".join(lines)
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Summarize the timing reports given on the command line."""
+    parser = argparse.ArgumentParser(description="Summarize Fusion 360 MCP timing reports.")
+    parser.add_argument("reports", nargs="+", help="Timing report files written by profiled scripts")
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest steps to list")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    args = parser.parse_args(argv)
+
+    try:
+        reports = [load_timing_report(path) for path in args.reports]
+    except (OSError, ValueError) as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return 1
+
+    summary = summarize_timing_reports(reports, args.top)
+    print(json.dumps(summary, indent=2) if args.json else format_summary(summary))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
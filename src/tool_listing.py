@@ -0,0 +1,236 @@
+"""
+Tool Listings for Fusion 360 MCP Server
+
+This module builds the tool lists served by ``list_tools`` over MCP and by
+``/tools`` over HTTP. They only change with the registry, so each is encoded
+once into a Payload: the JSON bytes and a content hash, which HTTP uses as
+the ETag.
+
+Clients can also ask for a projection of the list, such as the tool names
+alone, and page through it with a cursor. Each projection is encoded tool by
+tool once into ToolSlices, so a page is a join of encoded tools rather than
+a new encoding. Cursors hold the offset and page size, and the hash of the
+projection they page through, so that a cursor from before a registry
+change is refused instead of skipping or repeating tools.
+"""
+
+import base64
+import binascii
+import hashlib
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import json_codec
+
+# The fields of a registry entry listed by /tools
+HTTP_TOOL_FIELDS = ("name", "description", "parameters", "docs")
+
+# The projections of a tool list: every field, the names alone, the names
+# and schemas without descriptions, or the names and descriptions
+FIELD_SETS = ("all", "names", "schemas", "summaries")
+DEFAULT_FIELDS = "all"
+
+# Tools per page when a client starts paging without a limit
+DEFAULT_PAGE_SIZE = 50
+
+class Payload(NamedTuple):
+    """A pre-encoded JSON payload and its content hash."""
+
+    body: json_codec.Fragment
+    etag: str
+
+def make_payload(value: Any) -> Payload:
+    """
+    Encode a payload once.
+
+    Args:
+        value: The JSON value.
+
+    Returns:
+        The payload, with a strong ETag (a quoted hash of the body).
+    """
+    body = json_codec.Fragment(json_codec.dumps(value))
+    return Payload(body, '"' + hashlib.sha256(body).hexdigest()[:32] + '"')
+
+class ToolSlices(NamedTuple):
+    """A tool list encoded tool by tool, and the hash of the whole list."""
+
+    items: Tuple[bytes, ...]
+    etag: str
+
+def check_fields(fields: str) -> str:
+    """
+    Check the name of a projection.
+
+    Args:
+        fields: The projection asked for.
+
+    Returns:
+        The projection.
+
+    Raises:
+        ValueError: If it is not one of FIELD_SETS.
+    """
+    if fields not in FIELD_SETS:
+        raise ValueError(f"Invalid fields: must be one of {', '.join(FIELD_SETS)}, got {fields!r}")
+    return fields
+
+def _input_schema(parameters: Dict[str, Dict[str, Any]], descriptions: bool = True) -> Dict[str, Any]:
+    """Build the input schema of a tool from its parameters."""
+    return {
+        "type": "object",
+        "properties": {
+            name: (
+                {"type": param["type"], "description": param["description"]}
+                if descriptions else {"type": param["type"]}
+            )
+            for name, param in parameters.items()
+        },
+        "required": [
+            name for name, param in parameters.items()
+            if "default" not in param
+        ],
+    }
+
+def _mcp_tool(tool: Dict[str, Any], fields: str) -> Dict[str, Any]:
+    """Describe a tool for ``list_tools`` with the given projection."""
+    if fields == "names":
+        return {"name": tool["name"]}
+    if fields == "summaries":
+        return {"name": tool["name"], "description": tool["description"]}
+    if fields == "schemas":
+        return {"name": tool["name"], "input_schema": _input_schema(tool["parameters"], descriptions=False)}
+    return {
+        "name": tool["name"],
+        "description": tool["description"],
+        "input_schema": _input_schema(tool["parameters"]),
+    }
+
+def _http_tool(tool: Dict[str, Any], fields: str) -> Dict[str, Any]:
+    """Describe a tool for ``/tools`` with the given projection."""
+    if fields == "names":
+        return {"name": tool["name"]}
+    if fields == "summaries":
+        return {"name": tool["name"], "description": tool["description"]}
+    if fields == "schemas":
+        return {
+            "name": tool["name"],
+            "parameters": {
+                name: {key: value for key, value in param.items() if key != "description"}
+                for name, param in tool["parameters"].items()
+            },
+        }
+    return {field: tool[field] for field in HTTP_TOOL_FIELDS}
+
+def mcp_tool_list(tools: Iterable[Dict[str, Any]], fields: str = DEFAULT_FIELDS) -> Dict[str, Any]:
+    """
+    Describe tools for ``list_tools``, with an input schema for each.
+
+    Args:
+        tools: The tool definitions, in the registry format.
+        fields: The projection: every field, the names alone, the names and
+            input schemas without descriptions, or the names and descriptions.
+
+    Returns:
+        The ``list_tools`` result.
+    """
+    return {"tools": [_mcp_tool(tool, fields) for tool in tools]}
+
+def http_tool_list(tools: Iterable[Dict[str, Any]], fields: str = DEFAULT_FIELDS) -> Dict[str, Any]:
+    """
+    Describe tools for ``/tools``, with the fields of ``ToolInfo``.
+
+    Args:
+        tools: The tool definitions, in the registry format.
+        fields: The projection: every field, the names alone, the names and
+            parameters without descriptions, or the names and descriptions.
+
+    Returns:
+        The ``/tools`` response body.
+    """
+    return {"tools": [_http_tool(tool, fields) for tool in tools]}
+
+def make_slices(entries: List[Dict[str, Any]]) -> ToolSlices:
+    """
+    Encode the entries of a tool list one by one.
+
+    Args:
+        entries: The tool list entries, such as the ``tools`` of mcp_tool_list.
+
+    Returns:
+        The encoded entries, with the hash of the list.
+    """
+    items = tuple(json_codec.dumps(entry) for entry in entries)
+    return ToolSlices(items, hashlib.sha256(b",".join(items)).hexdigest()[:32])
+
+def encode_cursor(slices: ToolSlices, offset: int, limit: int) -> str:
+    """
+    Make the cursor of a page.
+
+    Args:
+        slices: The tool list paged through.
+        offset: The position of the first tool of the page.
+        limit: The most tools on the page.
+
+    Returns:
+        An opaque, URL-safe cursor.
+    """
+    return base64.urlsafe_b64encode(f"{offset}:{limit}:{slices.etag}".encode("ascii")).decode("ascii").rstrip("=")
+
+def decode_cursor(slices: ToolSlices, cursor: str) -> Tuple[int, int]:
+    """
+    Read a cursor made by encode_cursor.
+
+    Args:
+        slices: The tool list paged through.
+        cursor: The cursor.
+
+    Returns:
+        The offset and page size of the page.
+
+    Raises:
+        ValueError: If the cursor is malformed, or was made for another
+            version of the list.
+    """
+    try:
+        text = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("ascii")
+        offset, limit, etag = text.split(":")
+        offset, limit = int(offset), int(limit)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Invalid cursor") from None
+    if etag != slices.etag:
+        raise ValueError("Invalid cursor: the tool list has changed, list the tools again")
+    if offset < 0 or limit < 1:
+        raise ValueError("Invalid cursor")
+    return offset, limit
+
+def tool_page(slices: ToolSlices, cursor: Optional[str] = None, limit: Optional[int] = None,
+              cursor_key: str = "nextCursor") -> Payload:
+    """
+    Serve a page of a tool list from its encoded entries.
+
+    Args:
+        slices: The tool list.
+        cursor: The cursor of the page, from the previous page; the first
+            page if None.
+        limit: The most tools on the page. Defaults to the page size of the
+            cursor, or DEFAULT_PAGE_SIZE for the first page.
+        cursor_key: The member holding the cursor of the next page, which is
+            left out on the last page.
+
+    Returns:
+        The page, ``{"tools": [...], cursor_key: ...}``, with an ETag that
+        depends on the list and the bounds of the page.
+
+    Raises:
+        ValueError: If the cursor or the limit is invalid.
+    """
+    offset, page_size = decode_cursor(slices, cursor) if cursor is not None else (0, DEFAULT_PAGE_SIZE)
+    if limit is not None:
+        if limit < 1:
+            raise ValueError(f"Invalid limit: must be at least 1, got {limit}")
+        page_size = limit
+    end = offset + page_size
+    body = b'{"tools":[' + b",".join(slices.items[offset:end]) + b"]"
+    if end < len(slices.items):
+        body += b',"' + cursor_key.encode("ascii") + b'":' + json_codec.dumps(encode_cursor(slices, end, page_size))
+    return Payload(json_codec.Fragment(body + b"}"), f'"{slices.etag}-{offset}-{page_size}"')
@@ -0,0 +1,197 @@
+"""
+Tool Packs for Fusion 360 MCP Server
+
+A tool pack adds tools to the server without editing it. It is a directory
+holding a ``pack.json`` manifest, the pack's Python module and, optionally,
+script templates::
+
+    loft/
+        pack.json               {"name", "description", "module", "tools": [...]}
+        loft.py                 calls register_template / register_processor
+        templates/<tool>.template
+
+The tools in the manifest are full registry entries. Packs are discovered at
+startup from their manifests alone, so the server lists and validates their
+tools without running any pack code; the module is imported the first time
+one of the pack's tools is called.
+"""
+
+import importlib.util
+import json
+import os
+import sys
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+from registry import check_tool_name
+from validators import compile_validator_code
+
+# The manifest file of a pack directory
+MANIFEST_FILE = "pack.json"
+TEMPLATES_DIR = "templates"
+TEMPLATE_SUFFIX = ".template"
+
+class ToolPack:
+    """
+    A discovered tool pack.
+
+    Attributes:
+        name: The pack name.
+        path: The pack directory.
+        tools: The registry entries of the pack's tools.
+        module: The file name of the pack's module, if it has one.
+        loaded: Whether the module has been imported.
+    """
+
+    def __init__(self, name: str, path: str, tools: List[Dict[str, Any]], module: Optional[str] = None):
+        """
+        Describe a tool pack.
+
+        Args:
+            name: The pack name.
+            path: The pack directory.
+            tools: The registry entries of the pack's tools.
+            module: The file name of the pack's module, relative to its directory.
+        """
+        self.name = name
+        self.path = path
+        self.tools = tools
+        self.module = module
+        self.loaded = False
+        self._lock = threading.Lock()
+
+    def load(self) -> None:
+        """
+        Import the pack's module, once, which registers its templates and processors.
+
+        Raises:
+            Exception: Whatever the module raises; the import is tried again
+                on the next call.
+        """
+        if self.loaded:
+            return
+        with self._lock:
+            if self.loaded:
+                return
+            if self.module is not None:
+                spec = importlib.util.spec_from_file_location(
+                    f"tool_pack_{self.name}", os.path.join(self.path, self.module)
+                )
+                module = importlib.util.module_from_spec(spec)
+                spec.loader.exec_module(module)
+            self.loaded = True
+
+    def template(self, tool_name: str) -> Optional[str]:
+        """
+        Read the template file the pack ships for a tool.
+
+        Args:
+            tool_name: The name of the tool.
+
+        Returns:
+            The template source, or None if the pack has no template file for it.
+        """
+        path = os.path.join(self.path, TEMPLATES_DIR, tool_name + TEMPLATE_SUFFIX)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+
+def read_pack(path: str) -> ToolPack:
+    """
+    Read the manifest of a pack directory.
+
+    Args:
+        path: The pack directory.
+
+    Returns:
+        The pack.
+
+    Raises:
+        OSError: If the manifest cannot be read.
+        ValueError: If the manifest is not valid, or one of its tools is not
+            (checked as the registry checks its own tools).
+    """
+    with open(os.path.join(path, MANIFEST_FILE), "rb") as f:
+        manifest = json.loads(f.read())
+    if not isinstance(manifest, dict) or not isinstance(manifest.get("name"), str):
+        raise ValueError("The manifest must be an object with a name")
+    tools = manifest.get("tools")
+    if not isinstance(tools, list) or not all(
+        isinstance(tool, dict) and isinstance(tool.get("name"), str) and isinstance(tool.get("parameters"), dict)
+        for tool in tools
+    ):
+        raise ValueError("The manifest tools must be a list of tools, each with a name and parameters")
+    for tool in tools:
+        try:
+            check_tool_name(tool["name"])
+            compile_validator_code(tool)
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Invalid tool {tool['name']!r}: {e}") from None
+    module = manifest.get("module")
+    if module is not None and not isinstance(module, str):
+        raise ValueError("The manifest module must be a file name")
+    return ToolPack(manifest["name"], path, tools, module)
+
+def discover_packs(directories: Iterable[str]) -> List[ToolPack]:
+    """
+    Find the tool packs in the given directories, reading only their manifests.
+
+    Every subdirectory holding a ``pack.json`` is a pack. Missing directories
+    are skipped, and so are packs whose manifest does not load, and tools
+    already provided by another pack; both are reported on stderr.
+
+    Args:
+        directories: The directories to search, in order of precedence.
+
+    Returns:
+        The packs, in discovery order.
+    """
+    packs = []
+    seen = set()
+    for directory in directories:
+        if not os.path.isdir(directory):
+            continue
+        for entry in sorted(os.scandir(directory), key=lambda entry: entry.name):
+            if not os.path.isfile(os.path.join(entry.path, MANIFEST_FILE)):
+                continue
+            try:
+                pack = read_pack(entry.path)
+            except (OSError, ValueError) as e:
+                print(f"Skipping tool pack {entry.path}: {e}", file=sys.stderr)
+                continue
+            for tool in pack.tools:
+                if tool["name"] in seen:
+                    print(f"Skipping tool {tool['name']} of pack {pack.name}: already provided", file=sys.stderr)
+            pack.tools = [tool for tool in pack.tools if tool["name"] not in seen]
+            seen.update(tool["name"] for tool in pack.tools)
+            packs.append(pack)
+    return packs
+
+def packs_by_tool(packs: Iterable[ToolPack]) -> Dict[str, ToolPack]:
+    """
+    Index packs by the names of the tools they provide.
+
+    Args:
+        packs: The packs.
+
+    Returns:
+        The pack of each tool, by tool name.
+    """
+    return {tool["name"]: pack for pack in packs for tool in pack.tools}
+
+def pack_stamp(packs: Iterable[ToolPack]) -> str:
+    """
+    Identify the manifests of packs by size and modification time, to tag the registry cache.
+
+    Args:
+        packs: The packs.
+
+    Returns:
+        A string that changes when a manifest does.
+    """
+    stamps = []
+    for pack in packs:
+        stat = os.stat(os.path.join(pack.path, MANIFEST_FILE))
+        stamps.append((pack.path, stat.st_size, stat.st_mtime_ns))
+    return repr(stamps)
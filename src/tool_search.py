@@ -0,0 +1,192 @@
+"""
+Tool Search for Fusion 360 MCP Server
+
+With hundreds of tools, the full tool list costs an agent many tokens before
+it has done anything. This module finds the tools matching a query instead,
+over their names, descriptions and parameter names, so that only the schemas
+of those tools need to be sent.
+
+The search runs on an inverted index built once per registry snapshot and
+kept in the compiled registry cache: each term maps to the tools it appears
+in, with a weight for the fields it appears in (the name counts most) times
+its inverse document frequency. Names are split on case and underscores, so
+``DrawCircle`` and ``profile_indices`` match ``circle`` and ``profile``, and
+query terms also match the longer terms they start, at a lower weight.
+
+The tools of each term are also kept in decreasing order of weight. A query
+only adds up the scores of the tools matching its rarer terms; the tools
+matching nothing but its most common term score that term's weight alone,
+so the best of them are the first ones in its order. Searches thus cost
+about the size of the rarer terms' postings, not of the whole index.
+"""
+
+import heapq
+import math
+import re
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+from registry import LazyTools, RegistrySnapshot
+
+# The weight of a term in each field of a tool
+FIELD_WEIGHTS = {"name": 3.0, "parameters": 1.5, "description": 1.0}
+
+# The weight of a term matched by prefix, relative to an exact match, and
+# the most terms a query term expands to
+PREFIX_WEIGHT = 0.5
+MAX_PREFIX_TERMS = 16
+
+# Default number of tools returned
+DEFAULT_LIMIT = 10
+
+# Words too common in tool descriptions to tell tools apart
+STOPWORDS = frozenset({"a", "an", "and", "as", "at", "by", "e", "for", "from", "g", "in", "into", "is", "it", "of", "on", "or", "the", "to", "with"})
+
+_WORD = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase search terms, breaking identifiers on case and underscores.
+
+    Args:
+        text: The text, such as a tool name, description or query.
+
+    Returns:
+        The terms, in order, without stopwords.
+    """
+    return [word for word in (match.lower() for match in _WORD.findall(text)) if word not in STOPWORDS]
+
+class ToolSearchIndex:
+    """
+    An inverted index over the names, descriptions and parameter names of tools.
+
+    Attributes:
+        names: The tool names, by document number.
+    """
+
+    __slots__ = ("names", "_postings", "_ranked", "_terms")
+
+    def __init__(self, tools: Iterable[Tuple[str, str, Sequence[str]]]):
+        """
+        Index tools.
+
+        Args:
+            tools: The name, description and parameter names of each tool,
+                in registry order, which breaks ties between equal scores.
+        """
+        self.names: List[str] = []
+        weights: Dict[str, Dict[int, float]] = {}
+        for doc, (name, description, parameters) in enumerate(tools):
+            self.names.append(name)
+            fields = {
+                "name": tokenize(name),
+                "parameters": [term for parameter in parameters for term in tokenize(parameter)],
+                "description": tokenize(description),
+            }
+            for field, terms in fields.items():
+                for term in set(terms):
+                    postings = weights.setdefault(term, {})
+                    postings[doc] = postings.get(doc, 0.0) + FIELD_WEIGHTS[field]
+
+        # Scale by the inverse document frequency once, so a query only adds weights up
+        count = len(self.names)
+        self._postings = {
+            term: {doc: weight * math.log(1 + count / len(postings)) for doc, weight in postings.items()}
+            for term, postings in weights.items()
+        }
+        self._ranked = {
+            term: tuple(sorted(postings, key=lambda doc: (-postings[doc], doc)))
+            for term, postings in self._postings.items()
+        }
+        self._terms = sorted(self._postings)
+
+    def search(self, query: str, limit: int = DEFAULT_LIMIT) -> List[Tuple[str, float]]:
+        """
+        Find the tools best matching a query.
+
+        Args:
+            query: Free text; every term adds to the score of the tools it matches.
+            limit: The most tools returned.
+
+        Returns:
+            The name and score of the matching tools, best first.
+        """
+        matches = [match for token in set(tokenize(query)) for match in self._matches(token)]
+        if not matches or limit < 1:
+            return []
+
+        # Score the tools of every term but the most common one in full
+        common = max(matches, key=lambda match: len(self._postings[match[0]]))
+        common_postings = self._postings[common[0]]
+        scores: Dict[int, float] = {}
+        for term, scale in matches:
+            if (term, scale) == common:
+                continue
+            for doc, weight in self._postings[term].items():
+                scores[doc] = scores.get(doc, 0.0) + weight * scale
+        for doc in scores:
+            scores[doc] += common_postings.get(doc, 0.0) * common[1]
+
+        # The other tools only match the common term; its order ranks them
+        taken = 0
+        for doc in self._ranked[common[0]]:
+            if doc not in scores:
+                scores[doc] = common_postings[doc] * common[1]
+                taken += 1
+                if taken == limit:
+                    break
+
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [(self.names[doc], round(score, 4)) for doc, score in best]
+
+    def _matches(self, token: str) -> List[Tuple[str, float]]:
+        """Look up the terms a query term matches, with the scale of each match."""
+        matches = []
+        if token in self._postings:
+            matches.append((token, 1.0))
+        start = bisect_left(self._terms, token)
+        for term in self._terms[start:start + MAX_PREFIX_TERMS + 1]:
+            if not term.startswith(token):
+                break
+            if term != token:
+                matches.append((term, PREFIX_WEIGHT))
+        return matches
+
+def _summaries(snapshot: RegistrySnapshot) -> Iterable[Tuple[str, str, Sequence[str]]]:
+    """Describe the tools of a snapshot for the index, from the registry index where it has them."""
+    by_name = snapshot.by_name
+    for name in by_name:
+        entry = by_name.entry(name) if isinstance(by_name, LazyTools) else None
+        if entry is None or "parameters" not in entry:
+            entry = by_name[name]
+        yield name, entry.get("description", ""), list(entry["parameters"])
+
+def build_search_index(snapshot: RegistrySnapshot) -> ToolSearchIndex:
+    """
+    Index the tools of a registry snapshot.
+
+    The index entries of a sharded registry list the parameter names of each
+    tool, so the shards are not read.
+
+    Args:
+        snapshot: The registry snapshot.
+
+    Returns:
+        The search index.
+    """
+    return ToolSearchIndex(_summaries(snapshot))
+
+def search_tools(snapshot: RegistrySnapshot, query: str, limit: int = DEFAULT_LIMIT) -> List[Dict[str, Any]]:
+    """
+    Find the tools of a registry snapshot best matching a query.
+
+    Args:
+        snapshot: The registry snapshot.
+        query: The query.
+        limit: The most tools returned.
+
+    Returns:
+        The definitions of the matching tools, best first.
+    """
+    index = snapshot.derived("search_index", build_search_index, persistent=True)
+    return [snapshot.by_name[name] for name, _ in index.search(query, limit)]
@@ -0,0 +1,277 @@
+"""
+Parameter Validators for Fusion 360 MCP Server
+
+This module compiles the parameter schema of each tool in the registry into
+a specialized validation function, generated once when the registry loads.
+Validating a call is then a handful of type and membership checks, with no
+per-request walk over the schema.
+"""
+
+import math
+from types import CodeType
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+# Python types accepted for each registry parameter type
+SCHEMA_TYPES: Dict[str, FrozenSet[type]] = {
+    "number": frozenset({int, float}),
+    "integer": frozenset({int}),
+    "string": frozenset({str}),
+    "boolean": frozenset({bool}),
+    "array": frozenset({list}),
+    "object": frozenset({dict}),
+    "null": frozenset({type(None)}),
+}
+
+_TYPE_NAMES = {
+    int: "integer",
+    float: "number",
+    str: "string",
+    bool: "boolean",
+    list: "array",
+    dict: "object",
+    type(None): "null",
+}
+
+class ParameterValidationError(ValueError):
+    """
+    Raised when tool call parameters do not match the registry schema.
+
+    The message lists every error, separated by semicolons; the individual
+    messages are available in ``errors``.
+    """
+
+    def __init__(self, errors: List[str], tool_name: Optional[str] = None):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+        self.tool_name = tool_name
+
+def json_type_name(value: Any) -> str:
+    """
+    Name the JSON type of a value, for error messages.
+
+    Args:
+        value: The value.
+
+    Returns:
+        The JSON type name, or the Python type name for other values.
+    """
+    return _TYPE_NAMES.get(type(value), type(value).__name__)
+
+def _schema_types(tool_name: str, name: str, schema: Dict[str, Any]) -> FrozenSet[type]:
+    """
+    Look up the Python types accepted by a parameter schema.
+
+    Args:
+        tool_name: The name of the tool, for error messages.
+        name: The name of the parameter, for error messages.
+        schema: The parameter schema, with a ``type`` given as a name or a list of names.
+
+    Returns:
+        The accepted Python types; empty when the schema declares no type.
+
+    Raises:
+        ValueError: If the schema declares an unknown type.
+    """
+    declared = schema.get("type")
+    if declared is None:
+        return frozenset()
+    types = frozenset()
+    for type_name in [declared] if isinstance(declared, str) else declared:
+        if type_name not in SCHEMA_TYPES:
+            raise ValueError(f"Unsupported type for {tool_name} parameter {name}: {type_name}")
+        types |= SCHEMA_TYPES[type_name]
+    return types
+
+def _type_label(schema: Dict[str, Any]) -> str:
+    """Describe the declared type of a schema, for error messages."""
+    declared = schema["type"]
+    return declared if isinstance(declared, str) else " or ".join(declared)
+
+def _enum_options(schema: Dict[str, Any]) -> Optional[Dict[Any, Any]]:
+    """
+    Build the lookup table for an ``enum``, matching strings case-insensitively.
+
+    Args:
+        schema: The parameter schema.
+
+    Returns:
+        A dictionary mapping the normalized options to themselves, or None
+        if the schema declares no enum.
+    """
+    options = schema.get("enum")
+    if options is None:
+        return None
+    return {option.lower() if type(option) is str else option: option for option in options}
+
+def _first_invalid_item(value: List[Any], types: FrozenSet[type]) -> str:
+    """
+    Describe the first array item that does not match the item types.
+
+    Only called once the fast check of the whole array has failed.
+    """
+    for index, item in enumerate(value):
+        if type(item) not in types:
+            return f"item {index} must be {'/'.join(sorted(_TYPE_NAMES[t] for t in types))}, got {json_type_name(item)}"
+        if type(item) is float and not math.isfinite(item):
+            return f"item {index} must be a finite number, got {item}"
+    return "invalid item"
+
+def _check_default(tool_name: str, name: str, schema: Dict[str, Any], types: FrozenSet[type]) -> None:
+    """
+    Check that the default of a parameter matches its own schema.
+
+    Raises:
+        ValueError: If the default does not match.
+    """
+    default = schema["default"]
+    if types and type(default) not in types:
+        raise ValueError(
+            f"Default for {tool_name} parameter {name} must be {_type_label(schema)}, "
+            f"got {json_type_name(default)}"
+        )
+    options = _enum_options(schema)
+    if options is not None and (default.lower() if type(default) is str else default) not in options:
+        raise ValueError(f"Default for {tool_name} parameter {name} is not one of its enum options: {default}")
+
+def generate_validator_source(tool: Dict[str, Any]) -> str:
+    """
+    Generate the source of the validation function for a tool.
+
+    The generated function names its constants ``TYPES_<n>``, ``OPTIONS_<n>``
+    and ``ITEM_TYPES_<n>``, numbered by parameter, which ``load_validator``
+    supplies as globals.
+
+    Args:
+        tool: The tool definition from the registry.
+
+    Returns:
+        The source of a ``validate(params)`` function.
+    """
+    tool_name = tool["name"]
+    lines = [
+        "def validate(params):",
+        "    if type(params) is not dict:",
+        f"        raise ParameterValidationError(['Parameters must be an object, got ' + json_type_name(params)], {tool_name!r})",
+        "    errors = []",
+    ]
+
+    for i, (name, schema) in enumerate(tool["parameters"].items()):
+        types = _schema_types(tool_name, name, schema)
+        lines.append(f"    value = params.get({name!r}, MISSING)")
+        lines.append("    if value is MISSING:")
+        if "default" in schema:
+            lines.append("        pass")
+        else:
+            lines.append(f"        errors.append({f'Missing required parameter: {name}'!r})")
+
+        if types:
+            lines.append(f"    elif type(value) not in TYPES_{i}:")
+            lines.append(
+                f"        errors.append({f'Invalid {name}: must be {_type_label(schema)}, got '!r} + json_type_name(value))"
+            )
+        if float in types:
+            lines.append("    elif type(value) is float and not isfinite(value):")
+            lines.append(f"        errors.append({f'Invalid {name}: must be a finite number, got '!r} + str(value))")
+
+        options = _enum_options(schema)
+        if options is not None:
+            key = "(value.lower() if type(value) is str else value)"
+            choices = ". Must be one of: " + ", ".join(map(str, schema["enum"]))
+            lines.append(f"    elif {key} not in OPTIONS_{i}:")
+            lines.append(f"        errors.append({f'Invalid {name}: '!r} + str({key}) + {choices!r})")
+
+        items = schema.get("items")
+        if list in types and items is not None:
+            item_types = _schema_types(tool_name, f"{name} items", items)
+            if item_types:
+                check = f"not set(map(type, value)) <= ITEM_TYPES_{i}"
+                if float in item_types:
+                    check += " or (float in set(map(type, value)) and not all(map(isfinite, value)))"
+                if types != {list}:
+                    # Only arrays have items to check when the parameter takes other types too
+                    check = f"type(value) is list and ({check})"
+                lines.append(f"    elif {check}:")
+                lines.append(
+                    f"        errors.append({f'Invalid {name}: '!r} + first_invalid_item(value, ITEM_TYPES_{i}))"
+                )
+
+    lines.append("    if errors:")
+    lines.append(f"        raise ParameterValidationError(errors, {tool_name!r})")
+    return "\n".join(lines) + "\n"
+
+def compile_validator(tool: Dict[str, Any]) -> Callable[[Dict[str, Any]], None]:
+    """
+    Compile the validation function for a tool from its registry entry.
+
+    The function checks required parameters, types (booleans are not
+    numbers, and numbers must be finite), enum options (strings matched
+    case-insensitively) and array item types, and raises a single
+    ParameterValidationError listing every error. Parameters that are not
+    declared in the registry are passed through unchecked.
+
+    Args:
+        tool: The tool definition from the registry.
+
+    Returns:
+        A function taking the raw call parameters and raising
+        ParameterValidationError if they are invalid.
+
+    Raises:
+        ValueError: If the registry entry declares an unsupported type or
+            a default that does not match its schema.
+    """
+    return load_validator(*compile_validator_code(tool))
+
+def compile_validator_code(tool: Dict[str, Any]) -> Tuple[CodeType, Dict[str, Any]]:
+    """
+    Compile the validation function for a tool without creating it.
+
+    The code object can be saved with ``marshal`` and the constants with
+    ``pickle``, so that the compiled registry cache skips this step.
+
+    Args:
+        tool: The tool definition from the registry.
+
+    Returns:
+        The code object defining ``validate``, and the constants it uses.
+
+    Raises:
+        ValueError: If the registry entry declares an unsupported type or
+            a default that does not match its schema.
+    """
+    tool_name = tool["name"]
+    constants: Dict[str, Any] = {}
+    for i, (name, schema) in enumerate(tool["parameters"].items()):
+        types = _schema_types(tool_name, name, schema)
+        if "default" in schema:
+            _check_default(tool_name, name, schema, types)
+        constants[f"TYPES_{i}"] = types
+        constants[f"OPTIONS_{i}"] = _enum_options(schema)
+        items = schema.get("items")
+        if items is not None:
+            constants[f"ITEM_TYPES_{i}"] = _schema_types(tool_name, f"{name} items", items)
+
+    source = generate_validator_source(tool)
+    return compile(source, f"<validator {tool_name}>", "exec"), constants
+
+def load_validator(code: CodeType, constants: Dict[str, Any]) -> Callable[[Dict[str, Any]], None]:
+    """
+    Create a validation function from the output of ``compile_validator_code``.
+
+    Args:
+        code: The code object defining ``validate``.
+        constants: The constants it uses.
+
+    Returns:
+        The validation function (see ``compile_validator``).
+    """
+    namespace: Dict[str, Any] = {
+        "MISSING": object(),
+        "ParameterValidationError": ParameterValidationError,
+        "json_type_name": json_type_name,
+        "first_invalid_item": _first_invalid_item,
+        "isfinite": math.isfinite,
+        **constants,
+    }
+    exec(code, namespace)
+    return namespace["validate"]
@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+"""
+Tests for the MCP stdio server.
+"""
+
+import asyncio
+import io
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+# Add the src directory to the Python path
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+sys.path.insert(0, SRC_DIR)
+
+import json_codec
+import mcp_server
+from mcp_server import McpServer
+from script_generator import generate_multi_tool_script
+
+def run_server(*lines):
+    """Run ``main.py --mcp`` with the given stdin lines and return the parsed stdout lines."""
+    result = subprocess.run(
+        [sys.executable, os.path.join(SRC_DIR, "main.py"), "--mcp"],
+        input="".join(line + "\n" for line in lines),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return [json.loads(line) for line in result.stdout.splitlines()]
+
+def list_tools(server):
+    """Call list_tools and decode its pre-encoded result."""
+    return json.loads(server.handle_request({"method": "list_tools"})["result"])["tools"]
+
+def test_list_tools():
+    """list_tools describes every tool with its required parameters."""
+    tools = list_tools(McpServer())
+    extrude = next(tool for tool in tools if tool["name"] == "Extrude")
+    assert extrude["input_schema"]["required"] == ["height"]
+
+def test_list_tools_payload_is_encoded_once():
+    """The tool list is encoded when the server is created and spliced into each response."""
+    server = McpServer()
+    response = server.handle_request({"jsonrpc": "2.0", "id": "x", "method": "list_tools"})
+    assert response["result"] is server.tool_list.body
+    assert json.loads(json_codec.encode_message(response)) == {
+        "jsonrpc": "2.0", "id": "x", "result": json.loads(server.tool_list.body),
+    }
+    batch = json.loads(json_codec.encode_message([response, {"jsonrpc": "2.0", "id": 1, "result": {}}]))
+    assert batch[0]["result"]["tools"] == list_tools(server)
+    assert McpServer().tool_list.etag == server.tool_list.etag
+
+def test_list_tools_pages():
+    """Following nextCursor from the first page lists every tool once, in order."""
+    server = McpServer()
+    names, cursor, pages = [], None, 0
+    while True:
+        params = {"limit": 4} if cursor is None else {"cursor": cursor}
+        result = json.loads(server.handle_request({"method": "list_tools", "params": params})["result"])
+        assert len(result["tools"]) <= 4
+        names += [tool["name"] for tool in result["tools"]]
+        pages += 1
+        cursor = result.get("nextCursor")
+        if cursor is None:
+            break
+    tools = list_tools(server)
+    assert names == [tool["name"] for tool in tools]
+    assert pages == (len(tools) + 3) // 4
+    first = server.handle_request({"method": "list_tools", "params": {"limit": 2}})["result"]
+    assert json.loads(first)["tools"] == tools[:2]
+
+def test_list_tools_fields():
+    """Projections leave out descriptions, or everything but the names."""
+    server = McpServer()
+    full = list_tools(server)
+    result = server.handle_request({"method": "list_tools", "params": {"fields": "names"}})["result"]
+    assert json.loads(result) == {"tools": [{"name": tool["name"]} for tool in full]}
+
+    result = server.handle_request({"method": "list_tools", "params": {"fields": "schemas", "limit": 100}})["result"]
+    extrude = next(tool for tool in json.loads(result)["tools"] if tool["name"] == "Extrude")
+    assert set(extrude) == {"name", "input_schema"}
+    assert extrude["input_schema"]["required"] == ["height"]
+    assert extrude["input_schema"]["properties"]["height"] == {"type": "number"}
+    assert "nextCursor" not in json.loads(result)
+
+    result = server.handle_request({"method": "list_tools", "params": {"fields": "summaries"}})["result"]
+    assert json.loads(result)["tools"][0] == {"name": full[0]["name"], "description": full[0]["description"]}
+
+def test_list_tools_invalid_params():
+    """Unknown projections, bad cursors and limits are reported as invalid params."""
+    server = McpServer()
+    for params, message in [
+        ({"fields": "docs"}, "Invalid params: Invalid fields: must be one of all, names, schemas, summaries, got 'docs'"),
+        ({"cursor": "bm90IGEgY3Vyc29y"}, "Invalid params: Invalid cursor"),
+        ({"cursor": 3}, "Invalid params: cursor must be a string"),
+        ({"limit": 0}, "Invalid params: Invalid limit: must be at least 1, got 0"),
+        ({"limit": "5"}, "Invalid params: limit must be an integer"),
+    ]:
+        response = server.handle_request({"method": "list_tools", "params": params})
+        assert response["error"] == {"code": mcp_server.INVALID_PARAMS, "message": message}
+
+def test_call_tool_errors():
+    """Unknown tools and invalid parameters are reported as invalid params."""
+    server = McpServer()
+    response = server.handle_request({"method": "call_tool", "params": {"name": "Unknown"}})
+    assert response["error"]["code"] == -32602
+    response = server.handle_request({"method": "call_tool", "params": {"name": "DrawCircle", "arguments": {}}})
+    assert response["error"]["data"]["errors"] == ["Missing required parameter: radius"]
+
+def test_call_tool_options_are_validated():
+    """Invalid generation options are reported as invalid params, not internal errors."""
+    server = McpServer()
+
+    def call(options):
+        params = {"name": "CreateSketch", "arguments": {"plane": "xy"}, "options": options}
+        return server.handle_request({"method": "call_tool", "params": params})
+
+    for options, message in [
+        (["optimize"], "Invalid params: options must be an object"),
+        ({"optimise": True}, "Invalid params: unknown options: optimise"),
+        ({"optimize": "hoist_lookups"}, "Invalid params: Invalid optimize: must be boolean or array, got string"),
+        ({"optimize": ["hoist"]}, "Invalid params: Unknown optimization pass: hoist. Must be one of: "),
+        ({"defer_sketch_compute": "yes"}, "Invalid params: Invalid defer_sketch_compute: must be boolean, got string"),
+        ({"profile": 1}, "Invalid params: Invalid profile: must be boolean, got integer"),
+    ]:
+        error = call(options)["error"]
+        assert error["code"] == mcp_server.INVALID_PARAMS
+        assert error["message"].startswith(message)
+    assert "result" in call({"optimize": ["hoist_lookups"], "profile": False})
+    assert "result" in call(None)
+
+def test_stdio_round_trip():
+    """The entry point answers each request line with a response line."""
+    responses = run_server(
+        json.dumps({"method": "list_tools"}),
+        json.dumps({"method": "call_tool", "params": {"name": "CreateSketch", "arguments": {"plane": "xy"}}}),
+    )
+    assert len(responses) == 2
+    assert responses[0]["result"]["tools"]
+    assert "sketches.add(xyPlane)" in responses[1]["result"]["content"][0]["text"]
+
+def test_mcp_mode_skips_http_imports():
+    """Starting MCP mode does not import the HTTP server or its dependencies."""
+    code = (
+        "import sys; sys.argv = ['main.py', '--mcp']; sys.stdin = open(__import__('os').devnull); "
+        "import main; main.main(); "
+        "print(sorted(m for m in ('fastapi', 'uvicorn', 'pydantic', 'http_server') if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=SRC_DIR, capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == "[]"
+
+def test_responses_echo_request_ids():
+    """Responses carry the JSON-RPC version and the id of their request."""
+    server = McpServer()
+    response = server.handle_request({"jsonrpc": "2.0", "id": "a-1", "method": "list_tools"})
+    assert response["jsonrpc"] == "2.0"
+    assert response["id"] == "a-1"
+    response = server.handle_request({"jsonrpc": "2.0", "id": 7, "method": "unknown"})
+    assert (response["id"], response["error"]["code"]) == (7, -32601)
+    response = server.handle_request({"jsonrpc": "1.0", "id": 8, "method": "list_tools"})
+    assert (response["id"], response["error"]["code"]) == (8, -32600)
+    assert server.handle_request([1])["error"]["code"] == -32600
+
+@pytest.mark.parametrize("request_id", [[1], {}, True])
+def test_requests_with_invalid_ids_are_rejected(request_id):
+    """Ids that are not a string, number or null are refused, and not echoed."""
+    server = McpServer()
+    response = server.handle_request({"jsonrpc": "2.0", "id": request_id, "method": "list_tools"})
+    assert response == {"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": "Invalid Request"}}
+    assert not server._in_flight
+
+def test_notifications_get_no_response():
+    """Requests without an id are notifications, and nothing is written for them."""
+    responses = run_server(
+        json.dumps({"jsonrpc": "2.0", "method": "call_tool", "params": {"name": "DrawCircle", "arguments": {}}}),
+        json.dumps({"jsonrpc": "2.0", "method": "list_tools"}),
+        json.dumps({"jsonrpc": "2.0", "id": 1, "method": "list_tools"}),
+    )
+    assert [response["id"] for response in responses] == [1]
+
+def test_parse_errors_are_returned():
+    """Lines that are not JSON get a parse error response instead of a message on stderr."""
+    responses = run_server("{not json", "", json.dumps({"jsonrpc": "2.0", "id": 1, "method": "list_tools"}))
+    assert responses[0]["id"] is None
+    assert responses[0]["error"]["code"] == -32700
+    assert responses[1]["id"] == 1
+
+def test_list_tools_is_not_held_up_by_generations(monkeypatch):
+    """A list_tools request is answered while an earlier generation is still running."""
+    released = threading.Event()
+
+    def slow_generate_script(*args, **kwargs):
+        assert released.wait(5), "list_tools was not answered while the generation ran"
+        return "script"
+
+    class Output(io.BytesIO):
+        def write(self, data):
+            if data.startswith(b'{"jsonrpc":"2.0","id":2,'):
+                released.set()
+            return super().write(data)
+
+    monkeypatch.setattr(mcp_server, "generate_script", slow_generate_script)
+    stdout = Output()
+    mcp_server.run_mcp_server(
+        [
+            json.dumps({"jsonrpc": "2.0", "id": 1, "method": "call_tool", "params": {"name": "CreateSketch", "arguments": {"plane": "xy"}}}),
+            json.dumps({"jsonrpc": "2.0", "id": 2, "method": "list_tools"}),
+        ],
+        stdout,
+    )
+    responses = [json.loads(line) for line in stdout.getvalue().splitlines()]
+    assert [response["id"] for response in responses] == [2, 1]
+    assert responses[1]["result"]["content"][0]["text"] == "script"
+
+def test_call_tool_notifications_run_on_workers(monkeypatch):
+    """A call_tool notification is generated on a worker, so reading goes on meanwhile."""
+    released = threading.Event()
+    waits = []
+
+    def slow_generate_script(*args, **kwargs):
+        # Errors of a notification are not reported, so record the outcome
+        waits.append(released.wait(2))
+        return "script"
+
+    class Output(io.BytesIO):
+        def write(self, data):
+            if data.startswith(b'{"jsonrpc":"2.0","id":2,'):
+                released.set()
+            return super().write(data)
+
+    monkeypatch.setattr(mcp_server, "generate_script", slow_generate_script)
+    stdout = Output()
+    mcp_server.run_mcp_server(
+        [
+            json.dumps({"jsonrpc": "2.0", "method": "call_tool", "params": {"name": "CreateSketch", "arguments": {"plane": "xy"}}}),
+            json.dumps({"jsonrpc": "2.0", "id": 2, "method": "list_tools"}),
+        ],
+        stdout,
+    )
+    responses = [json.loads(line) for line in stdout.getvalue().splitlines()]
+    assert [response["id"] for response in responses] == [2]
+    assert waits == [True]
+
+def test_batches_get_one_response():
+    """A batch is answered with one array holding the responses of its requests, in order."""
+    responses = run_server(
+        json.dumps([
+            {"jsonrpc": "2.0", "id": 1, "method": "call_tool", "params": {"name": "CreateSketch", "arguments": {"plane": "xy"}}},
+            {"jsonrpc": "2.0", "method": "list_tools"},
+            {"jsonrpc": "2.0", "id": 2, "method": "call_tool", "params": {"name": "DrawCircle", "arguments": {}}},
+            {"jsonrpc": "2.0", "id": 3, "method": "list_tools"},
+            4,
+        ]),
+        json.dumps([{"jsonrpc": "2.0", "method": "list_tools"}]),
+        json.dumps([]),
+    )
+    assert len(responses) == 2
+    # The batch of call_tool requests runs on a worker, so it may be answered last
+    batch = next(response for response in responses if isinstance(response, list))
+    empty = next(response for response in responses if isinstance(response, dict))
+    assert [response.get("id") for response in batch] == [1, 2, 3, None]
+    assert "result" in batch[0]
+    assert batch[1]["error"]["code"] == -32602
+    assert batch[3]["error"]["code"] == -32600
+    assert empty["error"]["code"] == -32600
+
+def test_cancelled_requests_are_dropped(monkeypatch):
+    """A request cancelled while it waits for a worker is never generated or answered."""
+    released = threading.Event()
+    generated = []
+
+    def slow_generate_script(tool_name, *args, **kwargs):
+        assert released.wait(5)
+        generated.append(tool_name)
+        return "script"
+
+    class Output(io.BytesIO):
+        def write(self, data):
+            if data.startswith(b'{"jsonrpc":"2.0","id":3,'):
+                released.set()
+            return super().write(data)
+
+    monkeypatch.setattr(mcp_server, "generate_script", slow_generate_script)
+    stdout = Output()
+    call = {"jsonrpc": "2.0", "method": "call_tool", "params": {"name": "CreateSketch", "arguments": {"plane": "xy"}}}
+    mcp_server.run_mcp_server(
+        [
+            json.dumps(dict(call, id=1)),
+            json.dumps(dict(call, id=2)),
+            json.dumps({"jsonrpc": "2.0", "method": "notifications/cancelled", "params": {"requestId": 2}}),
+            json.dumps({"jsonrpc": "2.0", "id": 3, "method": "list_tools"}),
+        ],
+        stdout,
+        workers=1,
+    )
+    responses = [json.loads(line) for line in stdout.getvalue().splitlines()]
+    assert [response["id"] for response in responses] == [3, 1]
+    assert generated == ["CreateSketch"]
+
+def test_progress_notifications_and_cancellation():
+    """Generations report progress to clients that ask for it, and stop once cancelled."""
+    notifications = []
+    server = McpServer(notify=notifications.append)
+    context = server.track({"jsonrpc": "2.0", "id": 1, "method": "call_tool", "params": {"_meta": {"progressToken": "t"}}})
+    calls = [{"tool_name": "DrawCircle", "parameters": {"radius": 1 + i}} for i in range(1000)]
+    generate_multi_tool_script(calls, progress=context.report_progress)
+    assert notifications[0]["method"] == "notifications/progress"
+    assert notifications[-1]["params"] == {"progressToken": "t", "progress": 1000, "total": 1000}
+    # Progress is throttled, not sent once per step
+    assert len(notifications) < 10
+
+    server.handle_request({"jsonrpc": "2.0", "method": "notifications/cancelled", "params": {"requestId": 1}})
+    with pytest.raises(mcp_server.RequestCancelled):
+        generate_multi_tool_script(calls, progress=context.report_progress)
+
+def test_json_codec_round_trip():
+    """The codec writes compact UTF-8 JSON and reads bytes or strings, whatever the backend."""
+    message = {"jsonrpc": "2.0", "id": 1, "result": {"text": "résumé\n", "big": 2 ** 70, "lone": "\ud800"}}
+    data = json_codec.dumps(message)
+    assert isinstance(data, bytes)
+    assert data.startswith(b'{"jsonrpc":"2.0","id":1,')
+    assert b"\n" not in data
+    assert json.loads(data) == message
+    assert json_codec.loads(b'{"a": [1, 2.5]}') == json_codec.loads('{"a": [1, 2.5]}') == {"a": [1, 2.5]}
+    with pytest.raises(ValueError):
+        json_codec.loads(b"{not json")
+
+def test_call_tools_generates_one_script():
+    """The CallTools tool combines an ordered list of tool calls into the same script as /call_tools."""
+    calls = [
+        {"tool_name": "CreateSketch", "parameters": {"plane": "xy"}},
+        {"tool_name": "DrawRectangle", "parameters": {"width": 10, "depth": 10}},
+        {"tool_name": "Extrude", "parameters": {"height": 5}},
+    ]
+    server = McpServer()
+    assert "CallTools" in [tool["name"] for tool in list_tools(server)]
+
+    arguments = {"tool_calls": [{"name": call["tool_name"], "arguments": call["parameters"]} for call in calls]}
+    response = server.handle_request({"method": "call_tool", "params": {"name": "CallTools", "arguments": arguments}})
+    assert response["result"]["content"][0]["text"] == generate_multi_tool_script(calls)
+    assert "stats" not in response["result"]
+
+    arguments["optimize"] = True
+    response = server.handle_request({"method": "call_tool", "params": {"name": "CallTools", "arguments": arguments}})
+    assert response["result"]["content"][0]["text"] == generate_multi_tool_script(calls, optimize=True)
+    assert response["result"]["stats"]["steps"] == 3
+
+def test_call_tools_reports_invalid_steps():
+    """Invalid arguments and invalid steps are reported as invalid params."""
+    server = McpServer()
+
+    def call_tools(arguments):
+        return server.handle_request({"method": "call_tool", "params": {"name": "CallTools", "arguments": arguments}})
+
+    assert call_tools({})["error"]["data"]["errors"] == ["Missing required parameter: tool_calls"]
+    assert call_tools({"tool_calls": [{"arguments": {}}]})["error"]["message"] == "Invalid params: Step 1: missing tool name"
+    steps = [{"name": "CreateSketch", "arguments": {"plane": "xy"}}]
+    response = call_tools({"tool_calls": steps, "optimize": [1]})
+    assert response["error"]["code"] == -32602
+    assert response["error"]["data"]["errors"] == ["Invalid optimize: item 0 must be string, got integer"]
+    response = call_tools({"tool_calls": steps, "optimize": ["hoist_lookups", "inline_everything"]})
+    assert response["error"]["code"] == -32602
+    assert response["error"]["message"].startswith("Invalid params: Unknown optimization pass: inline_everything.")
+    response = call_tools({"tool_calls": [{"name": "CreateSketch", "arguments": {}}, {"name": "DrawCircle", "arguments": {"radius": "big"}}]})
+    assert response["error"]["data"]["errors"] == [
+        "Step 1 (CreateSketch): Missing required parameter: plane",
+        "Step 2 (DrawCircle): Invalid radius: must be number, got string",
+    ]
+
+def test_call_tools_sends_progress_notifications():
+    """A CallTools request with a progress token is followed by progress notifications, then its response."""
+    arguments = {"tool_calls": [{"name": "DrawCircle", "arguments": {"radius": 1 + i}} for i in range(2000)]}
+    messages = run_server(json.dumps({
+        "jsonrpc": "2.0",
+        "id": 1,
+        "method": "call_tool",
+        "params": {"name": "CallTools", "arguments": arguments, "_meta": {"progressToken": 42}},
+    }))
+    assert messages[-1]["id"] == 1
+    progress = [message["params"] for message in messages[:-1]]
+    assert all(message["method"] == "notifications/progress" for message in messages[:-1])
+    assert progress[-1] == {"progressToken": 42, "progress": 2000, "total": 2000}
+
+def test_call_tools_cancelled_over_stdio():
+    """A CallTools request cancelled while it generates stops, and gets no response."""
+    server = McpServer()
+    progressed = threading.Event()
+
+    class Output(io.BytesIO):
+        def write(self, data):
+            if b'"notifications/progress"' in data and not progressed.is_set():
+                progressed.set()
+                # Hold the generation until the cancellation has been read
+                for _ in range(500):
+                    context = server._in_flight.get(1)
+                    if context is None or context.cancelled:
+                        break
+                    time.sleep(0.01)
+            return super().write(data)
+
+    def stdin():
+        arguments = {"tool_calls": [{"name": "DrawCircle", "arguments": {"radius": 1 + i}} for i in range(2000)]}
+        yield json.dumps({
+            "jsonrpc": "2.0",
+            "id": 1,
+            "method": "call_tool",
+            "params": {"name": "CallTools", "arguments": arguments, "_meta": {"progressToken": 7}},
+        })
+        assert progressed.wait(5)
+        yield json.dumps({"jsonrpc": "2.0", "method": "notifications/cancelled", "params": {"requestId": 1}})
+        yield json.dumps({"jsonrpc": "2.0", "id": 2, "method": "list_tools"})
+
+    stdout = Output()
+    asyncio.run(mcp_server.serve_stdio(server, stdin(), stdout))
+    messages = [json.loads(line) for line in stdout.getvalue().splitlines()]
+    assert [message["id"] for message in messages if "id" in message] == [2]
+    assert messages[0]["params"]["progress"] < 2000
+    assert not server._in_flight
+
+def test_invalid_requests_are_not_tracked():
+    """Invalid requests with an id are answered without staying in flight."""
+    server = McpServer()
+    responses = []
+    requests = [{"id": 99}, {"id": 98, "method": 5}, {"jsonrpc": "1.0", "id": 97, "method": "list_tools"}]
+    for request in requests:
+        # As serve_stdio does for requests it hands to a worker
+        server.track(request)
+        responses.append(server.handle_request(request))
+    assert [response["error"]["code"] for response in responses] == [-32600] * 3
+    assert not server._in_flight
+
+    server.handle_request({"jsonrpc": "2.0", "method": "notifications/cancelled", "params": {"requestId": 99}})
+    response = server.handle_request({"jsonrpc": "2.0", "id": 99, "method": "call_tool", "params": {"name": "CreateSketch", "arguments": {"plane": "xy"}}})
+    assert "result" in response
+    assert not server._in_flight
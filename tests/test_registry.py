@@ -0,0 +1,532 @@
+#!/usr/bin/env python3
+"""
+Tests for reloading the tool registry.
+"""
+
+import copy
+import importlib.util
+import io
+import json
+import os
+import pickle
+import sys
+import threading
+
+import pytest
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+import mcp_server
+import registry as registry_module
+import script_generator
+from mcp_server import McpServer
+from registry import ToolRegistry, read_index, shard_path, write_index, write_shard
+from script_generator import generate_multi_tool_script, generate_script
+
+# The tools of the shipped registry itself, without those of the shipped tool packs
+REGISTRY_TOOLS = [tool for tool in script_generator.TOOL_REGISTRY if tool["name"] not in script_generator.PACKS]
+REGISTRY_TOOLS_BY_NAME = {tool["name"]: tool for tool in REGISTRY_TOOLS}
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    """A registry loaded from a copy of tool_registry.json, used by the script generator."""
+    path = tmp_path / "tool_registry.json"
+    path.write_text(json.dumps(REGISTRY_TOOLS))
+    registry = ToolRegistry(str(path), script_generator.build_processors)
+    monkeypatch.setattr(script_generator, "REGISTRY", registry)
+    return registry
+
+def rewrite(registry, edit):
+    """Apply ``edit`` to a copy of the registry's tools by name and write them back to its file."""
+    tools = copy.deepcopy(registry.snapshot.by_name)
+    edit(tools)
+    with open(registry.path, "w") as f:
+        json.dump(list(tools.values()), f)
+    # Make the change visible even on file systems with coarse timestamps
+    stat = os.stat(registry.path)
+    os.utime(registry.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+def test_reload_swaps_in_a_new_snapshot(registry):
+    """A changed file is loaded into a new snapshot; processors of unchanged tools are reused."""
+    before = registry.snapshot
+    assert not registry.reload()
+
+    rewrite(registry, lambda tools: tools["DrawCircle"]["parameters"]["center_z"].update(default=7))
+    assert registry.reload()
+    after = registry.snapshot
+    assert after.version == before.version + 1
+    assert after.digest != before.digest
+    assert after.processors["Extrude"] is before.processors["Extrude"]
+    assert after.processors["DrawCircle"] is not before.processors["DrawCircle"]
+    assert before.by_name["DrawCircle"]["parameters"]["center_z"]["default"] == 0
+
+def test_reload_ignores_unchanged_contents(registry):
+    """Touching the file without changing it keeps the current snapshot."""
+    before = registry.snapshot
+    rewrite(registry, lambda tools: None)
+    assert not registry.reload()
+    assert registry.snapshot is before
+
+def test_invalid_file_keeps_the_snapshot(registry, capsys):
+    """A registry file that does not load is reported once and the current snapshot is kept."""
+    before = registry.snapshot
+    with open(registry.path, "w") as f:
+        f.write('[{"name": "CreateSketch",')
+    assert not registry.reload()
+    assert not registry.reload()
+    assert registry.snapshot is before
+    assert capsys.readouterr().err.count("Keeping tool registry version 1") == 1
+
+    os.remove(registry.path)
+    assert not registry.reload()
+    assert registry.snapshot is before
+
+def test_generation_in_flight_keeps_its_snapshot(registry):
+    """A reload during a generation does not affect it; the next generation sees the new tools."""
+    tool_calls = [
+        {"tool_name": "CreateSketch", "parameters": {"plane": "xy"}},
+        {"tool_name": "DrawCircle", "parameters": {"radius": 2}},
+        {"tool_name": "Extrude", "parameters": {"height": 5}},
+    ]
+    expected = generate_multi_tool_script(tool_calls)
+
+    def remove_extrude(tools):
+        del tools["Extrude"]
+        tools["DrawCircle"]["parameters"]["center_z"]["default"] = 7
+
+    def reload_once(done, total):
+        if done == 1:
+            rewrite(registry, remove_extrude)
+            assert registry.reload()
+
+    assert generate_multi_tool_script(tool_calls, progress=reload_once) == expected
+    with pytest.raises(ValueError, match="Unknown tool: Extrude"):
+        generate_multi_tool_script(tool_calls)
+    # The script cache does not serve the call rendered with the old definition
+    assert "Point3D.create(0, 0, 7)" in generate_script("DrawCircle", {"radius": 2})
+
+def test_mcp_server_serves_the_current_snapshot(registry):
+    """The MCP tool list and tool lookup follow reloads."""
+    server = McpServer(registry=registry)
+    tool_list = server.tool_list
+    assert server.tool_list is tool_list
+
+    rewrite(registry, lambda tools: tools.update(Hole=dict(tools["Fillet"], name="Hole")))
+    assert registry.reload()
+
+    assert server.tool_list.etag != tool_list.etag
+    assert "Hole" in [tool["name"] for tool in json.loads(server.tool_list.body)["tools"]]
+    # Known to the server now, but it has no script template yet
+    response = server.handle_request({"method": "call_tool", "params": {"name": "Hole", "arguments": {}}})
+    assert response["error"]["message"] == "Invalid params: No script template available for tool: Hole"
+
+def test_cursors_from_before_a_reload_are_refused(registry):
+    """A cursor only pages through the tool list it was made for."""
+    server = McpServer(registry=registry)
+    result = server.handle_request({"method": "list_tools", "params": {"fields": "names", "limit": 2}})["result"]
+    cursor = json.loads(result)["nextCursor"]
+
+    rewrite(registry, lambda tools: tools.update(Hole=dict(tools["Fillet"], name="Hole")))
+    assert registry.reload()
+
+    response = server.handle_request({"method": "list_tools", "params": {"fields": "names", "cursor": cursor}})
+    assert response["error"]["message"] == "Invalid params: Invalid cursor: the tool list has changed, list the tools again"
+
+def test_mcp_clients_are_told_when_the_tool_list_changes(registry):
+    """tools/list_changed is sent once the tool list really changes, not when the file is only reformatted."""
+    def requests():
+        yield json.dumps({"jsonrpc": "2.0", "id": 1, "method": "list_tools"})
+        with open(registry.path, "w") as f:
+            json.dump(registry.snapshot.tools, f, indent=2)
+        assert registry.reload()
+        rewrite(registry, lambda tools: tools.update(Hole=dict(tools["Fillet"], name="Hole")))
+        assert registry.reload()
+        yield json.dumps({"jsonrpc": "2.0", "id": 2, "method": "list_tools"})
+
+    stdout = io.BytesIO()
+    mcp_server.run_mcp_server(requests(), stdout, poll_interval=0)
+    messages = [json.loads(line) for line in stdout.getvalue().splitlines()]
+    changed = [i for i, message in enumerate(messages) if message.get("method") == "notifications/tools/list_changed"]
+    assert len(changed) == 1
+    assert "id" not in messages[changed[0]]
+    response = next(i for i, message in enumerate(messages) if message.get("id") == 2)
+    assert changed[0] < response
+    assert "Hole" in [tool["name"] for tool in messages[response]["result"]["tools"]]
+    assert registry._listeners == []
+
+def test_reload_survives_failing_listeners(sharded, capsys):
+    """A listener error is reported, and neither stops the reload nor the list_changed notification."""
+    registry = ToolRegistry(sharded, script_generator.build_processors, sharded + ".cache")
+    registry.flush_cache()
+    server = McpServer(registry=registry)
+    notifications = []
+    server.notify = notifications.append
+
+    def failing(previous, snapshot):
+        raise RuntimeError("listener failed")
+
+    registry.add_listener(failing)
+    registry.add_listener(server.tools_changed)
+
+    # A shard edited by hand, then reindexed, while the old snapshot has not read it
+    with open(shard_path(sharded, "DrawCircle")) as f:
+        circle = json.load(f)
+    circle["description"] = "Draws a circle."
+    with open(shard_path(sharded, "DrawCircle"), "w") as f:
+        json.dump(circle, f)
+    assert load_add_tool().reindex(sharded)
+    touch_index(sharded)
+
+    assert registry.reload()
+    assert registry.snapshot.version == 2
+    assert registry._pending_save is registry.snapshot
+    assert notifications == [{"jsonrpc": "2.0", "method": "notifications/tools/list_changed"}]
+    assert "listener failed" in capsys.readouterr().err
+    registry.flush_cache()
+
+def test_watcher_keeps_polling_after_a_failed_reload(registry, monkeypatch, capsys):
+    """An error escaping a reload is reported, and the watcher goes on polling."""
+    calls = []
+    polled_again = threading.Event()
+
+    def reload():
+        calls.append(len(calls))
+        if len(calls) == 1:
+            raise RuntimeError("reload failed")
+        polled_again.set()
+        return False
+
+    monkeypatch.setattr(registry, "reload", reload)
+    watcher = registry.watch(0.01)
+    assert polled_again.wait(5)
+    assert watcher.is_alive()
+    assert "reload failed" in capsys.readouterr().err
+
+def test_compiled_cache_skips_compiling(tmp_path, monkeypatch):
+    """A second process loads the tools, validators and persistent derived values from the cache."""
+    path = tmp_path / "tool_registry.json"
+    path.write_text(json.dumps(REGISTRY_TOOLS))
+    cache_path = str(tmp_path / "tool_registry.cache")
+
+    def open_registry(tag="v1"):
+        registry = ToolRegistry(str(path), script_generator.build_processors, cache_path, tag)
+        # Written when the process exits otherwise
+        registry.flush_cache()
+        return registry
+
+    first = open_registry()
+    assert first.snapshot.derived("names", lambda snapshot: sorted(snapshot.by_name), persistent=True)
+    first.flush_cache()
+    compiled = []
+    real_compile_tool = script_generator.compile_tool
+    monkeypatch.setattr(script_generator, "compile_tool", lambda tool: compiled.append(tool["name"]) or real_compile_tool(tool))
+
+    def unexpected(snapshot):
+        raise AssertionError("built although cached")
+
+    cached = open_registry()
+    assert compiled == []
+    assert cached.snapshot.digest == first.snapshot.digest
+    assert cached.snapshot.derived("names", unexpected, persistent=True) == sorted(first.snapshot.by_name)
+    with pytest.raises(ValueError, match="Missing required parameter: radius"):
+        cached.snapshot.processors["DrawCircle"].validate({})
+
+    # Touched but unchanged: the contents hash still matches
+    rewrite(cached, lambda tools: None)
+    open_registry()
+    assert compiled == []
+
+    # Only the changed tool is compiled again
+    rewrite(cached, lambda tools: tools["DrawCircle"]["parameters"]["center_z"].update(default=7))
+    changed = open_registry()
+    assert compiled == ["DrawCircle"]
+    assert changed.snapshot.derived("names", lambda snapshot: ["rebuilt"], persistent=True) == ["rebuilt"]
+
+    # Caches written by other code, and damaged caches, are ignored
+    open_registry("v2")
+    assert len(compiled) == 1 + len(REGISTRY_TOOLS)
+    with open(cache_path, "wb") as f:
+        f.write(b"\x80\x05garbage")
+    assert open_registry("v2").snapshot.processors["DrawCircle"].validate({"radius": 1}) is None
+
+@pytest.fixture
+def sharded(tmp_path):
+    """The path of a sharded copy of the shipped registry."""
+    path = str(tmp_path / "tool_registry")
+    write_index(path, [write_shard(path, tool) for tool in REGISTRY_TOOLS])
+    return path
+
+def touch_index(path):
+    """Bump the modification time of a sharded registry's index, as in ``rewrite``."""
+    index = os.path.join(path, "index.json")
+    stat = os.stat(index)
+    os.utime(index, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+def test_sharded_registry_loads_tools_on_first_use(sharded, monkeypatch):
+    """Only the index is read at load; a call reads and compiles its own tool, and the cache keeps it."""
+    cache_path = sharded + ".cache"
+    registry = ToolRegistry(sharded, script_generator.build_processors, cache_path)
+    snapshot = registry.snapshot
+    assert len(snapshot.by_name) == len(REGISTRY_TOOLS)
+    assert snapshot.by_name.loaded == {}
+
+    server = McpServer(registry=registry)
+    response = server.handle_request({"method": "call_tool", "params": {"name": "DrawCircle", "arguments": {"radius": 2}}})
+    assert "Point3D.create(0, 0, 0)" in response["result"]["content"][0]["text"]
+    assert list(snapshot.by_name.loaded) == ["DrawCircle"]
+    assert list(snapshot.processors.built) == ["DrawCircle"]
+    registry.flush_cache()
+
+    # The next process takes the definition and validator from the cache
+    os.remove(shard_path(sharded, "DrawCircle"))
+    monkeypatch.setattr(script_generator, "compile_tool", lambda tool: pytest.fail("compiled although cached"))
+    cached = ToolRegistry(sharded, script_generator.build_processors, cache_path)
+    with pytest.raises(ValueError, match="Missing required parameter: radius"):
+        cached.snapshot.processors["DrawCircle"].validate({})
+
+def test_cache_writes_are_batched_off_the_request(sharded, monkeypatch):
+    """Compiling tools marks the cache out of date; one timed write saves them all."""
+    monkeypatch.setattr(registry_module, "CACHE_SAVE_DELAY", 0.5)
+    writes = []
+    real_save_cache = ToolRegistry._save_cache
+    monkeypatch.setattr(ToolRegistry, "_save_cache", lambda self, snapshot: writes.append(threading.current_thread()) or real_save_cache(self, snapshot))
+
+    cache_path = sharded + ".cache"
+    registry = ToolRegistry(sharded, script_generator.build_processors, cache_path)
+    timer = registry._save_timer
+    for name in ["DrawCircle", "Extrude", "Fillet"]:
+        registry.snapshot.processors[name]
+    registry.snapshot.derived("names", lambda snapshot: sorted(snapshot.by_name), persistent=True)
+    assert writes == []
+
+    timer.join(5)
+    assert len(writes) == 1 and writes[0] is not threading.current_thread()
+    with open(cache_path, "rb") as f:
+        cache = pickle.load(f)
+    assert set(cache["compiled"]) == {"DrawCircle", "Extrude", "Fillet"}
+    assert "names" in cache["derived"]
+
+    # Nothing left to write
+    registry.flush_cache()
+    assert len(writes) == 1
+
+def test_sharded_registry_reload_keeps_unchanged_tools(sharded):
+    """A reload reads the new index only, and keeps the definitions whose hash did not change."""
+    registry = ToolRegistry(sharded, script_generator.build_processors)
+    before = registry.snapshot
+    extrude = before.processors["Extrude"]
+    circle = before.by_name["DrawCircle"]
+
+    changed = dict(circle, description="Draws a circle.")
+    index = [write_shard(sharded, changed) if entry["name"] == "DrawCircle" else entry for entry in read_index(sharded)]
+    write_index(sharded, index)
+    touch_index(sharded)
+    assert registry.reload()
+
+    after = registry.snapshot
+    assert set(after.by_name.loaded) == {"Extrude"}
+    assert after.processors["Extrude"] is extrude
+    assert after.by_name["DrawCircle"] == changed
+    assert before.by_name["DrawCircle"] is circle
+
+def test_sharded_registry_checks_shards_against_the_index(sharded):
+    """A shard edited without updating the index is not served: the indexed copy is, or an error."""
+    registry = ToolRegistry(sharded, script_generator.build_processors)
+    fillet = registry.snapshot.by_name.entry("Fillet")
+    with open(shard_path(sharded, "Fillet"), "w") as f:
+        json.dump(dict(registry.snapshot.by_name["Chamfer"], name="Fillet"), f)
+    assert registry.snapshot.by_name["Fillet"] == REGISTRY_TOOLS_BY_NAME["Fillet"]
+
+    os.remove(shard_path(sharded, "Fillet", version=fillet["hash"]))
+    registry = ToolRegistry(sharded, script_generator.build_processors)
+    with pytest.raises(ValueError, match="run tools/add_tool.py reindex"):
+        generate_script("Fillet", {"radius": 1}, snapshot=registry.snapshot)
+
+def test_old_snapshots_read_their_own_shards(sharded):
+    """A snapshot still in use reads the shards it was loaded with, after writers replaced them."""
+    add_tool = load_add_tool()
+    registry = ToolRegistry(sharded, script_generator.build_processors)
+    parameters = {"depth": {"type": "number", "description": "Depth of the hole in mm.", "default": 5}}
+    assert add_tool.add_tool("Hole", "Drills a hole.", parameters, "https://example.com", sharded, "# Hole {depth} mm deep\n")
+    touch_index(sharded)
+    assert registry.reload()
+    old = registry.snapshot
+
+    # Both shards of Hole are replaced, and DrawCircle is edited by hand and reindexed
+    with registry_module.registry_lock(sharded):
+        index = [
+            write_shard(sharded, dict(registry.snapshot.by_name["Hole"], description="Drills a deeper hole."), "# Deep hole {depth}\n")
+            if entry["name"] == "Hole" else entry
+            for entry in read_index(sharded)
+        ]
+        write_index(sharded, index)
+    with open(shard_path(sharded, "DrawCircle")) as f:
+        circle = json.load(f)
+    with open(shard_path(sharded, "DrawCircle"), "w") as f:
+        json.dump(dict(circle, description="Draws a circle."), f)
+    assert add_tool.reindex(sharded)
+    touch_index(sharded)
+    assert registry.reload()
+
+    assert old.by_name["Hole"]["description"] == "Drills a hole."
+    assert "# Hole 3 mm deep" in generate_script("Hole", {"depth": 3}, snapshot=old)
+    assert old.by_name["DrawCircle"]["description"] == circle["description"]
+    assert "# Deep hole 3" in generate_script("Hole", {"depth": 3}, snapshot=registry.snapshot)
+    assert registry.snapshot.by_name["DrawCircle"]["description"] == "Draws a circle."
+
+def test_superseded_shard_copies_are_removed_after_a_while(sharded, monkeypatch):
+    """Writing the index removes the copies it no longer lists once their retention is over."""
+    circle = REGISTRY_TOOLS_BY_NAME["DrawCircle"]
+    old_copy = shard_path(sharded, "DrawCircle", version=registry_module.tool_version(circle))
+    changed = dict(circle, description="Draws a circle.")
+    write_index(sharded, [write_shard(sharded, changed) if entry["name"] == "DrawCircle" else entry for entry in read_index(sharded)])
+    assert os.path.exists(old_copy)
+
+    monkeypatch.setattr(registry_module, "VERSION_RETENTION", -1)
+    write_index(sharded, read_index(sharded))
+    assert not os.path.exists(old_copy)
+    assert os.path.exists(shard_path(sharded, "DrawCircle", version=registry_module.tool_version(changed)))
+    assert len(os.listdir(os.path.join(sharded, "versions"))) == len(REGISTRY_TOOLS)
+
+@pytest.mark.parametrize("name", ["../../x", "a/b", "a\\b", "..", "Hole.v2", "3D", ""])
+def test_tool_names_must_be_identifiers(sharded, tmp_path, name):
+    """Names that could escape the shard directories are refused when loading."""
+    with pytest.raises(ValueError, match="Invalid tool name"):
+        shard_path(sharded, name)
+
+    index = read_index(sharded)
+    index[0]["name"] = name
+    with open(os.path.join(sharded, "index.json"), "w") as f:
+        json.dump(index, f)
+    with pytest.raises(ValueError, match="Invalid tool name"):
+        ToolRegistry(sharded, script_generator.build_processors)
+
+    path = tmp_path / "tool_registry.json"
+    path.write_text(json.dumps([dict(REGISTRY_TOOLS[0], name=name)]))
+    with pytest.raises(ValueError, match="Invalid tool name"):
+        ToolRegistry(str(path), script_generator.build_processors)
+
+def load_add_tool():
+    """Import tools/add_tool.py, which is a script rather than a module on the path."""
+    spec = importlib.util.spec_from_file_location(
+        "add_tool", os.path.join(os.path.dirname(__file__), "..", "tools", "add_tool.py")
+    )
+    add_tool = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(add_tool)
+    return add_tool
+
+def test_add_tool_writes_only_its_shards(sharded):
+    """add_tool writes the new tool's shards and the index; its template is served from the registry."""
+    add_tool = load_add_tool()
+    registry = ToolRegistry(sharded, script_generator.build_processors)
+    shards = {name: os.stat(shard_path(sharded, name)).st_mtime_ns for name in registry.snapshot.by_name}
+
+    parameters = {"depth": {"type": "number", "description": "Depth of the hole in mm.", "default": 5}}
+    assert add_tool.add_tool("Hole", "Drills a hole.", parameters, "https://example.com", sharded, "# Hole {depth} mm deep\n")
+    assert not add_tool.add_tool("Hole", "Drills a hole.", parameters, "https://example.com", sharded)
+    assert not add_tool.add_tool("../Hole", "Drills a hole.", parameters, "https://example.com", sharded)
+    assert not os.path.exists(os.path.join(sharded, "Hole.json"))
+    assert {name: os.stat(shard_path(sharded, name)).st_mtime_ns for name in shards} == shards
+
+    touch_index(sharded)
+    assert registry.reload()
+    assert "# Hole 3 mm deep" in generate_script("Hole", {"depth": 3}, snapshot=registry.snapshot)
+
+def test_add_tool_appends_the_new_definition(registry):
+    """add_tool appends the new tool to a registry file, leaving the others as they were."""
+    add_tool = load_add_tool()
+    before = json.loads(open(registry.path).read())
+    parameters = {"depth": {"type": "number", "description": "Depth of the hole in mm.", "default": 5}}
+    assert add_tool.add_tool("Hole", "Drills a hole.", parameters, "https://example.com", registry.path)
+
+    after = json.loads(open(registry.path).read())
+    assert after[:-1] == before
+    assert after[-1] == {"name": "Hole", "description": "Drills a hole.", "parameters": parameters, "docs": "https://example.com"}
+
+@pytest.mark.parametrize("parameters, template, problem", [
+    ({"depth": {"type": "float"}}, None, "Unsupported type for Hole parameter depth: float"),
+    ({"depth": {"type": "number", "default": "5"}}, None, "Default for Hole parameter depth must be number"),
+    ({"depth": {"type": "number", "enum": [1, 2], "default": 3}}, None, "is not one of its enum options"),
+    ({"depth": {"type": "number"}}, "# Hole {depth mm deep\n", "Invalid script template"),
+    ({"depth": {"type": "number"}}, "# Hole {depth!z} mm deep\n", "Invalid script template"),
+])
+def test_add_tool_rejects_invalid_definitions(sharded, tmp_path, capsys, parameters, template, problem):
+    """Definitions the server could not load are refused before anything is written."""
+    add_tool = load_add_tool()
+    index = open(os.path.join(sharded, "index.json")).read()
+    assert not add_tool.add_tool("Hole", "Drills a hole.", parameters, "https://example.com", sharded, template)
+    assert problem in capsys.readouterr().out
+    assert open(os.path.join(sharded, "index.json")).read() == index
+    assert not os.path.exists(shard_path(sharded, "Hole"))
+
+    # The other single-tool paths go through the same checks
+    source = tmp_path / "hole.json"
+    source.write_text(json.dumps({"name": "Hole", "description": "Drills a hole.", "parameters": parameters, "docs": ""}))
+    template_file = None
+    if template is not None:
+        template_file = tmp_path / "hole.template"
+        template_file.write_text(template)
+    assert not add_tool.add_tool_from_json(str(source), sharded, template_file)
+    assert not os.path.exists(shard_path(sharded, "Hole"))
+
+def hole(name, depth=5):
+    """A tool definition for the import tests."""
+    return {
+        "name": name,
+        "description": "Drills a hole.",
+        "parameters": {"depth": {"type": "number", "description": "Depth of the hole in mm.", "default": depth}},
+        "docs": "https://example.com",
+    }
+
+def test_import_tools_validates_everything_before_writing(registry, tmp_path):
+    """A bulk import is written in one go, or not at all if any definition is wrong."""
+    add_tool = load_add_tool()
+    source = tmp_path / "tools.ndjson"
+    lines = [hole("Hole1"), hole("Hole2"), hole("Hole1"), registry.snapshot.by_name["Fillet"]]
+    source.write_text("\n".join(json.dumps(tool) for tool in lines) + "\n\n")
+    assert add_tool.import_tools(str(source), registry.path)
+    assert registry.reload()
+    assert list(registry.snapshot.by_name)[-2:] == ["Hole1", "Hole2"]
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".tmp")] == []
+
+    contents = open(registry.path).read()
+    for bad in ([hole("Hole3"), hole("Hole3", depth=6)], [hole("Hole3"), hole("Hole2", depth=6)],
+                [hole("Hole3"), dict(hole("Hole4"), parameters={"depth": {"type": "float"}})],
+                [hole("Hole3"), hole("../../Hole4")], [hole("Hole3"), hole("holes/Hole4")]):
+        source.write_text("\n".join(json.dumps(tool) for tool in bad))
+        assert not add_tool.import_tools(str(source), registry.path)
+        assert open(registry.path).read() == contents
+
+def test_import_tools_from_a_directory(sharded, tmp_path):
+    """Each file of a directory is a tool, with an optional template next to it."""
+    add_tool = load_add_tool()
+    source = tmp_path / "holes"
+    source.mkdir()
+    (source / "hole.json").write_text(json.dumps(hole("Hole")))
+    (source / "hole.template").write_text("# Hole {depth} mm deep\n")
+    (source / "counterbore.json").write_text(json.dumps(hole("Counterbore")))
+    (source / "counterbore.template").write_text("# Counterbore {depth\n")
+    assert not add_tool.import_tools(str(source), sharded)
+    (source / "counterbore.template").unlink()
+    assert add_tool.import_tools(str(source), sharded)
+
+    registry = ToolRegistry(sharded, script_generator.build_processors)
+    assert list(registry.snapshot.by_name)[-2:] == ["Counterbore", "Hole"]
+    assert "# Hole 3 mm deep" in generate_script("Hole", {"depth": 3}, snapshot=registry.snapshot)
+
+def test_concurrent_imports_keep_every_tool(registry, tmp_path):
+    """Writers serialize on the registry lock, so none of them loses the others' tools."""
+    add_tool = load_add_tool()
+    sources = []
+    for i in range(4):
+        source = tmp_path / f"tools{i}.ndjson"
+        source.write_text("\n".join(json.dumps(hole(f"Hole{i}_{j}")) for j in range(20)))
+        sources.append(str(source))
+    threads = [threading.Thread(target=add_tool.import_tools, args=(source, registry.path)) for source in sources]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert registry.reload()
+    assert sum(name.startswith("Hole") for name in registry.snapshot.by_name) == 80
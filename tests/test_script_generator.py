@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Tests for the Fusion 360 script generator.
+
+These tests exercise the script generator directly, without a running server.
+"""
+
+import json
+import os
+import sys
+import textwrap
+from types import SimpleNamespace
+
+import pytest
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+import script_generator
+from registry import ToolRegistry
+from script_generator import (
+    BASE_SCRIPT_TEMPLATE,
+    SCRIPT_TEMPLATES,
+    generate_multi_tool_script,
+    generate_script,
+)
+from template_compiler import compile_template
+from validators import ParameterValidationError
+
+# One call per tool, covering every template
+TOOL_CALLS = [
+    {"tool_name": "CreateSketch", "parameters": {"plane": "xy"}},
+    {"tool_name": "CreateSketch", "parameters": {"plane": "YZ"}},
+    {"tool_name": "DrawRectangle", "parameters": {"width": 10, "depth": 2.5, "origin_x": -1}},
+    {"tool_name": "DrawCircle", "parameters": {"radius": 5, "center_y": 1.25}},
+    {"tool_name": "Extrude", "parameters": {"height": 5, "operation": "cut"}},
+    {"tool_name": "Revolve", "parameters": {
+        "axis_origin_x": 0, "axis_origin_y": 0, "axis_origin_z": 0,
+        "axis_direction_x": 0, "axis_direction_y": 1, "axis_direction_z": 0,
+        "angle": 90,
+    }},
+    {"tool_name": "Fillet", "parameters": {"radius": 0.5}},
+    {"tool_name": "Fillet", "parameters": {"radius": 0.5, "edge_indices": [0, 3, 4]}},
+    {"tool_name": "Chamfer", "parameters": {"distance": 0.2, "edge_indices": [1]}},
+    {"tool_name": "Shell", "parameters": {"thickness": 1, "face_indices": [2, 5]}},
+    {"tool_name": "Shell", "parameters": {"thickness": 1}},
+    {"tool_name": "Combine", "parameters": {"operation": "intersect"}},
+    {"tool_name": "ExportBody", "parameters": {"filename": "part.step", "format": "step"}},
+]
+
+def _reference_script(tool_scripts):
+    """Render tool scripts the way the generator did before templates were compiled."""
+    combined_tool_script = "\n".join(tool_scripts)
+    indented_tool_script = "\n".join(f"        {line}" for line in combined_tool_script.strip().split("\n"))
+    return BASE_SCRIPT_TEMPLATE.format(tool_scripts=indented_tool_script)
+
+def _reference_tool_script(call):
+    """Format a single tool template with str.format."""
+    processed = script_generator._process_parameters(call["tool_name"], call["parameters"])
+    return SCRIPT_TEMPLATES[call["tool_name"]].format(**processed)
+
+@pytest.mark.parametrize("call", TOOL_CALLS, ids=lambda call: call["tool_name"])
+def test_generate_script_matches_reference(call):
+    """Compiled templates render byte-for-byte what str.format produced."""
+    expected = _reference_script([_reference_tool_script(call)])
+    assert generate_script(call["tool_name"], call["parameters"]) == expected
+
+def test_generate_multi_tool_script_matches_reference():
+    """Joined fragments keep the blank lines between tool scripts."""
+    expected = _reference_script([_reference_tool_script(call) for call in TOOL_CALLS])
+    assert generate_multi_tool_script(TOOL_CALLS) == expected
+
+def test_generate_multi_tool_script_empty():
+    """An empty sequence still produces the bare base script."""
+    assert generate_multi_tool_script([]) == _reference_script([])
+
+def test_compile_template_edge_cases():
+    """Escaped braces, format specs and conversions behave like str.format."""
+    source = "\n  # {{literal}} {name!r}\nvalue = {number:.2f}\n{code}\n\n"
+    params = {"name": "box", "number": 1.5, "code": "a = 1\nb = 2"}
+    expected = _reference_script([source.format(**params)])
+    template = compile_template(source)
+    assert script_generator.SCRIPT_HEAD + "        " + template.render(params) + script_generator.SCRIPT_TAIL == expected
+
+def test_missing_parameter_raises_validation_error():
+    """A missing required parameter is rejected before rendering."""
+    with pytest.raises(ParameterValidationError, match="Missing required parameter: radius"):
+        generate_script("DrawCircle", {})
+
+def test_validator_reports_every_error():
+    """Types, enums and array items are all checked, and reported at once."""
+    with pytest.raises(ParameterValidationError) as excinfo:
+        generate_script("Fillet", {"radius": "1", "body_index": 1.5, "edge_indices": [0, True]})
+    assert excinfo.value.errors == [
+        "Invalid body_index: must be integer, got number",
+        "Invalid radius: must be number, got string",
+        "Invalid edge_indices: item 1 must be integer, got boolean",
+    ]
+    assert excinfo.value.tool_name == "Fillet"
+
+@pytest.mark.parametrize("parameters", [
+    {"radius": float("nan")},
+    {"radius": 1, "center_x": float("inf")},
+    [1],
+])
+def test_validator_rejects_values_that_break_scripts(parameters):
+    """Non-finite numbers and non-object parameters never reach a template."""
+    with pytest.raises(ParameterValidationError):
+        generate_script("DrawCircle", parameters)
+
+def test_validator_matches_enums_case_insensitively():
+    """Options are matched like the processors look them up."""
+    assert "yZConstructionPlane" in generate_script("CreateSketch", {"plane": "YZ"})
+
+def test_multi_tool_validation_reports_every_step():
+    """call_tools rejects every invalid step before generating anything."""
+    calls = [
+        {"tool_name": "DrawCircle", "parameters": {}},
+        {"tool_name": "CreateSketch", "parameters": {"plane": "xy"}},
+        {"tool_name": "Extrude", "parameters": {"height": 1, "operation": "merge"}},
+    ]
+    with pytest.raises(ParameterValidationError) as excinfo:
+        script_generator.iter_multi_tool_script(calls)
+    assert excinfo.value.errors == [
+        "Step 1 (DrawCircle): Missing required parameter: radius",
+        "Step 3 (Extrude): Invalid operation: merge. Must be one of: new, join, cut, intersect",
+    ]
+
+def test_compile_validator_rejects_bad_registry_defaults():
+    """Registry mistakes are caught when the registry loads."""
+    from validators import compile_validator
+
+    tool = {"name": "Bad", "parameters": {"radius": {"type": "number", "default": "1"}}}
+    with pytest.raises(ValueError, match="Default for Bad parameter radius must be number"):
+        compile_validator(tool)
+
+def test_validator_messages_keep_braces_literal():
+    """Enum options and parameter names are quoted in the validator, never evaluated."""
+    from validators import compile_validator
+
+    tool = {"name": "Braces", "parameters": {"m{x}": {"type": "string", "enum": ["a{1+1}", "b}"]}}}
+    validate = compile_validator(tool)
+    validate({"m{x}": "A{1+1}"})
+    with pytest.raises(ParameterValidationError) as excinfo:
+        validate({"m{x}": "c{x}"})
+    assert excinfo.value.errors == ["Invalid m{x}: c{x}. Must be one of: a{1+1}, b}"]
+
+def test_unknown_tool_raises_value_error():
+    """Unknown tools are rejected before rendering."""
+    with pytest.raises(ValueError, match="Unknown tool"):
+        generate_script("NotATool", {})
+
+@pytest.mark.parametrize("tool_name, parameters, message", [
+    ("CreateSketch", {"plane": "ab"}, "Invalid plane: ab. Must be one of: xy, yz, xz"),
+    ("Extrude", {"height": 1, "operation": "merge"}, "Invalid operation: merge. Must be one of: new, join, cut, intersect"),
+    ("Combine", {"operation": "new"}, "Invalid operation: new. Must be one of: join, cut, intersect"),
+    ("ExportBody", {"filename": "a", "format": "dxf"}, "Invalid format: dxf. Must be one of: stl, obj, step, iges, sat"),
+])
+def test_invalid_option_lists_registry_choices(tool_name, parameters, message):
+    """Option tables follow the enum declared in the registry."""
+    with pytest.raises(ValueError) as excinfo:
+        generate_script(tool_name, parameters)
+    assert str(excinfo.value) == message
+
+def test_registered_processor_plugs_in(monkeypatch, tmp_path):
+    """A new tool only needs a registry entry, a template and a processor."""
+    tool = {
+        "name": "Hole",
+        "description": "Drills a hole.",
+        "parameters": {
+            "diameter": {"type": "number", "description": "Hole diameter."},
+            "operation": {"type": "string", "description": "Operation.", "enum": ["cut", "join"], "default": "cut"},
+        },
+        "docs": "",
+    }
+    path = tmp_path / "tool_registry.json"
+    path.write_text(json.dumps([tool for tool in script_generator.TOOL_REGISTRY if tool["name"] not in script_generator.PACKS] + [tool]))
+    monkeypatch.setattr(script_generator, "_PROCESSOR_SPECS", dict(script_generator._PROCESSOR_SPECS))
+    monkeypatch.setattr(script_generator, "REGISTRY", ToolRegistry(str(path), script_generator.build_processors))
+    monkeypatch.setattr(script_generator, "SCRIPT_TEMPLATES", dict(SCRIPT_TEMPLATES))
+    monkeypatch.setattr(script_generator, "COMPILED_TEMPLATES", dict(script_generator.COMPILED_TEMPLATES))
+
+    script_generator.register_template("Hole", "\n# Hole {diameter}\nop = {operation_code}\n")
+
+    @script_generator.register_processor("Hole", operation=script_generator.FEATURE_OPERATION_CODES)
+    def _process_hole(processor, processed):
+        processed["operation_code"] = processor.choose(processed, "operation")
+
+    script = generate_script("Hole", {"diameter": 3})
+    assert "        # Hole 3\n        op = CutFeature\n" in script
+    with pytest.raises(ValueError, match="Must be one of: cut, join"):
+        generate_script("Hole", {"diameter": 3, "operation": "new"})
+
+def test_script_cache_hits_repeated_calls():
+    """Repeated calls with equivalent parameters are served from the cache."""
+    cache = script_generator.SCRIPT_CACHE
+    cache.clear()
+    first = generate_script("Fillet", {"radius": 0.5, "edge_indices": [0, 2]})
+    # Same parameters once defaults are applied, in a different order
+    second = generate_script("Fillet", {"edge_indices": [0, 2], "radius": 0.5})
+    assert first == second
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+def test_script_cache_skips_scalar_calls():
+    """Calls of tools without list or object parameters are rendered without the cache."""
+    cache = script_generator.SCRIPT_CACHE
+    cache.clear()
+    for _ in range(2):
+        generate_script("DrawRectangle", {"width": 10, "depth": 20})
+    stats = cache.stats()
+    assert (stats["size"], stats["hits"], stats["misses"]) == (0, 0, 0)
+
+def test_script_cache_keeps_numeric_types_apart():
+    """1 and 1.0, or 0.0 and -0.0, render differently and must not share a cache entry."""
+    script_generator.SCRIPT_CACHE.clear()
+    scripts = {
+        generate_script("Fillet", {"radius": radius, "edge_indices": [0]})
+        for radius in (1, 1.0, -0.0, 0.0)
+    }
+    assert len(scripts) == 4
+    assert script_generator.SCRIPT_CACHE.stats()["misses"] == 4
+
+def test_script_cache_lru_eviction_and_ttl(monkeypatch):
+    """The cache evicts least recently used entries and expires old ones."""
+    from script_cache import ScriptCache
+
+    now = [100.0]
+    monkeypatch.setattr("script_cache.time.monotonic", lambda: now[0])
+    cache = ScriptCache(maxsize=2, ttl=10)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.stats()["evictions"] == 1
+
+    now[0] += 11
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+    cache.configure(maxsize=0)
+    cache.put("d", 4)
+    assert len(cache) == 0
+
+def test_iter_multi_tool_script_streams_chunks():
+    """The streamed chunks join into the same script, one chunk per step."""
+    chunks = list(script_generator.iter_multi_tool_script(TOOL_CALLS))
+    assert len(chunks) == len(TOOL_CALLS) + 2
+    assert "".join(chunks) == generate_multi_tool_script(TOOL_CALLS)
+
+def test_iter_multi_tool_script_checks_tool_names_up_front():
+    """Unknown tools are rejected before the first chunk is produced."""
+    calls = [{"tool_name": "CreateSketch", "parameters": {"plane": "xy"}}, {"tool_name": "Nope", "parameters": {}}]
+    with pytest.raises(ValueError, match="Unknown tool: Nope"):
+        script_generator.iter_multi_tool_script(calls)
+
+def _circle_pattern(count):
+    """A sketch with a row of circles that differ only in their position."""
+    return [{"tool_name": "CreateSketch", "parameters": {"plane": "xy"}}] + [
+        {"tool_name": "DrawCircle", "parameters": {"radius": 2, "center_x": i * 5, "center_y": i}}
+        for i in range(count)
+    ]
+
+def test_compress_loops_emits_a_loop_for_homogeneous_runs():
+    """A run of calls differing only in numbers becomes a data table and a loop."""
+    calls = _circle_pattern(5)
+    stats = {}
+    script = generate_multi_tool_script(calls, compress_loops=True, stats=stats)
+    assert "        for center_x, center_y in [\n            (0, 0),\n" in script
+    assert "            (20, 4),\n        ]:\n            # Draw a circle\n" in script
+    assert "adsk.core.Point3D.create(center_x, center_y, 0)" in script
+    compile(script, "<script>", "exec")
+
+    unrolled = generate_multi_tool_script(calls)
+    assert stats == {
+        "steps": 6,
+        "loops": 1,
+        "looped_steps": 5,
+        "script_size": len(script),
+        "unrolled_size": len(unrolled),
+    }
+
+@pytest.mark.parametrize("optimize", [False, True])
+def test_progress_counts_rendered_calls(optimize):
+    """Progress is reported after each call or loop, up to the number of calls."""
+    reported = []
+    generate_multi_tool_script(
+        _circle_pattern(5), compress_loops=True, optimize=optimize,
+        progress=lambda done, total: reported.append((done, total)),
+    )
+    assert reported == [(1, 6), (6, 6)]
+
+def test_compress_loops_runs_the_same_calls():
+    """Executing the loop makes the same API calls as the unrolled script."""
+    def circles(script):
+        created = []
+        circles = SimpleNamespace(addByCenterRadius=lambda center, radius: created.append((center, radius)))
+        namespace = {
+            "adsk": SimpleNamespace(core=SimpleNamespace(Point3D=SimpleNamespace(create=lambda *xyz: xyz))),
+            "sketch": SimpleNamespace(sketchCurves=SimpleNamespace(sketchCircles=circles)),
+        }
+        body = script[len(script_generator.SCRIPT_HEAD):-len(script_generator.SCRIPT_TAIL)]
+        exec(textwrap.dedent(body), namespace)
+        return created
+
+    calls = _circle_pattern(4)[1:]
+    assert circles(generate_multi_tool_script(calls, compress_loops=True)) == circles(generate_multi_tool_script(calls))
+
+def test_compress_loops_falls_back_for_non_numeric_differences():
+    """Runs that differ in anything but numbers, or are too short, stay unrolled."""
+    exports = [{"tool_name": "ExportBody", "parameters": {"filename": f"part{i}.stl"}} for i in range(3)]
+    short = _circle_pattern(script_generator.LOOP_MIN_RUN - 1)
+    for calls in (exports, short):
+        stats = {}
+        assert generate_multi_tool_script(calls, compress_loops=True, stats=stats) == generate_multi_tool_script(calls)
+        assert stats["loops"] == 0
+        assert stats["script_size"] == stats["unrolled_size"]
+
+def test_compress_loops_repeats_identical_calls():
+    """Identical calls become a counted loop."""
+    calls = [{"tool_name": "Fillet", "parameters": {"radius": 0.5}}] * 4
+    script = generate_multi_tool_script(calls, compress_loops=True)
+    assert "        for _ in range(4):\n            # Fillet edges\n" in script
+    compile(script, "<script>", "exec")
+
+@pytest.mark.parametrize("indices", [
+    [1],
+    [0, 3, 4],
+    list(range(1000)),
+    list(range(0, 400, 2)),
+    [5, *range(10, 20), 30, 32, 34, 36, 38, 7, 6, 5, 4, 3, 3, 3],
+    [9, 8, 7, 6, 0, -1, 2],
+])
+def test_selection_code_visits_the_same_indices(indices):
+    """Compact selection code adds exactly the given indices, in order."""
+    code = script_generator._selection_code(indices, "edge", "edgeCollection")
+    assert code.count("\n") == 1
+    added = []
+    namespace = {
+        "body": SimpleNamespace(edges=SimpleNamespace(item=lambda index: index)),
+        "edgeCollection": SimpleNamespace(add=added.append),
+    }
+    exec(code, namespace)
+    assert added == indices
+
+def test_contiguous_selection_is_range_encoded():
+    """Contiguous selections take constant space in the script."""
+    script = generate_script("Fillet", {"radius": 0.5, "edge_indices": list(range(100000))})
+    assert "        for edgeIndex in range(0, 100000):\n" in script
+    assert len(script) < 2000
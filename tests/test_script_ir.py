@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+Tests for the script IR and its optimization passes.
+
+The generated scripts are run against a stand-in for the Fusion 360 API
+that records every attribute lookup and call.
+"""
+
+import os
+import sys
+import types
+
+import pytest
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+import script_ir
+import timing_report
+from script_generator import generate_multi_tool_script
+
+ALL_PASSES = list(script_ir.OPTIMIZATION_PASSES)
+
+class Recorder:
+    """Stands in for any Fusion 360 API object, logging how it is used."""
+
+    def __init__(self, log, path):
+        self._log = log
+        self._path = path
+
+    def __getattr__(self, name):
+        path = f"{self._path}.{name}"
+        self._log.append(("get", path))
+        return Recorder(self._log, path)
+
+    def __setattr__(self, name, value):
+        if name.startswith("_"):
+            object.__setattr__(self, name, value)
+        else:
+            self._log.append(("set", f"{self._path}.{name}"))
+
+    def __call__(self, *args):
+        path = f"{self._path}()"
+        if self._log.fail_on and path.endswith(self._log.fail_on):
+            raise RuntimeError(f"{path} failed")
+        self._log.append(("call", path, tuple(arg if isinstance(arg, (int, float, str)) else "obj" for arg in args)))
+        return Recorder(self._log, path)
+
+    def __iter__(self):
+        return iter([Recorder(self._log, f"{self._path}[0]")])
+
+    def __add__(self, other):
+        return self
+
+class Log(list):
+    """The recorded API usage; calls ending with ``fail_on`` raise."""
+
+    fail_on = None
+
+def run_script(script, monkeypatch, fail_on=None):
+    """Run a generated script against the recording API and return the log."""
+    log = Log()
+    log.fail_on = fail_on
+    adsk = types.ModuleType("adsk")
+    adsk.core = Recorder(log, "adsk.core")
+    adsk.fusion = Recorder(log, "adsk.fusion")
+    monkeypatch.setitem(sys.modules, "adsk", adsk)
+    monkeypatch.setitem(sys.modules, "adsk.core", adsk.core)
+    monkeypatch.setitem(sys.modules, "adsk.fusion", adsk.fusion)
+    namespace = {}
+    exec(compile(script, "<script>", "exec"), namespace)
+    namespace["run"](None)
+    if fail_on is None:
+        assert not any("messageBox" in entry[1] and "Failed" in str(entry) for entry in log)
+    return log
+
+def feature_calls(log):
+    """The calls that change the design: adding sketches, curves and features, and exporting."""
+    return [
+        entry for entry in log
+        if entry[0] == "call" and entry[1].split(".")[-1] in ("add()", "addTwoPointRectangle()", "addByCenterRadius()", "execute()")
+    ]
+
+def lookups(log):
+    """The attribute lookups made on the root component."""
+    return [entry for entry in log if entry[0] == "get" and entry[1].startswith("adsk.core.Application.get().activeProduct.rootComponent.")]
+
+PART = [
+    {"tool_name": "CreateSketch", "parameters": {"plane": "xz"}},
+    {"tool_name": "CreateSketch", "parameters": {"plane": "xy"}},
+    {"tool_name": "DrawRectangle", "parameters": {"width": 10, "depth": 10}},
+    {"tool_name": "DrawCircle", "parameters": {"radius": 2, "center_x": 5, "center_y": 5}},
+    {"tool_name": "Extrude", "parameters": {"height": 5}},
+    {"tool_name": "Extrude", "parameters": {"height": 2, "profile_index": 1, "operation": "cut"}},
+    {"tool_name": "ExportBody", "parameters": {"filename": "part.stl"}},
+    {"tool_name": "Fillet", "parameters": {"radius": 0.5, "edge_indices": [0, 1]}},
+    {"tool_name": "ExportBody", "parameters": {"filename": "part.step", "format": "step"}},
+    {"tool_name": "ExportBody", "parameters": {"filename": "part.obj", "format": "obj"}},
+]
+
+def test_default_passes_keep_feature_calls_and_cut_lookups(monkeypatch):
+    """The optimized script changes the design the same way with fewer lookups."""
+    stats = {}
+    optimized = generate_multi_tool_script(PART, stats=stats, optimize=True)
+    plain_log = run_script(generate_multi_tool_script(PART), monkeypatch)
+    optimized_log = run_script(optimized, monkeypatch)
+
+    # The empty xz sketch is the only feature call removed
+    plain_calls = feature_calls(plain_log)
+    assert feature_calls(optimized_log) == plain_calls[1:]
+    assert len(lookups(optimized_log)) < len(lookups(plain_log))
+    assert stats["passes"] == {
+        "remove_empty_sketches": {"steps_removed": 1},
+        "drop_redundant_body_lookups": {"lookups_dropped": 2},
+        "hoist_lookups": {"lookups_hoisted": 2, "lookups_removed": 3},
+    }
+    assert stats["script_size"] == len(optimized) < stats["unrolled_size"]
+
+def test_hoisted_lookups_run_once():
+    """Collection lookups used by several steps move before the first step."""
+    script = generate_multi_tool_script(PART[1:6], optimize=["hoist_lookups"])
+    assert script.count("extrudes = component.features.extrudeFeatures") == 1
+    assert script.index("extrudes = component.features.extrudeFeatures") < script.index("# Create a new sketch")
+
+def test_lookups_used_once_are_not_hoisted():
+    """A lookup that runs once stays in its step."""
+    stats = {}
+    calls = PART[1:5]
+    assert generate_multi_tool_script(calls, stats=stats, optimize=["hoist_lookups"]) == generate_multi_tool_script(calls)
+    assert stats["passes"]["hoist_lookups"] == {"lookups_hoisted": 0, "lookups_removed": 0}
+
+@pytest.mark.parametrize("optimize", ["hoist_lookups", ["hoist"], [1], {"hoist_lookups": True}])
+def test_invalid_optimize_values_are_rejected(optimize):
+    """optimize takes a boolean or a list of known pass names, nothing else."""
+    with pytest.raises(ValueError, match="optimize|optimization pass"):
+        generate_multi_tool_script(PART[1:3], optimize=optimize)
+
+def test_trailing_sketch_is_kept():
+    """Only sketches replaced before anything is drawn in them are removed."""
+    calls = [
+        {"tool_name": "CreateSketch", "parameters": {"plane": "xy"}},
+        {"tool_name": "DrawCircle", "parameters": {"radius": 1}},
+        {"tool_name": "CreateSketch", "parameters": {"plane": "yz"}},
+    ]
+    assert generate_multi_tool_script(calls, optimize=["remove_empty_sketches"]) == generate_multi_tool_script(calls)
+
+def test_merge_sketches_is_opt_in():
+    """Sketches on the same plane are only merged when the pass is requested."""
+    calls = [
+        {"tool_name": "CreateSketch", "parameters": {"plane": "xy"}},
+        {"tool_name": "DrawCircle", "parameters": {"radius": 1}},
+        {"tool_name": "CreateSketch", "parameters": {"plane": "XY"}},
+        {"tool_name": "DrawCircle", "parameters": {"radius": 2}},
+        {"tool_name": "CreateSketch", "parameters": {"plane": "yz"}},
+        {"tool_name": "DrawCircle", "parameters": {"radius": 3}},
+    ]
+    assert generate_multi_tool_script(calls, optimize=True).count("sketches.add(") == 3
+    merged = generate_multi_tool_script(calls, optimize=["merge_sketches"])
+    assert merged.count("sketches.add(") == 2
+    assert "sketch = sketches.add(yzPlane)" in merged
+
+def test_body_lookups_are_kept_after_features():
+    """A body looked up again after a feature step is looked up again."""
+    script = generate_multi_tool_script(PART[6:], optimize=["drop_redundant_body_lookups"])
+    assert script.count("body = component.bRepBodies.item(0)") == 2
+
+def _step(tool_name, index, *lines):
+    return script_ir.ToolStep(tool_name, index, [{"tool_name": tool_name, "parameters": {}}], list(lines))
+
+@pytest.mark.parametrize("rebinding", [
+    "body, other = component.bRepBodies.item(1), None",
+    "for body in component.bRepBodies:",
+    "with open(path) as body:",
+])
+def test_unrecognized_rebinding_keeps_lookups(rebinding):
+    """A name rebound in a form the passes do not rewrite is neither dropped nor hoisted."""
+    lookup = "body = component.bRepBodies.item(0)"
+    ir = script_ir.ScriptIR([
+        _step("ExportBody", 0, lookup, "exportMgr.execute(body)"),
+        _step("ExportBody", 1, rebinding, "    pass"),
+        _step("ExportBody", 2, lookup, "exportMgr.execute(body)"),
+    ])
+    assert script_ir.drop_redundant_body_lookups(ir) == {"lookups_dropped": 0}
+
+    hoistable = "extrudes = component.features.extrudeFeatures"
+    ir = script_ir.ScriptIR([
+        _step("Extrude", 0, hoistable, "extrudes.add(extrudeInput)"),
+        _step("Extrude", 1, rebinding.replace("body", "extrudes"), "    pass"),
+        _step("Extrude", 2, hoistable, "extrudes.add(extrudeInput)"),
+    ])
+    assert script_ir.hoist_lookups(ir)["lookups_hoisted"] == 0
+
+def test_other_sketch_uses_keep_the_sketch():
+    """A sketch passed on rather than drawn in counts as used."""
+    ir = script_ir.ScriptIR([
+        _step("CreateSketch", 0, "sketch = sketches.add(xyPlane)"),
+        _step("Custom", 1, "project(sketch)"),
+        _step("CreateSketch", 2, "sketch = sketches.add(yzPlane)"),
+    ])
+    assert script_ir.remove_empty_sketches(ir) == {"steps_removed": 0}
+
+def test_passes_see_loops(monkeypatch):
+    """Lookups inside loops emitted by compress_loops are hoisted too."""
+    calls = [PART[1]] + [
+        {"tool_name": "Extrude", "parameters": {"height": 5, "profile_index": i}} for i in range(4)
+    ]
+    script = generate_multi_tool_script(calls, compress_loops=True, optimize=True)
+    assert "        for profile_index in [" in script
+    assert script.count("component.features.extrudeFeatures") == 1
+    plain = feature_calls(run_script(generate_multi_tool_script(calls), monkeypatch))
+    assert feature_calls(run_script(script, monkeypatch)) == plain
+
+def test_unknown_pass_is_rejected_up_front():
+    """Unknown pass names raise before the script is generated."""
+    with pytest.raises(ValueError, match="Unknown optimization pass: inline"):
+        generate_multi_tool_script(PART, optimize=["inline"])
+
+@pytest.mark.parametrize("passes", [[name] for name in ALL_PASSES] + [ALL_PASSES])
+def test_optimized_scripts_compile(passes):
+    """Every pass leaves a valid script behind."""
+    compile(generate_multi_tool_script(PART, compress_loops=True, optimize=passes), "<script>", "exec")
+
+def _body_lines(script):
+    """The code lines of a script body, without indentation, comments or blank lines."""
+    return [
+        line.strip() for line in script.splitlines()[10:-4]
+        if line.strip() and not line.strip().startswith("#")
+    ]
+
+def _first_lines(lines, prefixes):
+    """Abbreviate body lines to the markers a test cares about."""
+    markers = []
+    for line in lines:
+        for prefix in prefixes:
+            if line.startswith(prefix):
+                markers.append(prefix)
+    return markers
+
+DEFER_MARKERS = ("sketch = sketches.add", "rectangle =", "circle =", "for ", "prof =", "body =",
+                 "sketch.isComputeDeferred = True", "sketch.isComputeDeferred = False")
+
+def test_defer_sketch_compute_wraps_drawing_steps():
+    """The block starts before the first curve and ends before the profiles are used."""
+    calls = [
+        {"tool_name": "CreateSketch", "parameters": {"plane": "xy"}},
+        {"tool_name": "DrawRectangle", "parameters": {"width": 10, "depth": 10}},
+        {"tool_name": "DrawCircle", "parameters": {"radius": 2}},
+        {"tool_name": "Extrude", "parameters": {"height": 5}},
+    ]
+    stats = {}
+    script = generate_multi_tool_script(calls, stats=stats, defer_sketch_compute=True)
+    assert _first_lines(_body_lines(script), DEFER_MARKERS) == [
+        "sketch = sketches.add",
+        "sketch.isComputeDeferred = True",
+        "rectangle =",
+        "circle =",
+        "sketch.isComputeDeferred = False",
+        "prof =",
+    ]
+    assert stats["passes"] == {"defer_sketch_compute": {"blocks": 1, "deferred_steps": 2}}
+
+def test_defer_sketch_compute_mixed_sequence(monkeypatch):
+    """Each sketch gets its own block; steps that do not use the sketch stay inside it."""
+    calls = [
+        {"tool_name": "CreateSketch", "parameters": {"plane": "xy"}},
+        {"tool_name": "DrawCircle", "parameters": {"radius": 1}},
+        {"tool_name": "ExportBody", "parameters": {"filename": "a.stl"}},
+        {"tool_name": "DrawCircle", "parameters": {"radius": 2}},
+        {"tool_name": "CreateSketch", "parameters": {"plane": "yz"}},
+        {"tool_name": "DrawRectangle", "parameters": {"width": 1, "depth": 1}},
+        {"tool_name": "Extrude", "parameters": {"height": 1}},
+        {"tool_name": "CreateSketch", "parameters": {"plane": "xz"}},
+    ] + [{"tool_name": "DrawCircle", "parameters": {"radius": 1, "center_x": i}} for i in range(3)] + [
+        {"tool_name": "Revolve", "parameters": {
+            "axis_origin_x": 0, "axis_origin_y": 0, "axis_origin_z": 0,
+            "axis_direction_x": 0, "axis_direction_y": 1, "axis_direction_z": 0,
+        }},
+        {"tool_name": "DrawCircle", "parameters": {"radius": 4}},
+        {"tool_name": "DrawCircle", "parameters": {"radius": 5}},
+    ]
+    script = generate_multi_tool_script(calls, compress_loops=True, defer_sketch_compute=True)
+    assert _first_lines(_body_lines(script), DEFER_MARKERS) == [
+        "sketch = sketches.add",
+        "sketch.isComputeDeferred = True",
+        "circle =",
+        "body =",
+        "circle =",
+        "sketch.isComputeDeferred = False",
+        # A single curve is not worth a block
+        "sketch = sketches.add",
+        "rectangle =",
+        "prof =",
+        "sketch = sketches.add",
+        # The loop is deferred as a whole
+        "sketch.isComputeDeferred = True",
+        "for ",
+        "circle =",
+        "sketch.isComputeDeferred = False",
+        "prof =",
+        # Curves drawn at the end of the script are computed before it ends
+        "sketch.isComputeDeferred = True",
+        "circle =",
+        "circle =",
+        "sketch.isComputeDeferred = False",
+    ]
+    feature_calls(run_script(script, monkeypatch))
+
+def test_defer_sketch_compute_combines_with_optimize():
+    """The option adds its pass to the optimization passes."""
+    stats = {}
+    generate_multi_tool_script(PART, stats=stats, optimize=True, defer_sketch_compute=True)
+    assert list(stats["passes"]) == [
+        "remove_empty_sketches", "defer_sketch_compute", "drop_redundant_body_lookups", "hoist_lookups",
+    ]
+
+def test_generate_script_accepts_generation_options():
+    """Single-tool scripts go through the same passes."""
+    from script_generator import generate_script
+
+    script = generate_script("DrawCircle", {"radius": 1}, defer_sketch_compute=True)
+    assert script == generate_script("DrawCircle", {"radius": 1})
+    assert generate_script("ExportBody", {"filename": "a"}, optimize=True) == generate_script("ExportBody", {"filename": "a"})
+    with pytest.raises(ValueError, match="Unknown optimization pass"):
+        generate_script("ExportBody", {"filename": "a"}, optimize=["nope"])
+
+def test_profiled_script_writes_timing_report(monkeypatch, tmp_path):
+    """Every emitted step is timed, and the report loads and summarizes."""
+    path = str(tmp_path / "timing.json")
+    calls = PART[1:4] + [{"tool_name": "DrawCircle", "parameters": {"radius": 1, "center_x": i}} for i in range(3)]
+    stats = {}
+    script = generate_multi_tool_script(calls, stats=stats, compress_loops=True, profile=True, profile_path=path)
+    assert stats["passes"] == {"profile": {"timed_steps": 3}}
+    run_script(script, monkeypatch)
+
+    report = timing_report.load_timing_report(path)
+    assert report["success"] is True
+    assert [(step["step"], step["tool"], step["calls"], step["success"]) for step in report["steps"]] == [
+        (0, "CreateSketch", 1, True),
+        (1, "DrawRectangle", 1, True),
+        (2, "DrawCircle", 4, True),
+    ]
+
+    summary = timing_report.summarize_timing_reports([report])
+    assert summary["tools"]["DrawCircle"]["steps"] == 1
+    assert summary["tools"]["DrawCircle"]["calls"] == 4
+    assert summary["failures"] == []
+    assert "DrawCircle" in timing_report.format_summary(summary)
+
+def test_profiled_script_reports_failed_step(monkeypatch, tmp_path):
+    """A failing step is recorded with its error, and later steps are not."""
+    path = str(tmp_path / "timing.json")
+    script = generate_multi_tool_script(PART[1:], optimize=True, profile=True, profile_path=path)
+    run_script(script, monkeypatch, fail_on="extrudeFeatures.add()")
+
+    report = timing_report.load_timing_report(path)
+    assert report["success"] is False
+    assert [step["tool"] for step in report["steps"]] == ["CreateSketch", "DrawRectangle", "DrawCircle", "Extrude"]
+    assert report["steps"][-1]["error"].startswith("RuntimeError: ")
+
+    summary = timing_report.summarize_timing_reports([report])
+    assert summary["failed_reports"] == 1
+    assert summary["failures"][0]["tool"] == "Extrude"
+    assert timing_report.main([path, "--json"]) == 0
+
+def test_load_timing_report_rejects_other_files(tmp_path):
+    """Files that are not timing reports are rejected with a ValueError."""
+    path = tmp_path / "other.json"
+    path.write_text('{"steps": [{"step": 0}]}')
+    with pytest.raises(ValueError, match="malformed step"):
+        timing_report.load_timing_report(str(path))
@@ -34,6 +34,15 @@ def test_list_tools():
     assert "tools" in data
     assert len(data["tools"]) > 0
     print(f"✅ List tools test passed ({len(data['tools'])} tools found)")
+    
+    # The tool list is not sent again while it is unchanged
+    etag = response.headers["ETag"]
+    response = requests.get(f"{SERVER_URL}/tools", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    response = requests.get(f"{SERVER_URL}/tools", headers={"If-None-Match": '"stale"'})
+    assert response.status_code == 200
+    print("✅ List tools ETag test passed")
 
 def test_call_tool():
     """Test the call_tool endpoint."""
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Tests for tool packs.
+"""
+
+import json
+import os
+import shutil
+import sys
+
+import pytest
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+import script_generator
+from mcp_server import McpServer
+from registry import ToolRegistry, read_index, write_index, write_shard
+from script_generator import generate_script
+from tool_packs import discover_packs, packs_by_tool
+
+PACKS_DIR = os.path.join(os.path.dirname(__file__), "..", "tools", "packs")
+
+@pytest.fixture
+def packs(tmp_path, monkeypatch):
+    """A copy of the example packs, with the generator's registrations restored afterwards."""
+    directory = tmp_path / "packs"
+    shutil.copytree(PACKS_DIR, directory)
+    monkeypatch.setattr(script_generator, "_PROCESSOR_SPECS", dict(script_generator._PROCESSOR_SPECS))
+    monkeypatch.setattr(script_generator, "SCRIPT_TEMPLATES", dict(script_generator.SCRIPT_TEMPLATES))
+    monkeypatch.setattr(script_generator, "COMPILED_TEMPLATES", dict(script_generator.COMPILED_TEMPLATES))
+    return directory
+
+def use_packs(monkeypatch, tmp_path, packs, sharded):
+    """Load a copy of the shipped tools with the given packs into the script generator."""
+    tools = [tool for tool in script_generator.TOOL_REGISTRY if tool["name"] not in script_generator.PACKS]
+    if sharded:
+        path = str(tmp_path / "tool_registry")
+        write_index(path, [write_shard(path, tool) for tool in tools])
+    else:
+        path = str(tmp_path / "tool_registry.json")
+        with open(path, "w") as f:
+            json.dump(tools, f)
+    registry = ToolRegistry(path, script_generator.build_processors, pack_tools=[tool for pack in packs for tool in pack.tools])
+    monkeypatch.setattr(script_generator, "PACKS", packs_by_tool(packs))
+    monkeypatch.setattr(script_generator, "REGISTRY", registry)
+    return registry
+
+@pytest.mark.parametrize("sharded", [False, True])
+def test_pack_code_is_imported_on_first_call(packs, tmp_path, monkeypatch, sharded):
+    """Pack tools are listed from the manifest; the module is imported when one is called."""
+    (loft,) = discover_packs([str(packs)])
+    registry = use_packs(monkeypatch, tmp_path, [loft], sharded)
+
+    server = McpServer(registry=registry)
+    assert "LoftProfiles" in [tool["name"] for tool in json.loads(server.tool_list.body)["tools"]]
+    assert not loft.loaded
+    assert "LoftProfiles" not in registry.snapshot.processors.built
+
+    script = generate_script("LoftProfiles", {"profile_indices": [0, 1]})
+    assert loft.loaded
+    assert "prof = sketch.profiles.item(1)" in script
+    assert "lofts.createInput(adsk.fusion.FeatureOperations.NewBodyFeatureOperation)" in script
+    with pytest.raises(ValueError, match="profile_indices is required"):
+        generate_script("LoftProfiles", {"profile_indices": []})
+
+def test_registry_tools_take_precedence(packs, tmp_path, monkeypatch):
+    """A pack tool named like a registry tool is not served, nor is its pack imported."""
+    (loft,) = discover_packs([str(packs)])
+    loft.tools.append(dict(script_generator.REGISTRY.snapshot.by_name["Fillet"], description="Shadowed."))
+    registry = use_packs(monkeypatch, tmp_path, [loft], False)
+    assert registry.snapshot.by_name["Fillet"]["description"] != "Shadowed."
+    assert "Fillet" in generate_script("Fillet", {"radius": 1})
+    assert not loft.loaded
+
+def test_registry_tool_without_code_shadows_the_pack(packs, tmp_path, monkeypatch):
+    """A registry tool with its own template shard is served without importing the pack it shadows."""
+    (loft,) = discover_packs([str(packs)])
+    registry = use_packs(monkeypatch, tmp_path, [loft], True)
+    tool = dict(loft.tools[0], description="Lofts, the registry's way.")
+    write_index(registry.path, read_index(registry.path) + [write_shard(registry.path, tool, "# Registry loft\n")])
+    assert registry.reload()
+
+    assert registry.snapshot.by_name["LoftProfiles"]["description"] == "Lofts, the registry's way."
+    assert "# Registry loft" in generate_script("LoftProfiles", {"profile_indices": [0, 1]})
+    assert not loft.loaded
+
+def test_shipped_packs_are_found_by_default():
+    """Without FUSION360_MCP_TOOL_PACKS, the packs in tools/packs are served."""
+    if "FUSION360_MCP_TOOL_PACKS" in os.environ:
+        pytest.skip("tool packs path set in the environment")
+    assert os.path.samefile(script_generator.TOOL_PACKS_PATH, PACKS_DIR)
+    assert script_generator.PACKS["LoftProfiles"].name == "loft"
+    assert "LoftProfiles" in script_generator.REGISTRY.snapshot.by_name
+
+@pytest.mark.parametrize("tool, message", [
+    ({"name": "../Loft", "parameters": {}}, "Invalid tool name"),
+    ({"name": "Loft", "parameters": {"count": {"type": "float", "description": "Count."}}}, "float"),
+    ({"name": "Loft", "parameters": {"count": {"type": "integer", "description": "Count.", "default": "two"}}}, "Default for Loft"),
+])
+def test_pack_tools_are_validated_at_discovery(packs, capsys, tool, message):
+    """Pack tools are checked like registry tools when the manifest is read, before any pack code runs."""
+    manifest = json.loads((packs / "loft" / "pack.json").read_text())
+    manifest["tools"].append(tool)
+    (packs / "loft" / "pack.json").write_text(json.dumps(manifest))
+    assert discover_packs([str(packs)]) == []
+    err = capsys.readouterr().err
+    assert "Skipping tool pack" in err and message in err
+
+def test_broken_and_duplicate_packs_are_skipped(packs, capsys):
+    """A pack whose manifest does not load, and tools already provided, are reported and skipped."""
+    shutil.copytree(packs / "loft", packs / "loft2")
+    (packs / "broken").mkdir()
+    (packs / "broken" / "pack.json").write_text('{"name": "broken"}')
+
+    found = discover_packs([str(packs), str(packs / "missing")])
+    assert [pack.name for pack in found] == ["loft", "loft"]
+    assert [len(pack.tools) for pack in found] == [1, 0]
+    err = capsys.readouterr().err
+    assert "Skipping tool pack" in err and "broken" in err
+    assert "Skipping tool LoftProfiles of pack loft: already provided" in err
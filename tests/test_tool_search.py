@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Tests for the tool search index.
+"""
+
+import json
+import os
+import random
+import sys
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+import script_generator
+from mcp_server import McpServer
+from registry import ToolRegistry, write_index, write_shard
+from tool_search import ToolSearchIndex, search_tools, tokenize
+
+def test_tokenize_splits_identifiers():
+    """Names split on case, underscores and digits, and stopwords are dropped."""
+    assert tokenize("DrawCircle") == ["draw", "circle"]
+    assert tokenize("profile_indices") == ["profile", "indices"]
+    assert tokenize("Export to an STL file, XYPlane 3D") == ["export", "stl", "file", "xy", "plane", "3", "d"]
+
+def test_search_ranks_names_first():
+    """A term in the name outweighs the same term in a description or parameter."""
+    index = ToolSearchIndex([
+        ("Extrude", "Extrudes a profile by a height.", ["profile_index", "height"]),
+        ("DrawCircle", "Draws a circle.", ["radius"]),
+        ("Fillet", "Rounds edges with a radius.", ["radius", "edge_indices"]),
+    ])
+    assert [name for name, _ in index.search("radius circle")] == ["DrawCircle", "Fillet"]
+    assert [name for name, _ in index.search("profile")] == ["Extrude"]
+    assert [name for name, _ in index.search("circ")] == ["DrawCircle"]
+    assert index.search("loft") == []
+    assert index.search("radius", limit=1) == index.search("radius")[:1]
+
+def test_search_matches_an_exhaustive_ranking():
+    """Ranking the tools of the common term by its order gives the same results as scoring every tool."""
+    rng = random.Random(1)
+    words = ["circle", "radius", "edge", "face", "body", "sketch", "plane", "height", "angle", "count"]
+    tools = [
+        (f"{rng.choice(words).title()}{rng.choice(words).title()}{i}", " ".join(rng.sample(words, 4)), rng.sample(words, 2))
+        for i in range(300)
+    ]
+    index = ToolSearchIndex(tools)
+    for query in ["circle", "radius edge", "face body sketch", "pla count", "an"]:
+        scores = {}
+        for token in set(tokenize(query)):
+            for term, scale in index._matches(token):
+                for doc, weight in index._postings[term].items():
+                    scores[doc] = scores.get(doc, 0.0) + weight * scale
+        expected = sorted(scores, key=lambda doc: (-scores[doc], doc))[:7]
+        assert [name for name, _ in index.search(query, 7)] == [index.names[doc] for doc in expected]
+
+def test_sharded_search_reads_no_shards(tmp_path):
+    """The index of a sharded registry is built from its index entries; only the hits are read."""
+    path = str(tmp_path / "tool_registry")
+    write_index(path, [write_shard(path, tool) for tool in script_generator.TOOL_REGISTRY if tool["name"] not in script_generator.PACKS])
+    registry = ToolRegistry(path, script_generator.build_processors)
+    tools = search_tools(registry.snapshot, "fillet edges", 1)
+    assert [tool["name"] for tool in tools] == ["Fillet"]
+    assert list(registry.snapshot.by_name.loaded) == ["Fillet"]
+
+def test_mcp_search_tools():
+    """SearchTools returns the schemas of the best matches in the list_tools format."""
+    server = McpServer()
+    response = server.handle_request({
+        "method": "call_tool",
+        "params": {"name": "SearchTools", "arguments": {"query": "circle radius", "limit": 2}},
+    })
+    result = response["result"]
+    assert result["tools"][0]["name"] == "DrawCircle"
+    assert "radius" in result["tools"][0]["input_schema"]["required"]
+    assert json.loads(result["content"][0]["text"]) == {"tools": result["tools"]}
+    assert "SearchTools" in server.tools
+
+    response = server.handle_request({
+        "method": "call_tool",
+        "params": {"name": "SearchTools", "arguments": {"query": "circle", "limit": 0}},
+    })
+    assert response["error"]["message"] == "Invalid params: Invalid limit: must be at least 1, got 0"
@@ -2,7 +2,13 @@
 """
 Tool Registry Manager for Fusion 360 MCP Server.
 
-This script helps users add new tools to the tool registry.
+This script helps users add new tools to the tool registry. The registry is
+either a sharded directory, where adding a tool only writes its own shard and
+the index, or a single JSON file.
+
+Every command holds the registry's write lock while it reads and writes it,
+and replaces files atomically, so that it can run while the servers reload
+the registry.
 """
 
 import json
@@ -11,27 +17,42 @@ import sys
 import argparse
 from pathlib import Path
 
+# Import the registry format from the server sources
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+from registry import (
+    atomic_write,
+    check_tool_name,
+    read_index,
+    registry_lock,
+    shard_path,
+    tool_version,
+    write_index,
+    write_shard,
+)
+from template_compiler import compile_template
+from validators import compile_validator_code
+
 def get_tool_registry_path(server_path=None):
     """
-    Get the path to the tool registry file.
+    Get the path to the tool registry directory.
     
     Args:
         server_path: Path to the Fusion 360 MCP Server directory.
         
     Returns:
-        The path to the tool registry file.
+        The path to the tool registry directory.
     """
     if server_path is None:
         server_path = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
     
-    return os.path.join(server_path, "src", "tool_registry.json")
+    return os.path.join(server_path, "src", "tool_registry")
 
 def load_tool_registry(registry_path=None):
     """
-    Load the tool registry.
+    Load the tool registry, reading every shard of a sharded registry.
     
     Args:
-        registry_path: Path to the tool registry file.
+        registry_path: Path to the tool registry directory or file.
         
     Returns:
         The tool registry as a list of dictionaries.
@@ -39,56 +60,134 @@ def load_tool_registry(registry_path=None):
     if registry_path is None:
         registry_path = get_tool_registry_path()
     
+    if os.path.isdir(registry_path):
+        tools = []
+        for entry in read_index(registry_path):
+            with open(shard_path(registry_path, entry["name"]), "r") as f:
+                tools.append(json.load(f))
+        return tools
+    
     with open(registry_path, "r") as f:
         return json.load(f)
 
 def save_tool_registry(registry, registry_path=None):
     """
-    Save the tool registry.
+    Save the whole tool registry, writing every shard of a sharded registry.
+    
+    Template shards already in the directory are kept, and indexed as they are.
     
     Args:
         registry: The tool registry as a list of dictionaries.
-        registry_path: Path to the tool registry file.
+        registry_path: Path to the tool registry directory or file.
     """
     if registry_path is None:
         registry_path = get_tool_registry_path()
     
-    with open(registry_path, "w") as f:
-        json.dump(registry, f, indent=2)
+    if os.path.isdir(registry_path):
+        write_index(registry_path, [
+            write_shard(registry_path, tool, _read_template(registry_path, tool["name"]))
+            for tool in registry
+        ])
+        return
+    
+    atomic_write(registry_path, json.dumps(registry, indent=2).encode("utf-8"))
+
+def _read_template(registry_path, name):
+    """Read the template shard of a tool, or None if the directory has none."""
+    path = shard_path(registry_path, name, template=True)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+def _add_tools(tools, registry_path):
+    """
+    Add tools to the registry with a single read and write, under its lock.
+    
+    In a sharded registry, the shards of the new tools and the index are
+    written, and the other tools are not read. Nothing is written if any
+    tool is already in the registry with another definition.
+    
+    Args:
+        tools: The (tool, template) pairs to add, with distinct names.
+        registry_path: Path to the tool registry directory or file.
+        
+    Returns:
+        The names of the tools added, of those already in the registry with
+        the same definition, and of those in it with another definition.
+    """
+    with registry_lock(registry_path):
+        sharded = os.path.isdir(registry_path)
+        if sharded:
+            index = read_index(registry_path)
+            hashes = {entry["name"]: entry["hash"] for entry in index}
+        else:
+            registry = load_tool_registry(registry_path)
+            hashes = {tool["name"]: tool_version(tool) for tool in registry}
+        
+        unchanged = [tool["name"] for tool, _ in tools if hashes.get(tool["name"]) == tool_version(tool)]
+        conflicts = [tool["name"] for tool, _ in tools if tool["name"] in hashes and tool["name"] not in unchanged]
+        new = [(tool, template) for tool, template in tools if tool["name"] not in hashes]
+        if conflicts or not new:
+            return [], unchanged, conflicts
+        
+        if sharded:
+            # The index is written last, so the servers never see a tool without its shards
+            index.extend(write_shard(registry_path, tool, template) for tool, template in new)
+            write_index(registry_path, index)
+        else:
+            registry.extend(tool for tool, _ in new)
+            save_tool_registry(registry, registry_path)
+    
+    return [tool["name"] for tool, _ in new], unchanged, conflicts
 
-def add_tool(name, description, parameters, docs, registry_path=None):
+def add_tool(name, description, parameters, docs, registry_path=None, template=None):
     """
     Add a new tool to the registry.
     
+    In a sharded registry only the shards of the new tool and the index are
+    written; the other tools are not read (see ``_add_tools``).
+    
     Args:
         name: The name of the tool.
         description: A description of what the tool does.
         parameters: A dictionary of parameters for the tool.
         docs: A link to documentation for the tool.
-        registry_path: Path to the tool registry file.
+        registry_path: Path to the tool registry directory or file.
+        template: The source of the tool's script template, for tools that
+            have none in the server code; sharded registries only.
         
     Returns:
         True if the tool was added successfully, False otherwise.
     """
-    # Load the registry
-    registry = load_tool_registry(registry_path)
-    
-    # Check if the tool already exists
-    for tool in registry:
-        if tool["name"] == name:
-            print(f"❌ Tool already exists: {name}")
-            return False
+    if registry_path is None:
+        registry_path = get_tool_registry_path()
     
-    # Add the new tool
-    registry.append({
+    tool = {
         "name": name,
         "description": description,
         "parameters": parameters,
         "docs": docs
-    })
+    }
+    
+    # Check the definition as the server will load it, before writing anything
+    problems = _check_tool(tool)
+    if template is not None:
+        problems.extend(_check_template(template))
+    if problems:
+        for problem in problems:
+            print(f"❌ {problem}")
+        return False
     
-    # Save the registry
-    save_tool_registry(registry, registry_path)
+    if template is not None and not os.path.isdir(registry_path):
+        print("❌ Script templates can only be added to a sharded registry")
+        return False
+    
+    # Add the tool, unless it already exists
+    added, _, _ = _add_tools([(tool, template)], registry_path)
+    if not added:
+        print(f"❌ Tool already exists: {name}")
+        return False
     
     print(f"✅ Tool added: {name}")
     return True
@@ -98,7 +197,7 @@ def add_tool_interactive(registry_path=None):
     Add a new tool to the registry interactively.
     
     Args:
-        registry_path: Path to the tool registry file.
+        registry_path: Path to the tool registry directory or file.
         
     Returns:
         True if the tool was added successfully, False otherwise.
@@ -176,13 +275,14 @@ def add_tool_interactive(registry_path=None):
     # Add the tool
     return add_tool(name, description, parameters, docs, registry_path)
 
-def add_tool_from_json(json_file, registry_path=None):
+def add_tool_from_json(json_file, registry_path=None, template_file=None):
     """
     Add a new tool to the registry from a JSON file.
     
     Args:
         json_file: Path to the JSON file containing the tool definition.
-        registry_path: Path to the tool registry file.
+        registry_path: Path to the tool registry directory or file.
+        template_file: Path to a file containing the tool's script template.
         
     Returns:
         True if the tool was added successfully, False otherwise.
@@ -208,15 +308,225 @@ def add_tool_from_json(json_file, registry_path=None):
         print("❌ Tool documentation URL is required")
         return False
     
+    template = None
+    if template_file is not None:
+        with open(template_file, "r", encoding="utf-8") as f:
+            template = f.read()
+    
     # Add the tool
-    return add_tool(tool["name"], tool["description"], tool["parameters"], tool["docs"], registry_path)
+    return add_tool(tool["name"], tool["description"], tool["parameters"], tool["docs"], registry_path, template)
+
+def _check_tool(tool):
+    """
+    Check a tool definition as the server does when it loads it.
+    
+    Args:
+        tool: The tool definition.
+        
+    Returns:
+        The problems found, empty if the definition is valid.
+    """
+    if not isinstance(tool, dict):
+        return ["A tool definition must be a JSON object"]
+    
+    problems = [f"Missing field: {field}" for field in ("name", "description", "parameters", "docs") if field not in tool]
+    if problems:
+        return problems
+    if not isinstance(tool["name"], str) or not tool["name"]:
+        return ["The tool name must be a non-empty string"]
+    try:
+        check_tool_name(tool["name"])
+    except ValueError as e:
+        return [str(e)]
+    if not isinstance(tool["parameters"], dict) or not all(isinstance(param, dict) for param in tool["parameters"].values()):
+        return ["The tool parameters must be an object of parameter schemas"]
+    
+    # Compiling the validator checks the parameter types, enums and defaults
+    try:
+        compile_validator_code(tool)
+    except (ValueError, TypeError) as e:
+        return [str(e)]
+    return []
+
+def _check_template(template):
+    """
+    Check a script template as the server does when it loads it.
+    
+    Args:
+        template: The template source.
+        
+    Returns:
+        The problems found, empty if the template compiles.
+    """
+    try:
+        compile_template(template)
+    except (ValueError, SyntaxError) as e:
+        return [f"Invalid script template: {e}"]
+    return []
+
+def _read_definitions(source):
+    """
+    Read tool definitions from a directory of JSON files, or from an NDJSON file.
+    
+    In a directory, each ``<file>.json`` holds a tool definition, and an
+    optional ``<file>.template`` next to it its script template. An NDJSON
+    file holds one tool definition per line.
+    
+    Args:
+        source: The directory, the NDJSON file, or "-" for standard input.
+        
+    Returns:
+        The (origin, tool, template) of each definition read, and the
+        errors of those that could not be read.
+    """
+    definitions = []
+    errors = []
+    if os.path.isdir(source):
+        for file_name in sorted(os.listdir(source)):
+            if not file_name.endswith(".json"):
+                continue
+            path = os.path.join(source, file_name)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    tool = json.load(f)
+                template = None
+                template_path = os.path.splitext(path)[0] + ".template"
+                if os.path.exists(template_path):
+                    with open(template_path, "r", encoding="utf-8") as f:
+                        template = f.read()
+            except (OSError, ValueError) as e:
+                errors.append(f"{file_name}: {e}")
+                continue
+            definitions.append((file_name, tool, template))
+        return definitions, errors
+    
+    stream = sys.stdin if source == "-" else open(source, "r", encoding="utf-8")
+    try:
+        for number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                definitions.append((f"line {number}", json.loads(line), None))
+            except ValueError as e:
+                errors.append(f"line {number}: {e}")
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    return definitions, errors
+
+def import_tools(source, registry_path=None):
+    """
+    Import many tools into the registry at once.
+    
+    Every definition is validated, and duplicates dropped, before the
+    registry is touched; then the registry is read and written once, under
+    its lock. Definitions already in the registry unchanged are skipped. If
+    any definition is invalid, conflicts with another one or with a tool in
+    the registry, nothing is imported.
+    
+    Args:
+        source: A directory of tool definition files, an NDJSON file, or "-"
+            for NDJSON on standard input (see ``_read_definitions``).
+        registry_path: Path to the tool registry directory or file.
+        
+    Returns:
+        True if the tools were imported, False otherwise.
+    """
+    if registry_path is None:
+        registry_path = get_tool_registry_path()
+    
+    sharded = os.path.isdir(registry_path)
+    definitions, errors = _read_definitions(source)
+    
+    # Validate and deduplicate in one pass
+    tools = {}
+    for origin, tool, template in definitions:
+        problems = _check_tool(tool)
+        if template is not None:
+            problems.extend(_check_template(template))
+            if not sharded:
+                problems.append("Script templates can only be added to a sharded registry")
+        if problems:
+            errors.extend(f"{origin}: {problem}" for problem in problems)
+            continue
+        
+        previous = tools.get(tool["name"])
+        if previous is None:
+            tools[tool["name"]] = (origin, tool, template)
+        elif (tool_version(previous[1]), previous[2]) != (tool_version(tool), template):
+            errors.append(f"{origin}: {tool['name']} differs from its definition in {previous[0]}")
+    
+    added = unchanged = []
+    if not errors:
+        added, unchanged, conflicts = _add_tools(
+            [(tool, template) for _, tool, template in tools.values()], registry_path
+        )
+        errors.extend(f"{tools[name][0]}: Tool already exists with another definition: {name}" for name in conflicts)
+    
+    if errors:
+        print(f"❌ Nothing imported ({len(errors)} errors):")
+        for error in errors:
+            print(f"  - {error}")
+        return False
+    
+    skipped = f" ({len(unchanged)} already in the registry)" if unchanged else ""
+    print(f"✅ Tools imported: {len(added)}{skipped}")
+    return True
+
+def reindex(registry_path=None):
+    """
+    Rebuild the index of a sharded registry from its shards, after editing them by hand.
+    
+    Args:
+        registry_path: Path to the tool registry directory.
+        
+    Returns:
+        True if the index was rebuilt, False otherwise.
+    """
+    if registry_path is None:
+        registry_path = get_tool_registry_path()
+    
+    if not os.path.isdir(registry_path):
+        print(f"❌ Not a sharded registry: {registry_path}")
+        return False
+    
+    with registry_lock(registry_path):
+        save_tool_registry(load_tool_registry(registry_path), registry_path)
+    print(f"✅ Index rebuilt: {registry_path}")
+    return True
+
+def split_registry(json_file, registry_path=None):
+    """
+    Convert a registry file into a sharded registry directory.
+    
+    Args:
+        json_file: Path to the tool registry file.
+        registry_path: Path to the tool registry directory to create.
+        
+    Returns:
+        True if the registry was converted, False otherwise.
+    """
+    if registry_path is None:
+        registry_path = get_tool_registry_path()
+    
+    if os.path.exists(registry_path):
+        print(f"❌ Already exists: {registry_path}")
+        return False
+    
+    with registry_lock(json_file):
+        tools = load_tool_registry(json_file)
+    os.makedirs(registry_path)
+    with registry_lock(registry_path):
+        save_tool_registry(tools, registry_path)
+    print(f"✅ Registry split into: {registry_path}")
+    return True
 
 def list_tools(registry_path=None):
     """
     List all tools in the registry.
     
     Args:
-        registry_path: Path to the tool registry file.
+        registry_path: Path to the tool registry directory or file.
     """
     # Load the registry
     registry = load_tool_registry(registry_path)
@@ -252,12 +562,29 @@ if __name__ == "__main__":
     # Add tool from JSON command
     add_json_parser = subparsers.add_parser("add-json", help="Add a new tool to the registry from a JSON file")
     add_json_parser.add_argument("json_file", help="Path to the JSON file containing the tool definition")
+    add_json_parser.add_argument("--template", help="Path to a file containing the tool's script template")
     add_json_parser.add_argument("--registry", help="Path to the tool registry file")
     
     # Add tool interactively command
     add_interactive_parser = subparsers.add_parser("add-interactive", help="Add a new tool to the registry interactively")
     add_interactive_parser.add_argument("--registry", help="Path to the tool registry file")
     
+    # Bulk import command
+    import_parser = subparsers.add_parser("import", help="Import many tools at once, atomically")
+    import_parser.add_argument(
+        "source", help="Directory of tool definition files, NDJSON file of definitions, or - for NDJSON on stdin"
+    )
+    import_parser.add_argument("--registry", help="Path to the tool registry file")
+    
+    # Rebuild the index command
+    reindex_parser = subparsers.add_parser("reindex", help="Rebuild the index of a sharded registry from its shards")
+    reindex_parser.add_argument("--registry", help="Path to the tool registry directory")
+    
+    # Split a registry file command
+    split_parser = subparsers.add_parser("split", help="Convert a registry file into a sharded registry directory")
+    split_parser.add_argument("json_file", help="Path to the tool registry file")
+    split_parser.add_argument("--registry", help="Path to the tool registry directory to create")
+    
     args = parser.parse_args()
     
     if args.command == "list":
@@ -275,8 +602,15 @@ if __name__ == "__main__":
         
         add_tool(args.name, args.description, parameters, args.docs, args.registry)
     elif args.command == "add-json":
-        add_tool_from_json(args.json_file, args.registry)
+        add_tool_from_json(args.json_file, args.registry, args.template)
     elif args.command == "add-interactive":
         add_tool_interactive(args.registry)
+    elif args.command == "import":
+        if not import_tools(args.source, args.registry):
+            exit(1)
+    elif args.command == "reindex":
+        reindex(args.registry)
+    elif args.command == "split":
+        split_registry(args.json_file, args.registry)
     else:
         parser.print_help()
@@ -1,9 +1,14 @@
 """
 Script template for the LoftProfiles tool.
 
-This file demonstrates how to add a new script template to the script_generator.py file.
-To use this template, add it to the SCRIPT_TEMPLATES dictionary in script_generator.py
-and add parameter processing logic to the _process_parameters function.
+This file demonstrates how to add a new tool to the script generator without
+editing the generator itself: register the template with `register_template`
+and the parameter processing with the `register_processor` decorator. The tool
+definition itself (see example_tool.json) must also be added to the registry,
+e.g. with `python tools/add_tool.py add-json tools/example_tool.json`.
+
+The same tool is also packaged as a tool pack in tools/packs/loft, which the
+server loads without any of these steps (see "Tool Packs" in the README).
 """
 
 # Template for the LoftProfiles tool
@@ -18,58 +23,36 @@ loftInput.loftSections.addProfiles(profiles)
 loft = lofts.add(loftInput)
 """
 
-# Example of how to add this template to the SCRIPT_TEMPLATES dictionary in script_generator.py:
-"""
-SCRIPT_TEMPLATES = {
-    # ... existing templates ...
-    
-    "LoftProfiles": LOFT_PROFILES_TEMPLATE,
-    
-    # ... other templates ...
-}
+# Example of how to register the template and its parameter processing, e.g. from
+# a module imported by the server after script_generator:
 """
+from script_generator import FEATURE_OPERATION_CODES, register_processor, register_template
 
-# Example of how to add parameter processing logic to the _process_parameters function in script_generator.py:
-"""
-def _process_parameters(tool_name: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
-    # ... existing parameter processing ...
+register_template("LoftProfiles", LOFT_PROFILES_TEMPLATE)
+
+# The operation table is restricted to the "enum" declared in the registry entry
+@register_processor("LoftProfiles", operation=FEATURE_OPERATION_CODES)
+def _process_loft_profiles(processor, processed):
+    # Process profile_indices
+    profile_indices = processed.get("profile_indices", [])
+    if not profile_indices:
+        raise ValueError("profile_indices is required and must not be empty")
     
-    elif tool_name == "LoftProfiles":
-        # Process profile_indices
-        profile_indices = processed.get("profile_indices", [])
-        if not profile_indices:
-            raise ValueError("profile_indices is required and must not be empty")
-        
-        # Generate code to collect profiles
-        profile_code_lines = []
-        for idx in profile_indices:
-            profile_code_lines.append(f"prof = sketch.profiles.item({idx})")
-            profile_code_lines.append("profiles.append(prof)")
-        processed["profile_collection_code"] = "\\n".join(profile_code_lines)
-        
-        # Process operation
-        operation = processed.get("operation", "new").lower()
-        if operation == "new":
-            processed["operation_code"] = "NewBodyFeatureOperation"
-        elif operation == "join":
-            processed["operation_code"] = "JoinFeatureOperation"
-        elif operation == "cut":
-            processed["operation_code"] = "CutFeatureOperation"
-        elif operation == "intersect":
-            processed["operation_code"] = "IntersectFeatureOperation"
-        else:
-            raise ValueError(f"Invalid operation: {operation}. Must be one of: new, join, cut, intersect")
-        
-        # Process is_closed
-        is_closed = processed.get("is_closed", False)
-        if is_closed:
-            processed["closed_code"] = "loftInput.isClosed = True"
-        else:
-            processed["closed_code"] = "# Not a closed loft"
+    # Generate code to collect profiles
+    profile_code_lines = []
+    for idx in profile_indices:
+        profile_code_lines.append(f"prof = sketch.profiles.item({idx})")
+        profile_code_lines.append("profiles.append(prof)")
+    processed["profile_collection_code"] = "\\n".join(profile_code_lines)
     
-    # ... other parameter processing ...
+    # Process operation
+    processed["operation_code"] = processor.choose(processed, "operation")
     
-    return processed
+    # Process is_closed
+    if processed.get("is_closed", False):
+        processed["closed_code"] = "loftInput.isClosed = True"
+    else:
+        processed["closed_code"] = "# Not a closed loft"
 """
 
 # Example usage of the LoftProfiles tool:
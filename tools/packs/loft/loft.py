@@ -0,0 +1,32 @@
+"""
+Parameter processing for the LoftProfiles tool of the loft tool pack.
+
+The server imports this module the first time LoftProfiles is called. The
+tool definition is in pack.json and the script template in templates/.
+"""
+
+from script_generator import FEATURE_OPERATION_CODES, register_processor
+
+# The operation table is restricted to the "enum" declared in the tool definition
+@register_processor("LoftProfiles", operation=FEATURE_OPERATION_CODES)
+def _process_loft_profiles(processor, processed):
+    # Process profile_indices
+    profile_indices = processed.get("profile_indices", [])
+    if not profile_indices:
+        raise ValueError("profile_indices is required and must not be empty")
+    
+    # Generate code to collect profiles
+    profile_code_lines = []
+    for idx in profile_indices:
+        profile_code_lines.append(f"prof = sketch.profiles.item({idx})")
+        profile_code_lines.append("profiles.append(prof)")
+    processed["profile_collection_code"] = "\n".join(profile_code_lines)
+    
+    # Process operation
+    processed["operation_code"] = processor.choose(processed, "operation")
+    
+    # Process is_closed
+    if processed.get("is_closed", False):
+        processed["closed_code"] = "loftInput.isClosed = True"
+    else:
+        processed["closed_code"] = "# Not a closed loft"